@@ -0,0 +1,171 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple, FrozenSet
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.models import Activity
+from app.settings import settings
+
+@dataclass(frozen=True)
+class ActivityNode:
+    """
+    Неизменяемый узел дерева видов деятельности.
+    """
+    id: int
+    name: str
+    path: str
+    parent_id: Optional[int]
+    children_ids: Tuple[int, ...]
+    descendant_ids: FrozenSet[int] # Сам узел и все его потомки
+    version: int
+
+@dataclass(frozen=True)
+class ActivitySnapshot:
+    """
+    Снимок всей таблицы видов деятельности с индексами по id и по path.
+    """
+    by_id: Mapping[int, ActivityNode] # Упорядочен по path
+    by_path: Mapping[str, ActivityNode]
+    root_ids: Tuple[int, ...]
+    built_at: float
+
+    def subtree(self, activity_id: int) -> list[ActivityNode]:
+        """
+        Возвращает узел и всех его потомков, упорядоченных по path (родители раньше детей).
+        """
+        node = self.by_id[activity_id]
+        return sorted((self.by_id[i] for i in node.descendant_ids), key=lambda n: n.path)
+
+def build_snapshot(rows) -> ActivitySnapshot:
+    """
+    Строит снимок по строкам (id, name, path, version).
+    """
+    # Сортировка по path ставит родителей раньше детей; этот порядок сохраняется в by_id
+    rows = sorted(rows, key=lambda row: row.path)
+    path_to_id = {row.path: row.id for row in rows}
+    parents = {}
+    children = {row.id: [] for row in rows}
+
+    for row in rows:
+        parent_id = None
+        if '.' in row.path:
+            parent_id = path_to_id.get(row.path.rsplit('.', 1)[0])
+        parents[row.id] = parent_id
+        if parent_id is not None:
+            children[parent_id].append(row.id)
+
+    # Обходим от самых глубоких узлов к корням, накапливая множества потомков
+    descendants = {}
+    for row in reversed(rows):
+        ids = {row.id}
+        for child_id in children[row.id]:
+            ids |= descendants[child_id]
+        descendants[row.id] = frozenset(ids)
+
+    by_id = {
+        row.id: ActivityNode(
+            id=row.id,
+            name=row.name,
+            path=row.path,
+            parent_id=parents[row.id],
+            children_ids=tuple(children[row.id]),
+            descendant_ids=descendants[row.id],
+            version=row.version
+        )
+        for row in rows
+    }
+
+    return ActivitySnapshot(
+        by_id=MappingProxyType(by_id),
+        by_path=MappingProxyType({node.path: node for node in by_id.values()}),
+        root_ids=tuple(node.id for node in by_id.values() if node.parent_id is None),
+        built_at=time.monotonic()
+    )
+
+class ActivityCache:
+    """
+    Кэш дерева видов деятельности в памяти процесса.
+    Снимок заменяется целиком, поэтому читатели никогда не видят частично обновленное дерево.
+    Пересобирается после записи в этом процессе; записи из других процессов
+    становятся видны не позднее чем через ttl секунд.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._snapshot: Optional[ActivitySnapshot] = None
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self.last_rebuild_ms = 0.0
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._snapshot is not None
+            and time.monotonic() - self._snapshot.built_at < self.ttl
+        )
+
+    async def get(self, db: AsyncSession) -> ActivitySnapshot:
+        """
+        Возвращает актуальный снимок, при необходимости загружая его из БД.
+        """
+        if self._is_fresh():
+            self.hits += 1
+            return self._snapshot
+
+        self.misses += 1
+        async with self._lock:
+            # Снимок мог быть пересобран, пока ждали блокировку
+            if self._is_fresh():
+                return self._snapshot
+            return await self._rebuild(db)
+
+    async def get_with(self, activity_id: int, db: AsyncSession) -> ActivitySnapshot:
+        """
+        Возвращает снимок, в котором есть activity_id, если этот вид деятельности есть в БД.
+        При промахе вид деятельности проверяется в БД: его мог создать другой процесс после сборки снимка,
+        и тогда снимок пересобирается. Несуществующие id пересборку не вызывают.
+        """
+        snapshot = await self.get(db)
+        if activity_id in snapshot.by_id:
+            return snapshot
+
+        result = await db.execute(select(Activity.id).where(Activity.id == activity_id))
+        if result.scalar_one_or_none() is None:
+            return snapshot
+
+        return await self.rebuild(db)
+
+    async def rebuild(self, db: AsyncSession) -> ActivitySnapshot:
+        """
+        Пересобирает снимок. Вызывается после коммита изменений видов деятельности.
+        """
+        async with self._lock:
+            return await self._rebuild(db)
+
+    async def _rebuild(self, db: AsyncSession) -> ActivitySnapshot:
+        started = time.perf_counter()
+        result = await db.execute(select(Activity.id, Activity.name, Activity.path, Activity.version))
+        snapshot = build_snapshot(result.all())
+
+        self._snapshot = snapshot
+        self.rebuilds += 1
+        self.last_rebuild_ms = (time.perf_counter() - started) * 1000
+
+        return snapshot
+
+    def invalidate(self) -> None:
+        self._snapshot = None
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "rebuilds": self.rebuilds,
+            "last_rebuild_ms": round(self.last_rebuild_ms, 3),
+            "size": len(self._snapshot.by_id) if self._snapshot else 0,
+        }
+
+activity_cache = ActivityCache(ttl=settings.ACTIVITY_CACHE_TTL)
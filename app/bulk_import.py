@@ -0,0 +1,48 @@
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import AsyncIterator
+from app.deps import AsyncSessionLocal
+from app.crud.import_crud import ImportEntity, ImportFormat, import_records
+
+READ_CHUNK_SIZE = 1 << 20
+
+async def read_chunks(path: Path) -> AsyncIterator[bytes]:
+    with sys.stdin.buffer if str(path) == "-" else path.open("rb") as file:
+        while chunk := file.read(READ_CHUNK_SIZE):
+            yield chunk
+
+async def run(args: argparse.Namespace) -> None:
+    """
+    Импортирует файл тем же кодом, что и эндпоинт POST /api/import/{entity}, и печатает отчет в JSON.
+    """
+    data_format = args.format or (ImportFormat.csv if args.path.suffix == ".csv" else ImportFormat.ndjson)
+
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        result = await import_records(
+            entity=args.entity,
+            chunks=read_chunks(args.path),
+            data_format=data_format,
+            db=db,
+            dry_run=args.dry_run
+        )
+    elapsed = time.perf_counter() - started
+
+    print(result.model_dump_json(indent=2))
+    print(f"{result.received} records in {elapsed:.2f} s ({result.received / elapsed:,.0f} records/s)", file=sys.stderr)
+
+    if result.errors_total:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Массовый импорт из NDJSON или CSV: python -m app.bulk_import organizations organizations.ndjson"
+    )
+    parser.add_argument("entity", type=ImportEntity, choices=list(ImportEntity))
+    parser.add_argument("path", type=Path, help="файл с данными, - для stdin")
+    parser.add_argument("--format", type=ImportFormat, choices=list(ImportFormat), help="по умолчанию по расширению файла")
+    parser.add_argument("--dry-run", action="store_true", help="проверить данные без сохранения")
+    asyncio.run(run(parser.parse_args()))
@@ -1,41 +1,157 @@
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from pydantic import PositiveInt
-from typing import List
-from ..schemas import ActOrgSchema, ActivitySchema, OrganizationSchema
-from ..models import Organization, Activity, organizations_activities
-from ..utils import organizations_to_list
+from sqlalchemy import BindParameter, Integer, all_, any_, bindparam, delete, func, literal, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY, array, insert as pg_insert
+from typing import List, Set
+from ..schemas import (
+    ActOrgSchema,
+    ActOrgUpdateSchema,
+    ActOrgBatchSchema,
+    ActOrgBatchResultSchema,
+    ActivitySchema,
+    OrganizationActivitiesSchema
+)
+from ..models import Organization, OrganizationSearch, Activity, organizations_activities
+from ..activity_cache import activity_cache
+from ..response_cache import response_cache
+from .search_crud import refresh_organization_search
+
+def id_array(ids) -> BindParameter:
+    """
+    Передает список id одним параметром-массивом, а не отдельным параметром на каждый элемент.
+    """
+    return bindparam(None, list(ids), type_=ARRAY(Integer))
+
+async def check_act_org_ids(organization_ids: Set[int], activity_ids: Set[int], db: AsyncSession) -> None:
+    """
+    Проверяет существование всех организаций и видов деятельности одним запросом.
+    Если какие-то id не найдены, возвращает HTTP 400 со списком отсутствующих.
+    """
+    result = await db.execute(
+        select(literal("organization"), Organization.id)
+        .where(Organization.id == any_(id_array(organization_ids)))
+        .union_all(
+            select(literal("activity"), Activity.id)
+            .where(Activity.id == any_(id_array(activity_ids)))
+        )
+    )
+    found = {"organization": set(), "activity": set()}
+    for kind, entity_id in result.all():
+        found[kind].add(entity_id)
+
+    for name, requested, existing in (
+        ("Organizations", organization_ids, found["organization"]),
+        ("Activities", activity_ids, found["activity"]),
+    ):
+        missing = sorted(requested - existing)
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{name} with ids {missing[:20]} do not exist."
+            )
+
+def link_pairs(links: List[ActOrgSchema]):
+    """
+    Набор пар (organization_id, activity_id) как табличное выражение unnest из двух массивов.
+    """
+    return func.unnest(
+        id_array(link.organization_id for link in links),
+        id_array(link.activity_id for link in links)
+    ).table_valued("organization_id", "activity_id").render_derived()
 
 async def create_act_org(data: ActOrgSchema, db: AsyncSession) -> ActOrgSchema:
     """
     Создает новую связь между видом деятельности и организацией.
+    Повторное создание существующей связи не считается ошибкой.
     """
-    result = await db.execute(select(Organization).where(Organization.id == data.organization_id))
-    organization = result.scalar_one_or_none()
-    if organization is None:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Organization with id {data.organization_id} does not exist."
-        )
+    await link_act_org_batch(ActOrgBatchSchema(links=[data]), db)
 
-    result = await db.execute(select(Activity).where(Activity.id == data.activity_id))
-    activity = result.scalar_one_or_none()
-    if activity is None:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Activity with id {data.activity_id} does not exist."
+    return ActOrgSchema(organization_id=data.organization_id, activity_id=data.activity_id)
+
+async def link_act_org_batch(data: ActOrgBatchSchema, db: AsyncSession) -> ActOrgBatchResultSchema:
+    """
+    Создает связи для всех переданных пар одним запросом.
+    Уже существующие связи пропускаются.
+    """
+    await check_act_org_ids(
+        {link.organization_id for link in data.links},
+        {link.activity_id for link in data.links},
+        db
+    )
+
+    pairs = link_pairs(data.links)
+    result = await db.execute(
+        pg_insert(organizations_activities)
+        .from_select(["organization_id", "activity_id"], select(pairs.c.organization_id, pairs.c.activity_id))
+        .on_conflict_do_nothing()
+    )
+    await refresh_organization_search({link.organization_id for link in data.links}, db)
+    await db.commit()
+    await response_cache.invalidate("act_org")
+
+    return ActOrgBatchResultSchema(added=result.rowcount)
+
+async def unlink_act_org_batch(data: ActOrgBatchSchema, db: AsyncSession) -> ActOrgBatchResultSchema:
+    """
+    Удаляет связи для всех переданных пар одним запросом.
+    Отсутствующие связи пропускаются.
+    """
+    pairs = link_pairs(data.links)
+    result = await db.execute(
+        delete(organizations_activities)
+        .where(
+            tuple_(organizations_activities.c.organization_id, organizations_activities.c.activity_id)
+            .in_(select(pairs.c.organization_id, pairs.c.activity_id))
         )
+    )
+    await refresh_organization_search({link.organization_id for link in data.links}, db)
+    await db.commit()
+    await response_cache.invalidate("act_org")
 
-    await db.execute(
-        organizations_activities.insert().values(
-            organization_id=data.organization_id,
-            activity_id=data.activity_id
+    return ActOrgBatchResultSchema(removed=result.rowcount)
+
+async def replace_organization_activities(
+    organization_id: int,
+    data: OrganizationActivitiesSchema,
+    db: AsyncSession
+) -> ActOrgBatchResultSchema:
+    """
+    Заменяет набор видов деятельности организации одним запросом:
+    удаляет связи, которых нет в новом наборе, и добавляет недостающие.
+    """
+    activity_ids = set(data.activity_ids)
+    await check_act_org_ids({organization_id}, activity_ids, db)
+
+    removed = (
+        delete(organizations_activities)
+        .where(organizations_activities.c.organization_id == organization_id)
+        .where(organizations_activities.c.activity_id != all_(id_array(activity_ids)))
+        .returning(organizations_activities.c.activity_id)
+        .cte("removed")
+    )
+    added = (
+        pg_insert(organizations_activities)
+        .from_select(
+            ["organization_id", "activity_id"],
+            select(literal(organization_id), func.unnest(id_array(activity_ids)))
         )
+        .on_conflict_do_nothing()
+        .returning(organizations_activities.c.activity_id)
+        .cte("added")
     )
+    result = await db.execute(
+        select(
+            select(func.count()).select_from(added).scalar_subquery(),
+            select(func.count()).select_from(removed).scalar_subquery()
+        )
+    )
+    added_count, removed_count = result.one()
+    await refresh_organization_search([organization_id], db)
     await db.commit()
+    await response_cache.invalidate("act_org")
 
-    return ActOrgSchema(organization_id=organization.id, activity_id=activity.id)
+    return ActOrgBatchResultSchema(added=added_count, removed=removed_count)
 
 async def get_activities_by_org_id(organization_id: int, db: AsyncSession) -> List[ActivitySchema]:
     """
@@ -64,51 +180,122 @@ async def get_activities_by_org_id(organization_id: int, db: AsyncSession) -> Li
 
     return [ActivitySchema(id=activity.id, name=activity.name, parent_id=None) for activity in activities]
 
+async def organization_activity_filter(activity_id: int, db: AsyncSession):
+    """
+    Условие на organization_search: у организации есть вид деятельности activity_id или любой из его дочерних.
+    В organization_search хранятся и предки видов деятельности организации, поэтому это одна проверка
+    по GIN-индексу ix_organization_search_activity_ids. Если вида деятельности нет, возвращает HTTP 400.
+    """
+    snapshot = await activity_cache.get_with(activity_id, db)
+    if activity_id not in snapshot.by_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Activity with id {activity_id} does not exist."
+        )
+
+    # id встраивается в SQL литералом: для параметра общий план не знает селективности и выбирает seq scan
+    return OrganizationSearch.activity_ids.contains(array([literal(activity_id, Integer, literal_execute=True)]))
+
 async def get_organizations_by_act_id(activity_id: int, db: AsyncSession) -> List:
     """
     Получает организации по указанному виду деятельности.
     Если указан родительский вид деятельности, возвращает организации всех дочерних активностей.
     """
-    result = await db.execute(select(Activity).where(Activity.id == activity_id))
-    activity = result.scalar_one_or_none()
-    if activity is None:
+    result = await db.execute(
+        select(OrganizationSearch.name)
+        .where(await organization_activity_filter(activity_id, db))
+    )
+    organizations_list = list(result.scalars().all())
+
+    if not organizations_list:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Activity with id {activity_id} does not exist."
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No organizations found for activity id {activity_id}."
         )
 
-    pattern = f"{activity.path}%"
+    return organizations_list
+
+async def get_act_org(organization_id: int, activity_id: int, db: AsyncSession) -> ActOrgSchema:
+    """
+    Получает связь организации с видом деятельности.
+    Если связи нет, возвращает HTTP 404.
+    """
     result = await db.execute(
-        select(Activity.id).where(Activity.path.like(pattern))
+        select(organizations_activities)
+        .where(organizations_activities.c.organization_id == organization_id)
+        .where(organizations_activities.c.activity_id == activity_id)
     )
-    activity_ids = [row[0] for row in result.all()]
+    link = result.one_or_none()
+
+    if link is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Organization {organization_id} is not linked to activity {activity_id}."
+        )
 
+    return ActOrgSchema.model_validate(link)
+
+async def delete_act_org(organization_id: int, activity_id: int, db: AsyncSession):
+    """
+    Удаляет связь организации с видом деятельности.
+    Если связи нет, возвращает HTTP 404.
+    """
     result = await db.execute(
-        select(Organization)
-        .join(organizations_activities, Organization.id == organizations_activities.c.organization_id)
-        .where(organizations_activities.c.activity_id.in_(activity_ids))
-        .distinct()
+        delete(organizations_activities)
+        .where(organizations_activities.c.organization_id == organization_id)
+        .where(organizations_activities.c.activity_id == activity_id)
     )
-    organizations = result.scalars().all()
 
-    if not organizations:
+    if result.rowcount == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"No organizations found for activity id {activity_id}."
+            detail=f"Organization {organization_id} is not linked to activity {activity_id}."
         )
-    
-    organizations_list = await organizations_to_list(organizations)
 
-    return organizations_list
+    await refresh_organization_search([organization_id], db)
+    await db.commit()
+    await response_cache.invalidate("act_org")
+
+    return {"detail": f"Link between organization {organization_id} and activity {activity_id} deleted successfully."}
+
+async def update_act_org(
+    organization_id: int,
+    activity_id: int,
+    update_data: ActOrgUpdateSchema,
+    db: AsyncSession
+) -> ActOrgSchema:
+    """
+    Переносит связь на другую организацию и/или другой вид деятельности.
+    Если связи нет — 404, если новая связь уже существует — 400.
+    """
+    link = await get_act_org(organization_id=organization_id, activity_id=activity_id, db=db)
+    for field, value in update_data.model_dump(exclude_unset=True, exclude_none=True).items():
+        setattr(link, field, value)
 
-async def get_act_org():
-    ...
-    return
+    if (link.organization_id, link.activity_id) == (organization_id, activity_id):
+        return link
 
-async def delete_act_org():
-    ...
-    return
+    await check_act_org_ids({link.organization_id}, {link.activity_id}, db)
+
+    result = await db.execute(
+        select(organizations_activities)
+        .where(organizations_activities.c.organization_id == link.organization_id)
+        .where(organizations_activities.c.activity_id == link.activity_id)
+    )
+    if result.one_or_none() is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Organization {link.organization_id} is already linked to activity {link.activity_id}."
+        )
+
+    await db.execute(
+        update(organizations_activities)
+        .where(organizations_activities.c.organization_id == organization_id)
+        .where(organizations_activities.c.activity_id == activity_id)
+        .values(organization_id=link.organization_id, activity_id=link.activity_id)
+    )
+    await refresh_organization_search([organization_id, link.organization_id], db)
+    await db.commit()
+    await response_cache.invalidate("act_org")
 
-async def update_act_org():
-    ...
-    return
\ No newline at end of file
+    return link
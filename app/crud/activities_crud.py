@@ -1,10 +1,14 @@
 from fastapi import HTTPException, status
+from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import delete
-from app.models import Activity
+from sqlalchemy import delete, insert, update, literal, func, true
+from app.models import Activity, activity_closure, organizations_activities
 from app.schemas import ActivityBaseSchema, ActivitySchema, ActivityUpdateSchema, ActivityTreeSchema
-from app.utils import get_path, build_activity_tree
+from app.utils import get_path, build_activity_tree, build_activity_forest, transliterate, make_etag
+from app.activity_cache import activity_cache
+from app.response_cache import response_cache
+from app.crud.search_crud import refresh_organization_search
 
 MAX_ACTIVITY_DEPTH = 3  # Максимальный 3 уровня вложенности
 
@@ -20,11 +24,36 @@ async def create_activity(activity_data: ActivityBaseSchema, db: AsyncSession) -
     )
 
     db.add(db_activity)
+    await db.flush()
+
+    # Новый узел наследует всех предков родителя и ссылается сам на себя
+    await db.execute(
+        insert(activity_closure).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(
+                activity_closure.c.ancestor_id,
+                literal(db_activity.id),
+                activity_closure.c.depth + 1
+            )
+            .where(activity_closure.c.descendant_id == activity_data.parent_id)
+            .union_all(
+                select(literal(db_activity.id), literal(db_activity.id), literal(0))
+            )
+        )
+    )
     await db.commit()
+    await response_cache.invalidate("activities")
     await db.refresh(db_activity)
+    await activity_cache.rebuild(db)
 
     return ActivitySchema.model_validate(db_activity)
 
+def activity_subtree_ids(activity_id: int):
+    """
+    Подзапрос id вида деятельности и всех его потомков по таблице замыкания.
+    """
+    return select(activity_closure.c.descendant_id).where(activity_closure.c.ancestor_id == activity_id)
+
 async def get_activity(activity_id: int, db: AsyncSession) -> ActivitySchema:
     """
     Получает вид деятельности по его id.
@@ -42,48 +71,42 @@ async def get_activity(activity_id: int, db: AsyncSession) -> ActivitySchema:
 
     return ActivitySchema.model_validate(db_activity)
 
-async def get_activities_list(db: AsyncSession):
+async def get_activities_list(db: AsyncSession) -> List[ActivityTreeSchema]:
     """
-    Возвращает все виды деятельности в виде древовидной структуры.
+    Возвращает все виды деятельности в виде леса: корни со вложенными потомками.
     """
-    result = await db.execute(select(Activity))
-    all_activities = result.scalars().all()
+    snapshot = await activity_cache.get(db)
 
-    if all_activities is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Activities not found."
-        )
-
-    trees = []
-    for activity in all_activities:
-        tree = await get_activity_tree(activity_id=activity.id, db=db)
-        trees.append(tree)
-
-    return trees
+    return build_activity_forest(snapshot.by_id.values())
 
 async def get_activity_tree(activity_id: int, db: AsyncSession) -> ActivityTreeSchema:
     """
     Получает вид деятельности по его id вместе со вложенной структурой.
     """
-    result = await db.execute(
-    select(Activity).where(Activity.id == activity_id))
-    db_activity = result.scalar_one_or_none()
+    snapshot = await activity_cache.get_with(activity_id, db)
+    db_activity = snapshot.by_id.get(activity_id)
 
     if db_activity is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Activity with id {activity_id} not found."
         )
-    
-    descendants_result = await db.execute(
-    select(Activity).where(Activity.path.like(f"{db_activity.path}%")))
-    descendants = descendants_result.scalars().all()
 
-    activity_tree = await build_activity_tree(descendants, root_path=db_activity.path)
+    activity_tree = await build_activity_tree(snapshot.subtree(activity_id), root_path=db_activity.path)
 
     return activity_tree
 
+async def get_activity_tree_etag(activity_id: int, db: AsyncSession) -> Optional[str]:
+    """
+    Возвращает ETag поддерева по версиям его узлов в том же снимке, из которого строится ответ.
+    Если вид деятельности не найден, возвращает None.
+    """
+    snapshot = await activity_cache.get_with(activity_id, db)
+    if activity_id not in snapshot.by_id:
+        return None
+
+    return make_etag("activity_tree", tuple((node.id, node.version) for node in snapshot.subtree(activity_id)))
+
 async def delete_activity(activity_id: int, db: AsyncSession):
     """
     Удаляет вид деятельности и все его дочерние виды.
@@ -97,50 +120,119 @@ async def delete_activity(activity_id: int, db: AsyncSession):
             detail=f"Activity with id {activity_id} not found."
         )
     
-    path_pattern = f"{db_activity.path}%"
-
-    await db.execute(delete(Activity).where(Activity.path.like(path_pattern)))
+    # Строки замыкания удаляются каскадно вместе с видами деятельности, связи с организациями - явно
+    subtree_ids = activity_subtree_ids(activity_id)
+    result = await db.execute(
+        delete(organizations_activities)
+        .where(organizations_activities.c.activity_id.in_(subtree_ids))
+        .returning(organizations_activities.c.organization_id)
+    )
+    organization_ids = result.scalars().all()
+    await db.execute(delete(Activity).where(Activity.id.in_(subtree_ids)))
+    await refresh_organization_search(organization_ids, db)
     await db.commit()
+    await response_cache.invalidate("activities", "act_org")
+    await activity_cache.rebuild(db)
 
     return {"detail": f"Activity '{db_activity.name}' and its descendants have been deleted."}
 
-async def update_activity() -> ActivitySchema:
-    ...
-    return
-
-"""При обновлении path у вида деятельности необходимо менять пути у всех его дочерних элементов"""
-
-# async def update_activity(
-#     activity_id: int,
-#     update_data: ActivityUpdateSchema,
-#     db: AsyncSession
-# ) -> ActivitySchema:
-#     """
-#     Обновляет вид деятельности по id.
-#     Если вид деятельности не найден — 404.
-#     Обновляет только переданные поля.
-#     """
-#     result = await db.execute(select(Activity).where(Activity.id == activity_id))
-#     db_activity = result.scalar_one_or_none()
-
-#     if db_activity is None:
-#         raise HTTPException(
-#             status_code=status.HTTP_404_NOT_FOUND,
-#             detail=f"Activity with id {activity_id} not found."
-#         )
-    
-#     update_data.name = db_activity.name
-    
-#     update_data = ActivityBaseSchema(
-#         name=db_activity.name,
-#         path=await get_path(update_data, db)
-#     )
+async def update_activity(
+    activity_id: int,
+    update_data: ActivityUpdateSchema,
+    db: AsyncSession
+) -> ActivitySchema:
+    """
+    Обновляет вид деятельности по id.
+    Если вид деятельности не найден — 404.
+    При смене имени или родителя пересчитывает path у всего поддерева
+    и перестраивает связи поддерева в таблице замыкания.
+    """
+    result = await db.execute(select(Activity).where(Activity.id == activity_id))
+    db_activity = result.scalar_one_or_none()
+
+    if db_activity is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Activity with id {activity_id} not found."
+        )
+
+    # Проверки поддерева и нового пути идут по свежему снимку: кэш может не знать о записях других процессов
+    snapshot = await activity_cache.rebuild(db)
+    node = snapshot.by_id[activity_id]
+
+    fields = update_data.model_dump(exclude_unset=True)
+    name = fields.get("name") or db_activity.name
+    parent_id = fields["parent_id"] if "parent_id" in fields else node.parent_id
+
+    if parent_id is not None and parent_id in node.descendant_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Activity with id {parent_id} is a descendant of activity {activity_id}."
+        )
+
+    old_path = db_activity.path
+    new_path = old_path
+    if parent_id != node.parent_id or transliterate(name) != old_path.rsplit('.', 1)[-1]:
+        new_path = await get_path(ActivityBaseSchema(name=name, parent_id=parent_id), db)
+
+    old_depth = old_path.count('.')
+    subtree_height = max(snapshot.by_id[i].path.count('.') for i in node.descendant_ids) - old_depth
+    if new_path.count('.') + subtree_height + 1 > MAX_ACTIVITY_DEPTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Maximum activity tree depth ({MAX_ACTIVITY_DEPTH}) exceeded."
+        )
+
+    db_activity.name = name
+    db_activity.version = Activity.version + 1
+
+    if new_path != old_path:
+        await db.execute(
+            update(Activity)
+            .where(Activity.id.in_(activity_subtree_ids(activity_id)))
+            .values(
+                path=func.concat(new_path, func.substr(Activity.path, len(old_path) + 1)),
+                version=Activity.version + 1
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    if parent_id != node.parent_id:
+        # Отвязываем поддерево от прежних предков и привязываем к предкам нового родителя
+        await db.execute(
+            delete(activity_closure)
+            .where(activity_closure.c.descendant_id.in_(activity_subtree_ids(activity_id)))
+            .where(activity_closure.c.ancestor_id.not_in(activity_subtree_ids(activity_id)))
+        )
 
-#     for field, value in update_data.model_dump(exclude_unset=True).items():
-#         setattr(db_activity, field, value)
+        if parent_id is not None:
+            parents = activity_closure.alias("parents")
+            subtree = activity_closure.alias("subtree")
+            await db.execute(
+                insert(activity_closure).from_select(
+                    ["ancestor_id", "descendant_id", "depth"],
+                    select(
+                        parents.c.ancestor_id,
+                        subtree.c.descendant_id,
+                        parents.c.depth + subtree.c.depth + 1
+                    )
+                    .select_from(parents)
+                    .join(subtree, true())
+                    .where(parents.c.descendant_id == parent_id)
+                    .where(subtree.c.ancestor_id == activity_id)
+                )
+            )
+
+        # Предки поддерева изменились у всех организаций, связанных с ним
+        await refresh_organization_search(
+            select(organizations_activities.c.organization_id)
+            .where(organizations_activities.c.activity_id.in_(activity_subtree_ids(activity_id))),
+            db
+        )
 
-#     db.add(db_activity)
-#     await db.commit()
-#     await db.refresh(db_activity)
+    await db.commit()
+    await response_cache.invalidate("activities")
+    await db.refresh(db_activity)
+    await activity_cache.rebuild(db)
 
-#     return ActivitySchema.model_validate(db_activity)
+    return ActivitySchema(id=db_activity.id, name=db_activity.name, parent_id=parent_id)
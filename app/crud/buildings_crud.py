@@ -1,8 +1,13 @@
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.models import Building
+from typing import Optional, AsyncIterator
+from app.models import Building, Organization
 from app.schemas import BuildingBaseSchema, BuildingSchema, BuildingUpdateSchema
+from app.utils import make_etag, stream_ndjson, PAGE_SIZE_DEFAULT, STREAM_BATCH_SIZE
+from app.response_cache import response_cache
+from app.crud.clusters_crud import move_building_clusters
+from app.crud.search_crud import refresh_organization_search
 
 async def create_building(building_data: BuildingBaseSchema, db: AsyncSession) -> BuildingSchema:
     """
@@ -19,6 +24,7 @@ async def create_building(building_data: BuildingBaseSchema, db: AsyncSession) -
 
     db.add(db_building)
     await db.commit()
+    await response_cache.invalidate("buildings")
     await db.refresh(db_building)
 
     return BuildingSchema.model_validate(db_building)
@@ -40,18 +46,53 @@ async def get_building(building_id: int, db: AsyncSession) -> BuildingSchema:
 
     return BuildingSchema.model_validate(db_building)
 
-async def get_buildings_list(db: AsyncSession) -> list[BuildingSchema]:
+async def get_building_etag(building_id: int, db: AsyncSession) -> Optional[str]:
     """
-    Получает список всех зданий.
+    Возвращает ETag здания по его версии или None, если здание не найдено.
     """
-    result = await db.execute(select(Building))
+    result = await db.execute(select(Building.version).where(Building.id == building_id))
+    version = result.scalar_one_or_none()
+
+    return None if version is None else make_etag("building", building_id, version)
+
+def building_list_query(after: Optional[int] = None):
+    """
+    Запрос зданий по возрастанию id, начиная после указанного id (keyset-пагинация).
+    """
+    query = select(Building).order_by(Building.id)
+    if after is not None:
+        query = query.where(Building.id > after)
+
+    return query
+
+async def get_buildings_list(
+    db: AsyncSession,
+    limit: int = PAGE_SIZE_DEFAULT,
+    after: Optional[int] = None
+) -> list[BuildingSchema]:
+    """
+    Получает страницу зданий: не более limit записей с id больше after.
+    """
+    result = await db.execute(building_list_query(after).limit(limit))
 
     buildings = result.scalars().all()
 
     return [BuildingSchema.model_validate(building) for building in buildings]
 
+async def stream_buildings_list(db: AsyncSession, after: Optional[int] = None) -> AsyncIterator[bytes]:
+    """
+    Отдает все здания с id больше after в формате NDJSON через серверный курсор.
+    """
+    result = await db.stream(
+        building_list_query(after).execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
+
+    async for line in stream_ndjson(result.scalars(), BuildingSchema):
+        yield line
+
 async def delete_building(building_id: int, db: AsyncSession) -> BuildingSchema:
-    result = await db.execute(select(Building).where(Building.id == building_id))
+    # Блокировка строки здания до вычитания его точки из кластеров (см. move_building_clusters)
+    result = await db.execute(select(Building).where(Building.id == building_id).with_for_update())
     db_building = result.scalar_one_or_none()
 
     if db_building is None:
@@ -60,8 +101,14 @@ async def delete_building(building_id: int, db: AsyncSession) -> BuildingSchema:
             detail=f"Building with id {building_id} not found."
         )
     
+    # Организации здания остаются без здания и выходят из кластеров карты
+    await move_building_clusters(db_building.id, db_building.latitude, db_building.longitude, -1, db)
+    result = await db.execute(select(Organization.id).where(Organization.building_id == building_id))
+    organization_ids = result.scalars().all()
     await db.delete(db_building)
+    await refresh_organization_search(organization_ids, db)
     await db.commit()
+    await response_cache.invalidate("buildings")
 
     return {"detail": f"Building with id {building_id} deleted successfully."}
 
@@ -75,7 +122,8 @@ async def update_building(
     Если здание не найдено — 404.
     Обновляет только переданные поля.
     """
-    result = await db.execute(select(Building).where(Building.id == building_id))
+    # Блокировка строки здания до чтения прежних координат для кластеров (см. move_building_clusters)
+    result = await db.execute(select(Building).where(Building.id == building_id).with_for_update())
     db_building = result.scalar_one_or_none()
 
     if db_building is None:
@@ -84,11 +132,27 @@ async def update_building(
             detail=f"Building with id {building_id} not found."
         )
 
+    location_changed = any(
+        field in update_data.model_fields_set and getattr(update_data, field) != getattr(db_building, field)
+        for field in ("latitude", "longitude")
+    )
+    if location_changed:
+        await move_building_clusters(db_building.id, db_building.latitude, db_building.longitude, -1, db)
+
     for field, value in update_data.model_dump(exclude_unset=True).items():
         setattr(db_building, field, value)
+    db_building.version = Building.version + 1
+
+    if location_changed:
+        await move_building_clusters(db_building.id, db_building.latitude, db_building.longitude, 1, db)
+        await refresh_organization_search(
+            select(Organization.id).where(Organization.building_id == building_id),
+            db
+        )
 
     db.add(db_building)
     await db.commit()
+    await response_cache.invalidate("buildings")
     await db.refresh(db_building)
 
     return BuildingSchema.model_validate(db_building)
\ No newline at end of file
@@ -0,0 +1,152 @@
+from fastapi import HTTPException, status
+from sqlalchemy import Float, Integer, func, literal, text, true, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.sql import Select
+from typing import List
+from app.models import Building, Organization, OrganizationCluster
+from app.schemas import ClusterSchema
+
+CLUSTER_MAX_ZOOM = 18 # Максимальный уровень масштаба карты, для которого хранятся кластеры
+CLUSTER_GRID_SHIFT = 3 # Тайл делится на 2^3 x 2^3 ячеек, поэтому в ответе не больше 64 кластеров
+MERCATOR_MAX_LATITUDE = 85.0511287798 # Границы квадратной карты в проекции Меркатора
+
+def cell_index(coordinate, cells):
+    """
+    Номер ячейки по нормированной координате 0..1, с ограничением краями карты.
+    """
+    return func.least(func.greatest(func.floor(coordinate * cells), 0), cells - 1).cast(Integer)
+
+async def adjust_clusters(points: Select, db: AsyncSession) -> None:
+    """
+    Прибавляет к кластерам всех уровней масштаба организации из points.
+    points — запрос со столбцами (latitude, longitude, organizations), где organizations может быть
+    отрицательным при удалении или переносе. Кластеры, в которых не осталось организаций, удаляются.
+    Изменения выполняются в текущей транзакции, фиксирует их вызывающая функция.
+    """
+    points = points.subquery("points")
+    zooms = func.generate_series(0, CLUSTER_MAX_ZOOM).table_valued("zoom").render_derived()
+    zoom = zooms.c.zoom
+    cells = func.power(2, zoom + CLUSTER_GRID_SHIFT).cast(Integer)
+    latitude = func.least(func.greatest(points.c.latitude, -MERCATOR_MAX_LATITUDE), MERCATOR_MAX_LATITUDE)
+
+    cell_x = cell_index((points.c.longitude + 180) / 360, cells)
+    cell_y = cell_index((1 - func.asinh(func.tan(func.radians(latitude))) / func.pi()) / 2, cells)
+
+    deltas = (
+        select(
+            zoom.label("zoom"),
+            cell_x.label("cell_x"),
+            cell_y.label("cell_y"),
+            func.sum(points.c.organizations).label("organizations"),
+            func.sum(points.c.organizations * points.c.latitude).label("latitude_sum"),
+            func.sum(points.c.organizations * points.c.longitude).label("longitude_sum"),
+        )
+        .select_from(points.join(zooms, true()))
+        .where(points.c.latitude.is_not(None), points.c.longitude.is_not(None))
+        .group_by(zoom, cell_x, cell_y)
+        # Единый порядок блокировки строк, чтобы параллельные записи не взаимоблокировались
+        .order_by(zoom, cell_x, cell_y)
+    )
+
+    upsert = pg_insert(OrganizationCluster).from_select(
+        ["zoom", "cell_x", "cell_y", "organizations", "latitude_sum", "longitude_sum"], deltas
+    )
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[OrganizationCluster.zoom, OrganizationCluster.cell_x, OrganizationCluster.cell_y],
+        set_={
+            "organizations": OrganizationCluster.organizations + upsert.excluded.organizations,
+            "latitude_sum": OrganizationCluster.latitude_sum + upsert.excluded.latitude_sum,
+            "longitude_sum": OrganizationCluster.longitude_sum + upsert.excluded.longitude_sum,
+        }
+    ).returning(OrganizationCluster.zoom, OrganizationCluster.cell_x, OrganizationCluster.cell_y, OrganizationCluster.organizations)
+
+    result = await db.execute(upsert)
+    empty = [(row.zoom, row.cell_x, row.cell_y) for row in result.all() if row.organizations <= 0]
+    if empty:
+        await db.execute(
+            OrganizationCluster.__table__.delete().where(
+                tuple_(OrganizationCluster.zoom, OrganizationCluster.cell_x, OrganizationCluster.cell_y).in_(empty)
+            )
+        )
+
+async def adjust_building_clusters(building_id: int, organizations: int, db: AsyncSession) -> None:
+    """
+    Учитывает в кластерах organizations организаций (может быть отрицательным) в здании building_id.
+    """
+    await adjust_clusters(
+        select(Building.latitude, Building.longitude, literal(organizations).label("organizations"))
+        .where(Building.id == building_id),
+        db
+    )
+
+async def move_building_clusters(
+    building_id: int,
+    latitude: float,
+    longitude: float,
+    sign: int,
+    db: AsyncSession
+) -> None:
+    """
+    Учитывает в кластерах все организации здания в точке (latitude, longitude) со знаком sign.
+    Нужна при изменении координат здания: старая точка вычитается, новая прибавляется.
+    Вызывающая функция читает координаты здания с SELECT ... FOR UPDATE: иначе два параллельных переноса
+    вычтут одну и ту же старую точку. Эта же блокировка ждет транзакции, которые ссылаются на здание
+    из organizations (FOR KEY SHARE при проверке внешнего ключа), поэтому число организаций здания актуально.
+    """
+    await adjust_clusters(
+        select(
+            literal(latitude, Float).label("latitude"),
+            literal(longitude, Float).label("longitude"),
+            (sign * func.count()).label("organizations")
+        )
+        .where(Organization.building_id == building_id)
+        .having(func.count() > 0),
+        db
+    )
+
+async def rebuild_clusters(db: AsyncSession) -> None:
+    """
+    Пересчитывает кластеры по всем организациям. Нужна после загрузки данных в обход crud-функций.
+    """
+    await db.execute(text("TRUNCATE organization_clusters"))
+    await adjust_clusters(
+        select(Building.latitude, Building.longitude, func.count().label("organizations"))
+        .join(Organization, Organization.building_id == Building.id)
+        .group_by(Building.id),
+        db
+    )
+    await db.commit()
+
+async def get_tile_clusters(zoom: int, x: int, y: int, db: AsyncSession) -> List[ClusterSchema]:
+    """
+    Получает кластеры организаций в тайле (zoom, x, y) карты в проекции Меркатора.
+    Тайл делится на сетку 2^CLUSTER_GRID_SHIFT x 2^CLUSTER_GRID_SHIFT ячеек; для каждой непустой ячейки
+    возвращаются число организаций и их центр, поэтому размер ответа не зависит от числа точек.
+    """
+    tiles = 2 ** zoom
+    if not (0 <= x < tiles and 0 <= y < tiles):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tile {x}/{y} is outside the map at zoom {zoom}."
+        )
+
+    result = await db.execute(
+        select(OrganizationCluster)
+        .where(
+            OrganizationCluster.zoom == zoom,
+            OrganizationCluster.cell_x.between(x << CLUSTER_GRID_SHIFT, ((x + 1) << CLUSTER_GRID_SHIFT) - 1),
+            OrganizationCluster.cell_y.between(y << CLUSTER_GRID_SHIFT, ((y + 1) << CLUSTER_GRID_SHIFT) - 1),
+        )
+        .order_by(OrganizationCluster.cell_y, OrganizationCluster.cell_x)
+    )
+
+    return [
+        ClusterSchema(
+            organizations=cluster.organizations,
+            latitude=cluster.latitude_sum / cluster.organizations,
+            longitude=cluster.longitude_sum / cluster.organizations,
+        )
+        for cluster in result.scalars().all()
+    ]
@@ -0,0 +1,455 @@
+import codecs
+import csv
+import json
+from collections import deque
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Mapping, Optional, Tuple, Type
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from sqlalchemy import column as sa_column, func, select, table as sa_table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas import (
+    ActOrgSchema,
+    BuildingImportSchema,
+    ImportErrorSchema,
+    ImportResultSchema,
+    OrganizationImportSchema,
+    PhoneImportSchema
+)
+from app.models import Building
+from app.response_cache import response_cache
+from app.crud.clusters_crud import adjust_clusters
+from app.crud.search_crud import index_new_organizations, refresh_organization_search
+from app.utils import to_e164
+
+IMPORT_BATCH_SIZE = 10000 # Записей в одной пачке валидации и COPY
+IMPORT_MAX_ERRORS = 1000 # Максимум ошибок в ответе; остальные только подсчитываются
+
+class ImportEntity(str, Enum):
+    buildings = "buildings"
+    organizations = "organizations"
+    phones = "phones"
+    act_org = "act_org"
+
+class ImportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+@dataclass(frozen=True)
+class ImportSpec:
+    """
+    Описание импортируемой сущности: целевая таблица, схема валидации и внешние ключи.
+    """
+    table: str
+    name: str # Название сущности для сообщений об ошибках
+    schema: Type[BaseModel]
+    columns: Tuple[str, ...] # Колонки таблицы без id
+    foreign_keys: Tuple[Tuple[str, str, str], ...] # (колонка, таблица, название сущности для ошибки)
+    has_id: bool
+    cache_tag: str
+    unique_columns: Tuple[str, ...] = () # Уникальные колонки, кроме id
+    derived: Mapping[str, Callable[[Any], Any]] = field(default_factory=dict) # Колонки, вычисляемые из записи
+    after_insert: Optional[Callable[[AsyncSession], Awaitable[None]]] = None # Обновление производных данных в той же транзакции
+
+async def cluster_imported_organizations(db: AsyncSession) -> None:
+    """
+    Добавляет импортированные организации в кластеры карты и в organization_search.
+    После проверок в промежуточной таблице остаются только вставленные записи.
+    """
+    staging = sa_table("import_staging", sa_column("building_id"))
+    await adjust_clusters(
+        select(Building.latitude, Building.longitude, func.count().label("organizations"))
+        .join(staging, staging.c.building_id == Building.id)
+        .group_by(Building.id),
+        db
+    )
+    await index_new_organizations(db)
+
+async def refresh_imported_organizations(db: AsyncSession) -> None:
+    """
+    Пересчитывает строки organization_search организаций, к которым загрузка добавила телефоны
+    или виды деятельности.
+    """
+    staging = sa_table("import_staging", sa_column("organization_id"))
+    await refresh_organization_search(
+        select(staging.c.organization_id).where(staging.c.organization_id.is_not(None)),
+        db
+    )
+
+IMPORT_SPECS: Dict[ImportEntity, ImportSpec] = {
+    ImportEntity.buildings: ImportSpec(
+        table="buildings",
+        name="Building",
+        schema=BuildingImportSchema,
+        columns=("country", "city", "street", "house_number", "latitude", "longitude"),
+        foreign_keys=(),
+        has_id=True,
+        cache_tag="buildings"
+    ),
+    ImportEntity.organizations: ImportSpec(
+        table="organizations",
+        name="Organization",
+        schema=OrganizationImportSchema,
+        columns=("name", "building_id"),
+        foreign_keys=(("building_id", "buildings", "Building"),),
+        has_id=True,
+        cache_tag="organizations",
+        after_insert=cluster_imported_organizations
+    ),
+    ImportEntity.phones: ImportSpec(
+        table="phones",
+        name="Phone",
+        schema=PhoneImportSchema,
+        columns=("number", "number_e164", "organization_id"),
+        foreign_keys=(("organization_id", "organizations", "Organization"),),
+        has_id=True,
+        cache_tag="phones",
+        unique_columns=("number_e164",),
+        derived={"number_e164": lambda phone: to_e164(phone.number)},
+        after_insert=refresh_imported_organizations
+    ),
+    ImportEntity.act_org: ImportSpec(
+        table="organizations_activities",
+        name="Link",
+        schema=ActOrgSchema,
+        columns=("organization_id", "activity_id"),
+        foreign_keys=(
+            ("organization_id", "organizations", "Organization"),
+            ("activity_id", "activities", "Activity"),
+        ),
+        has_id=False,
+        cache_tag="act_org",
+        after_insert=refresh_imported_organizations
+    ),
+}
+
+class ImportReport:
+    """
+    Накопитель результата импорта с ограничением на число сохраняемых ошибок.
+    """
+
+    def __init__(self):
+        self.received = 0
+        self.errors_total = 0
+        self.errors: List[ImportErrorSchema] = []
+
+    def error(self, line: int, detail: str) -> None:
+        self.errors_total += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append(ImportErrorSchema(line=line, detail=detail))
+
+async def read_line_batches(chunks: AsyncIterator[bytes]) -> AsyncIterator[List[Tuple[int, bytes]]]:
+    """
+    Разбивает поток байтов на пачки пронумерованных непустых строк.
+    """
+    buffer = b""
+    batch = []
+    line_number = 0
+
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                batch.append((line_number, line.rstrip(b"\r")))
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+
+    if buffer.strip():
+        batch.append((line_number + 1, buffer.rstrip(b"\r")))
+    if batch:
+        yield batch
+
+class LineFeed:
+    """
+    Источник строк для csv.reader, пополняемый по мере чтения потока.
+    Когда строки кончаются, итерация останавливается, а после пополнения продолжается с того же места.
+    """
+
+    def __init__(self):
+        self.lines = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+async def read_csv_batches(chunks: AsyncIterator[bytes]) -> AsyncIterator[List[Tuple[int, Any]]]:
+    """
+    Разбирает поток CSV одним csv.reader в пачки записей (номер первой строки записи, значения полей).
+    Поля в кавычках могут содержать переводы строк. Строки передаются читателю только целыми записями:
+    запись заканчивается на строке, после которой в ней четное число кавычек. Вместо значений
+    записи, которую не удалось разобрать (в том числе с незакрытой к концу потока кавычкой),
+    в пачку попадает исключение csv.Error.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    feed = LineFeed()
+    reader = csv.reader(feed)
+    pending: List[str] = [] # Строки незавершенной записи
+    quotes = 0
+    buffer = ""
+    batch = []
+
+    def read_records() -> None:
+        while feed.lines:
+            line_number = reader.line_num + 1
+            try:
+                values = next(reader)
+            except csv.Error as exc:
+                batch.append((line_number, exc))
+                continue
+            # Пустые строки между записями пропускаются, как и в NDJSON
+            if values and (len(values) > 1 or values[0].strip()):
+                batch.append((line_number, values))
+
+    def add_line(line: str) -> None:
+        nonlocal quotes
+        pending.append(line)
+        quotes += line.count('"')
+        if quotes % 2 == 0:
+            feed.lines.extend(pending)
+            pending.clear()
+            quotes = 0
+
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            add_line(line + "\n")
+        read_records()
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+
+    # Последняя запись без завершающего перевода строки
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        add_line(buffer)
+    read_records()
+    # Незакрытая кавычка: csv.reader склеил бы все строки до конца потока в одно поле
+    if pending:
+        batch.append((reader.line_num + 1, csv.Error("unexpected end of data: unclosed quote")))
+    if batch:
+        yield batch
+
+def parse_ndjson(batch: List[Tuple[int, bytes]], report: ImportReport) -> List[Tuple[int, dict]]:
+    records = []
+    for line_number, line in batch:
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            report.error(line_number, f"Invalid JSON: {exc}.")
+            continue
+        if not isinstance(record, dict):
+            report.error(line_number, "Expected a JSON object.")
+            continue
+        records.append((line_number, record))
+    return records
+
+def parse_csv(batch: List[Tuple[int, Any]], header: List[str], report: ImportReport) -> List[Tuple[int, dict]]:
+    records = []
+    for line_number, values in batch:
+        if isinstance(values, csv.Error):
+            report.error(line_number, f"Invalid CSV: {values}.")
+            continue
+        if len(values) != len(header):
+            report.error(line_number, f"Expected {len(header)} columns, got {len(values)}.")
+            continue
+        # Пустое значение в CSV означает отсутствие поля, чтобы применилось значение по умолчанию
+        records.append((line_number, {key: value for key, value in zip(header, values) if value != ""}))
+    return records
+
+def format_validation_error(error: dict) -> str:
+    field = ".".join(str(part) for part in error["loc"])
+    return f"{field}: {error['msg']}" if field else error["msg"]
+
+def to_rows(spec: ImportSpec, models: List[Tuple[int, BaseModel]]) -> List[tuple]:
+    """
+    Превращает провалидированные записи в кортежи колонок промежуточной таблицы.
+    """
+    rows = []
+    for line_number, model in models:
+        values = tuple(
+            spec.derived[column](model) if column in spec.derived else getattr(model, column)
+            for column in spec.columns
+        )
+        rows.append((line_number, model.id, *values) if spec.has_id else (line_number, *values))
+    return rows
+
+def validate_batch(
+    records: List[Tuple[int, dict]],
+    spec: ImportSpec,
+    adapter: TypeAdapter,
+    report: ImportReport
+) -> List[tuple]:
+    """
+    Валидирует пачку записей одним вызовом Pydantic.
+    Записи с ошибками попадают в отчет, остальные загружаются.
+    """
+    try:
+        models = adapter.validate_python([record for _, record in records])
+        return to_rows(spec, [(line_number, model) for (line_number, _), model in zip(records, models)])
+    except ValidationError as exc:
+        invalid: Dict[int, List[str]] = {}
+        for error in exc.errors(include_url=False):
+            index, *loc = error["loc"]
+            invalid.setdefault(index, []).append(format_validation_error({**error, "loc": loc}))
+
+    valid = []
+    for index, (line_number, record) in enumerate(records):
+        if index in invalid:
+            report.error(line_number, "; ".join(invalid[index]))
+        else:
+            valid.append((line_number, spec.schema.model_validate(record)))
+    return to_rows(spec, valid)
+
+def validate_ndjson_batch(
+    batch: List[Tuple[int, bytes]],
+    spec: ImportSpec,
+    adapter: TypeAdapter,
+    report: ImportReport
+) -> List[tuple]:
+    """
+    Разбирает и валидирует пачку NDJSON одним вызовом validate_json в pydantic-core, без json.loads.
+    Если в пачке есть ошибки, она проверяется построчно, чтобы сообщить номер каждой ошибочной строки.
+    """
+    try:
+        models = adapter.validate_json(b"[" + b",".join(line for _, line in batch) + b"]")
+    except ValidationError:
+        models = None
+
+    # Строка с несколькими значениями через запятую тоже дала бы корректный массив
+    if models is None or len(models) != len(batch):
+        return validate_batch(parse_ndjson(batch, report), spec, adapter, report)
+
+    return to_rows(spec, [(line_number, model) for (line_number, _), model in zip(batch, models)])
+
+async def reject(db: AsyncSession, sql: str, detail: str, report: ImportReport) -> None:
+    """
+    Удаляет из промежуточной таблицы строки, найденные запросом, и записывает их в отчет.
+    Запрос должен возвращать line и value.
+    """
+    result = await db.execute(text(sql))
+    for line_number, value in sorted(result.all()):
+        report.error(line_number, detail.format(value=value))
+
+async def import_records(
+    entity: ImportEntity,
+    chunks: AsyncIterator[bytes],
+    data_format: ImportFormat,
+    db: AsyncSession,
+    dry_run: bool = False
+) -> ImportResultSchema:
+    """
+    Импортирует записи одной сущности из NDJSON или CSV.
+    Записи валидируются пачками существующими схемами и загружаются через COPY
+    в промежуточную таблицу; дубликаты и внешние ключи проверяются одним запросом на всю выборку.
+    Записи с ошибками пропускаются и возвращаются в отчете, остальные добавляются одной транзакцией.
+    При dry_run все проверки и вставки выполняются, но транзакция откатывается.
+    """
+    spec = IMPORT_SPECS[entity]
+    adapter = TypeAdapter(List[spec.schema])
+    report = ImportReport()
+    staging_columns = ("line", "id", *spec.columns) if spec.has_id else ("line", *spec.columns)
+
+    # Типы колонок промежуточной таблицы берутся из целевой таблицы
+    await db.execute(text(
+        f"CREATE TEMP TABLE import_staging ON COMMIT DROP AS "
+        f"SELECT 0 AS line, {', '.join(staging_columns[1:])} FROM {spec.table} WITH NO DATA"
+    ))
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    driver_connection = raw_connection.driver_connection
+
+    header: Optional[List[str]] = None
+    batches = read_csv_batches(chunks) if data_format == ImportFormat.csv else read_line_batches(chunks)
+    async for batch in batches:
+        if data_format == ImportFormat.csv:
+            if header is None:
+                header_line, header = batch[0]
+                batch = batch[1:]
+                if isinstance(header, csv.Error):
+                    report.error(header_line, f"Invalid CSV header: {header}.")
+                    header = []
+            rows = validate_batch(parse_csv(batch, header, report), spec, adapter, report)
+        else:
+            rows = validate_ndjson_batch(batch, spec, adapter, report)
+
+        report.received += len(batch)
+        if rows:
+            await driver_connection.copy_records_to_table("import_staging", records=rows, columns=staging_columns)
+
+    for column in (("id",) if spec.has_id else ()) + spec.unique_columns:
+        await reject(
+            db,
+            f"DELETE FROM import_staging s USING import_staging f "
+            f"WHERE s.{column} = f.{column} AND s.line > f.line RETURNING s.line, s.{column}",
+            f"Duplicate {column} {{value}} in import data.",
+            report
+        )
+        await reject(
+            db,
+            f"DELETE FROM import_staging s USING {spec.table} t "
+            f"WHERE s.{column} = t.{column} RETURNING s.line, s.{column}",
+            f"{spec.name} with {column} {{value}} already exists.",
+            report
+        )
+
+    for column, table, name in spec.foreign_keys:
+        await reject(
+            db,
+            f"DELETE FROM import_staging s WHERE s.{column} IS NOT NULL "
+            f"AND NOT EXISTS (SELECT 1 FROM {table} r WHERE r.id = s.{column}) RETURNING s.line, s.{column}",
+            f"{name} with id {{value}} does not exist.",
+            report
+        )
+
+    columns = ", ".join(spec.columns)
+    if spec.has_id:
+        result = await db.execute(text(
+            f"INSERT INTO {spec.table} (id, {columns}) "
+            f"SELECT id, {columns} FROM import_staging WHERE id IS NOT NULL ORDER BY line"
+        ))
+        inserted = result.rowcount
+        if inserted:
+            # Следующие автоматические id не должны пересекаться с явно заданными
+            await db.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{spec.table}', 'id'), "
+                f"(SELECT max(id) FROM {spec.table}))"
+            ))
+        result = await db.execute(text(
+            f"INSERT INTO {spec.table} ({columns}) "
+            f"SELECT {columns} FROM import_staging WHERE id IS NULL ORDER BY line"
+        ))
+        inserted += result.rowcount
+        skipped = 0
+    else:
+        result = await db.execute(text(
+            f"INSERT INTO {spec.table} ({columns}) "
+            f"SELECT DISTINCT {columns} FROM import_staging ON CONFLICT DO NOTHING"
+        ))
+        inserted = result.rowcount
+        skipped = report.received - report.errors_total - inserted
+
+    if spec.after_insert is not None and inserted:
+        await spec.after_insert(db)
+
+    if dry_run:
+        await db.rollback()
+    else:
+        await db.commit()
+        await response_cache.invalidate(spec.cache_tag)
+
+    return ImportResultSchema(
+        received=report.received,
+        inserted=inserted,
+        skipped=skipped,
+        errors_total=report.errors_total,
+        errors=sorted(report.errors, key=lambda error: error.line),
+        dry_run=dry_run
+    )
@@ -1,12 +1,31 @@
+import asyncio
+import math
 from fastapi import HTTPException, status
-from sqlalchemy import func, and_
+from sqlalchemy import Text, and_, func, or_, literal_column, null
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
-from typing import List
-from app.models import Organization, Building
-from app.schemas import OrganizationBaseSchema, OrganizationSchema, OrganizationUpdateSchema
-from app.utils import organizations_to_list
+from typing import Awaitable, Dict, FrozenSet, List, Optional, Set, Tuple, Type, Union, AsyncIterator
+from pydantic import BaseModel
+from app.models import (
+    Organization, OrganizationSearch, Building, Phone, Activity, organizations_activities,
+    EARTH_RADIUS_M, mercator_point, mercator_xy
+)
+from app.schemas import (
+    ActivitySchema, BuildingSchema, PhoneSchema,
+    OrganizationBaseSchema, OrganizationSchema, OrganizationUpdateSchema, OrganizationSearchSchema, OrganizationNearbySchema,
+    OrganizationMatchSchema
+)
+from app.metrics import timed_phase
+from app.utils import escape_like, make_etag, PAGE_SIZE_DEFAULT, STREAM_BATCH_SIZE
+from app.response_cache import response_cache
+from app.crud.clusters_crud import adjust_building_clusters
+from app.crud.search_crud import refresh_organization_search, name_prefix_query
+from app.crud.act_org_crud import organization_activity_filter
+
+MERCATOR_WORLD_WIDTH_M = 2 * math.pi * EARTH_RADIUS_M # Ширина карты в проекции Меркатора, м
+NEARBY_CANDIDATES_FACTOR = 2 # Во сколько раз больше limit кандидатов отбирается KNN до точной сортировки
 
 async def create_organization(organization_data: OrganizationBaseSchema, db: AsyncSession) -> OrganizationSchema:
     """
@@ -28,26 +47,99 @@ async def create_organization(organization_data: OrganizationBaseSchema, db: Asy
     )
 
     db.add(db_organization)
+    if organization_data.building_id is not None:
+        await adjust_building_clusters(organization_data.building_id, 1, db)
+    await db.flush()
+    await refresh_organization_search([db_organization.id], db)
     await db.commit()
+    await response_cache.invalidate("organizations")
     await db.refresh(
         db_organization,
-        attribute_names=['phones', 'activities']
+        attribute_names=['phones', 'activities', 'building']
     )
 
     return OrganizationSchema.model_validate(db_organization)
 
-async def get_organization_by_id(organization_id: int, db: AsyncSession) -> OrganizationSchema:
+# Связи карточки организации, которые загружаются отдельными запросами
+ORGANIZATION_RELATIONSHIPS = {
+    "phones": Organization.phones,
+    "activities": Organization.activities,
+    "building": Organization.building,
+}
+
+def organization_load_options(fields: Optional[FrozenSet[str]] = None) -> list:
+    """
+    Опции selectinload для связей, входящих в fields; None означает все связи.
+    """
+    return [
+        selectinload(relationship)
+        for name, relationship in ORGANIZATION_RELATIONSHIPS.items()
+        if fields is None or name in fields
+    ]
+
+def organization_to_schema(db_organization: Organization, fields: Optional[FrozenSet[str]] = None) -> OrganizationSchema:
+    """
+    Преобразует организацию в схему. Если задан fields, читаются только эти поля,
+    остальные получают значения по умолчанию и отбрасываются при ответе (fields_response).
+    """
+    if fields is None:
+        return OrganizationSchema.model_validate(db_organization)
+
+    return OrganizationSchema.model_validate(
+        {name: getattr(db_organization, name) for name in fields},
+        from_attributes=True
+    )
+
+def json_object(schema: Type[BaseModel], model, fields: Optional[FrozenSet[str]] = None, **values):
+    """
+    json_build_object с ключами в порядке полей schema, как их выводит pydantic.
+    Значения берутся из values, иначе из одноименных столбцов model; полям, которых у модели нет, соответствует null.
+    """
+    arguments = []
+    for name in schema.model_fields:
+        if fields is not None and name not in fields:
+            continue
+        value = values[name] if name in values else getattr(model, name, None)
+        arguments += [literal_column(f"'{name}'"), null() if value is None else value]
+
+    return func.json_build_object(*arguments)
+
+def organization_card_json(fields: Optional[FrozenSet[str]] = None):
+    """
+    Карточка организации в формате OrganizationSchema, собранная в Postgres: связи из fields
+    добавляются коррелированными подзапросами с json_agg, поэтому вся карточка строится одним запросом.
+    """
+    phones = (
+        select(func.coalesce(func.json_agg(aggregate_order_by(json_object(PhoneSchema, Phone), Phone.id)), literal_column("'[]'::json")))
+        .where(Phone.organization_id == Organization.id)
+        .scalar_subquery()
+    )
+    activities = (
+        select(func.coalesce(func.json_agg(aggregate_order_by(json_object(ActivitySchema, Activity), Activity.id)), literal_column("'[]'::json")))
+        .join(organizations_activities, organizations_activities.c.activity_id == Activity.id)
+        .where(organizations_activities.c.organization_id == Organization.id)
+        .scalar_subquery()
+    )
+    building = (
+        select(json_object(BuildingSchema, Building))
+        .where(Building.id == Organization.building_id)
+        .scalar_subquery()
+    )
+
+    return json_object(OrganizationSchema, Organization, fields, phones=phones, activities=activities, building=building)
+
+async def get_organization_by_id(
+    organization_id: int,
+    db: AsyncSession,
+    fields: Optional[FrozenSet[str]] = None
+) -> OrganizationSchema:
     """
-    Получает организацию по ее id.
+    Получает организацию по ее id; из связей загружаются только входящие в fields.
     Если организация не найдена, возвращает HTTP 404.
     """
     result = await db.execute(
     select(Organization)
-    .options(
-        selectinload(Organization.phones),
-        selectinload(Organization.activities),
-        selectinload(Organization.building)
-    )
+    .options(*organization_load_options(fields))
     .where(Organization.id == organization_id)
     )
     db_organization = result.scalar_one_or_none()
@@ -58,23 +150,152 @@ async def get_organization_by_id(organization_id: int, db: AsyncSession) -> Orga
             detail=f"Organization with id {organization_id} not found."
         )
 
-    return OrganizationSchema.model_validate(db_organization)
+    with timed_phase("validate"):
+        return organization_to_schema(db_organization, fields)
+
+async def get_organizations_by_ids(organization_ids: List[int], db: AsyncSession) -> Dict[int, OrganizationSchema]:
+    """
+    Получает организации по списку id: один запрос к organizations с IN (...)
+    и по одному запросу на телефоны, виды деятельности и здания, независимо от числа id.
+    Отсутствующие id в результат не попадают.
+    """
+    result = await db.execute(
+        select(Organization)
+        .options(*organization_load_options())
+        .where(Organization.id.in_(organization_ids))
+    )
+
+    with timed_phase("validate"):
+        return {
+            db_organization.id: OrganizationSchema.model_validate(db_organization)
+            for db_organization in result.scalars().all()
+        }
+
+class OrganizationLoader:
+    """
+    Загрузчик организаций в пределах одного запроса по образцу DataLoader.
+    Вызовы load, сделанные на одной итерации цикла событий (например, из asyncio.gather),
+    объединяются в один вызов get_organizations_by_ids; загруженные организации запоминаются до конца запроса.
+    """
 
-async def get_organization_by_name(organization_name: str, db: AsyncSession) -> OrganizationSchema:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self._futures: Dict[int, asyncio.Future] = {}
+        self._pending: List[int] = []
+        # Сессия не допускает параллельных запросов, поэтому пакеты загружаются по очереди
+        self._lock = asyncio.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def load(self, organization_id: int) -> Awaitable[Optional[OrganizationSchema]]:
+        """
+        Возвращает ожидание организации по id; None, если организации нет.
+        """
+        future = self._futures.get(organization_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._futures[organization_id] = loop.create_future()
+            if not self._pending:
+                loop.call_soon(self._schedule_dispatch)
+            self._pending.append(organization_id)
+
+        return future
+
+    async def load_many(self, organization_ids: List[int]) -> List[Optional[OrganizationSchema]]:
+        """
+        Загружает организации одним пакетом; порядок результата совпадает с organization_ids.
+        """
+        return list(await asyncio.gather(*(self.load(organization_id) for organization_id in organization_ids)))
+
+    def _schedule_dispatch(self) -> None:
+        # Ссылка на задачу хранится до ее завершения, иначе сборщик мусора может ее удалить
+        task = asyncio.ensure_future(self._dispatch())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self) -> None:
+        batch, self._pending = self._pending, []
+        futures = [self._futures[organization_id] for organization_id in batch]
+        try:
+            async with self._lock:
+                organizations = await get_organizations_by_ids(batch, self.db)
+        except BaseException as exc:
+            for organization_id, future in zip(batch, futures):
+                # Ошибку получают ожидающие этого пакета, а следующий load повторит запрос;
+                # при отмене задачи (CancelledError) ожидания отменяются, а не зависают
+                self._futures.pop(organization_id, None)
+                if not future.done():
+                    if isinstance(exc, Exception):
+                        future.set_exception(exc)
+                    else:
+                        future.cancel()
+            if not isinstance(exc, Exception):
+                raise
+            return
+
+        for organization_id, future in zip(batch, futures):
+            if not future.done():
+                future.set_result(organizations.get(organization_id))
+
+def versions_agg(id_column, version_column):
+    """
+    Агрегирует пары id:version связанных строк в одну строку, упорядоченную по id.
+    """
+    return func.string_agg(
+        func.concat(id_column, ":", version_column),
+        aggregate_order_by(literal_column("','"), id_column)
+    )
+
+async def get_organization_etag(
+    organization_id: int,
+    db: AsyncSession,
+    fields: Optional[FrozenSet[str]] = None
+) -> Optional[str]:
     """
-    Получает организацию по ее имени.
+    Возвращает ETag карточки организации одним запросом только по версиям:
+    организации, ее здания, телефонов и видов деятельности.
+    Набор полей fields входит в ETag, так как от него зависит содержимое ответа.
+    Если организация не найдена, возвращает None.
+    """
+    phones = (
+        select(versions_agg(Phone.id, Phone.version))
+        .where(Phone.organization_id == Organization.id)
+        .scalar_subquery()
+    )
+    activities = (
+        select(versions_agg(Activity.id, Activity.version))
+        .join(organizations_activities, organizations_activities.c.activity_id == Activity.id)
+        .where(organizations_activities.c.organization_id == Organization.id)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        select(Organization.version, Organization.building_id, Building.version, phones, activities)
+        .outerjoin(Building, Building.id == Organization.building_id)
+        .where(Organization.id == organization_id)
+    )
+    versions = result.one_or_none()
+
+    if versions is None:
+        return None
+
+    return make_etag("organization", organization_id, *versions, *sorted(fields or ()))
+
+async def get_organization_by_name(
+    organization_name: str,
+    db: AsyncSession,
+    fields: Optional[FrozenSet[str]] = None
+) -> OrganizationSchema:
+    """
+    Получает организацию по ее имени; из связей загружаются только входящие в fields.
     Если организация не найдена, возвращает HTTP 404.
     """
     result = await db.execute(
     select(Organization)
-    .options(
-        selectinload(Organization.phones),
-        selectinload(Organization.activities),
-        selectinload(Organization.building)
-    )
-    .where(func.lower(Organization.name) == organization_name.lower())
+    .options(*organization_load_options(fields))
+    .where(Organization.name.ilike(escape_like(organization_name)))
+    .order_by(Organization.id)
+    .limit(1)
     )
-    db_organization = result.scalar_one_or_none()
+    db_organization = result.scalars().first()
 
     if db_organization is None:
         raise HTTPException(
@@ -82,11 +303,34 @@ async def get_organization_by_name(organization_name: str, db: AsyncSession) ->
             detail=f"Organization with name {organization_name} not found."
         )
 
-    return OrganizationSchema.model_validate(db_organization)
+    with timed_phase("validate"):
+        return organization_to_schema(db_organization, fields)
+
+async def search_organizations_by_name(query: str, limit: int, db: AsyncSession) -> List[OrganizationSearchSchema]:
+    """
+    Ищет организации по части названия с ранжированием по триграммному сходству.
+    Оба условия отбора обслуживаются GIN-индексом ix_organizations_name_trgm.
+    """
+    similarity = func.similarity(Organization.name, query).label("similarity")
+
+    result = await db.execute(
+        select(Organization.id, Organization.name, similarity)
+        .where(
+            or_(
+                Organization.name.op("%")(query),
+                Organization.name.ilike(f"%{escape_like(query)}%")
+            )
+        )
+        .order_by(similarity.desc(), Organization.id)
+        .limit(limit)
+    )
+
+    return [OrganizationSearchSchema.model_validate(row) for row in result.all()]
 
 async def get_organizations_by_building_id(building_id: int, db: AsyncSession) -> List:
     """
     Получает список организаций в указанном здании.
+    Названия берутся из organization_search по индексу ix_organization_search_building_id.
     """
     result = await db.execute(select(Building).where(Building.id == building_id))
     building = result.scalar_one_or_none()
@@ -97,77 +341,393 @@ async def get_organizations_by_building_id(building_id: int, db: AsyncSession) -
         )
     
     result = await db.execute(
-        select(Organization)
-        .where(Organization.building_id == building_id)
+        select(OrganizationSearch.name)
+        .where(OrganizationSearch.building_id == building_id)
     )
-    organizations = result.scalars().all()
+    organizations_list = list(result.scalars().all())
 
-    if not organizations:
+    if not organizations_list:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"No organizations found for building_id {building_id}."
         )
-    
-    organizations_list = await organizations_to_list(organizations)
 
     return organizations_list
 
+def building_in_rectangle(lat_min: float, lon_min: float, lat_max: float, lon_max: float, place=Building):
+    """
+    Условие попадания здания в прямоугольную область.
+    place — сущность с координатами здания: Building или OrganizationSearch.
+    Сформулировано через point <@ box, чтобы использовать SP-GiST-индекс ix_buildings_location
+    (ix_organization_search_location).
+    """
+    return func.point(place.longitude, place.latitude).op("<@")(
+        func.box(func.point(lon_min, lat_min), func.point(lon_max, lat_max))
+    )
+
 async def get_organizations_in_rectangle(
     lat_min: float,
     lon_min: float,
     lat_max: float,
     lon_max: float,
-    db: AsyncSession
-) -> List[str]:
+    db: AsyncSession,
+    fields: Optional[FrozenSet[str]] = None
+) -> Union[List[str], List[OrganizationSchema]]:
     """
     Получает список организаций, расположенных в прямоугольной области,
     заданной двумя координатами (юго-запад и северо-восток).
+    Без fields возвращает названия, с fields — карточки только с этими полями.
+    Организации отбираются по organization_search без соединения со зданиями.
     """
-    result = await db.execute(
-        select(Organization)
-        .join(Organization.building)
-        .options(
-            selectinload(Organization.phones),
-            selectinload(Organization.activities),
-            selectinload(Organization.building)
+    in_rectangle = building_in_rectangle(lat_min, lon_min, lat_max, lon_max, OrganizationSearch)
+    if fields is None:
+        query = select(OrganizationSearch.name).where(in_rectangle)
+    else:
+        query = (
+            select(Organization)
+            .options(*organization_load_options(fields))
+            .join(OrganizationSearch, OrganizationSearch.organization_id == Organization.id)
+            .where(in_rectangle)
         )
-        .where(
-            and_(
-                Building.latitude >= lat_min,
-                Building.latitude <= lat_max,
-                Building.longitude >= lon_min,
-                Building.longitude <= lon_max
+
+    result = await db.execute(query)
+    organizations_list = list(result.scalars().all())
+
+    if not organizations_list:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No organizations found in the specified area."
+        )
+
+    if fields is None:
+        return organizations_list
+
+    with timed_phase("validate"):
+        return [organization_to_schema(org, fields) for org in organizations_list]
+
+def building_distance_m(latitude: float, longitude: float, place=Building):
+    """
+    Расстояние от здания до точки по дуге большого круга (формула гаверсинусов), м.
+    place — сущность с координатами здания: Building или OrganizationSearch.
+    """
+    half_dlat = func.radians(place.latitude - latitude) / 2
+    half_dlon = func.radians(place.longitude - longitude) / 2
+    haversine = (
+        func.power(func.sin(half_dlat), 2)
+        + math.cos(math.radians(latitude)) * func.cos(func.radians(place.latitude)) * func.power(func.sin(half_dlon), 2)
+    )
+    return 2 * EARTH_RADIUS_M * func.asin(func.least(1.0, func.sqrt(haversine)))
+
+def antimeridian_distance_m(latitude: float, longitude: float) -> float:
+    """
+    Расстояние от точки до антимеридиана (долгота ±180°) по дуге большого круга, м.
+    """
+    delta = math.radians(180 - abs(longitude))
+    if delta >= math.pi / 2:
+        # Ближайшая точка полумеридиана — полюс
+        return EARTH_RADIUS_M * (math.pi / 2 - math.radians(abs(latitude)))
+
+    return EARTH_RADIUS_M * math.asin(min(1.0, math.cos(math.radians(latitude)) * math.sin(delta)))
+
+def building_within_radius(latitude: float, longitude: float, radius_m: float, place=Building):
+    """
+    Условие: здание не дальше radius_m от точки. Квадрат вокруг точки в проекции Меркатора
+    отбирается по SP-GiST-индексу ix_buildings_mercator (ix_organization_search_mercator),
+    точное расстояние проверяется отдельно. Квадрат, выходящий за антимеридиан,
+    дополняется своей копией с другого края карты.
+    """
+    x, y = mercator_xy(latitude, longitude)
+    # Масштаб Меркатора растет к полюсам как 1/cos(широты), поэтому сторона квадрата
+    # берется по самой удаленной от экватора широте круга
+    farthest_latitude = min(abs(latitude) + math.degrees(radius_m / EARTH_RADIUS_M), 89.9)
+    half_side = radius_m / math.cos(math.radians(farthest_latitude))
+
+    shifts = [0.0]
+    if x - half_side < -MERCATOR_WORLD_WIDTH_M / 2:
+        shifts.append(MERCATOR_WORLD_WIDTH_M)
+    if x + half_side > MERCATOR_WORLD_WIDTH_M / 2:
+        shifts.append(-MERCATOR_WORLD_WIDTH_M)
+
+    building_point = mercator_point(place.latitude, place.longitude)
+    return and_(
+        or_(*(
+            building_point.op("<@")(
+                func.box(
+                    func.point(x + shift - half_side, y - half_side),
+                    func.point(x + shift + half_side, y + half_side)
+                )
             )
+            for shift in shifts
+        )),
+        building_distance_m(latitude, longitude, place) <= radius_m
+    )
+
+async def get_organizations_nearby(
+    latitude: float,
+    longitude: float,
+    limit: int,
+    radius_m: Optional[float],
+    activity_id: Optional[int],
+    db: AsyncSession
+) -> List[OrganizationNearbySchema]:
+    """
+    Получает ближайшие к точке организации, по возрастанию расстояния.
+    Организации перебираются KNN-сканированием SP-GiST-индекса ix_organization_search_mercator (оператор <->),
+    которое останавливается после limit * NEARBY_CANDIDATES_FACTOR подходящих организаций; кандидаты
+    сортируются по точному расстоянию, и возвращаются первые limit. Если указан вид деятельности,
+    учитываются организации с ним и со всеми его дочерними видами.
+    """
+    x, y = mercator_xy(latitude, longitude)
+    building_point = mercator_point(OrganizationSearch.latitude, OrganizationSearch.longitude)
+    distance = building_distance_m(latitude, longitude, OrganizationSearch)
+    candidates = limit * NEARBY_CANDIDATES_FACTOR
+
+    query = (
+        select(
+            OrganizationSearch.organization_id.label("id"),
+            OrganizationSearch.name,
+            OrganizationSearch.building_id,
+            distance.label("distance_m")
         )
+        .where(OrganizationSearch.latitude.is_not(None), OrganizationSearch.longitude.is_not(None))
+        .limit(candidates)
     )
-    organizations = result.scalars().all()
+
+    if radius_m is not None:
+        query = query.where(building_within_radius(latitude, longitude, radius_m, OrganizationSearch))
+
+    if activity_id is not None:
+        query = query.where(await organization_activity_filter(activity_id, db))
+
+    result = await db.execute(query.order_by(building_point.op("<->")(func.point(x, y))))
+    rows = {row.id: row for row in result.all()}
+
+    # В проекции здания за антимеридианом лежат на другом краю карты, и KNN доходит до них последними.
+    # Если антимеридиан ближе самого дальнего кандидата, кандидаты добираются и от копии точки за ним
+    if len(rows) == candidates and antimeridian_distance_m(latitude, longitude) < max(row.distance_m for row in rows.values()):
+        mirrored_x = x - math.copysign(MERCATOR_WORLD_WIDTH_M, x)
+        result = await db.execute(query.order_by(building_point.op("<->")(func.point(mirrored_x, y))))
+        rows.update((row.id, row) for row in result.all())
+
+    # Порядок в проекции совпадает с точным только приблизительно: масштаб меняется с широтой,
+    # поэтому точная сортировка идет по кандидатам с запасом
+    organizations = sorted(
+        (OrganizationNearbySchema.model_validate(row) for row in rows.values()),
+        key=lambda organization: organization.distance_m
+    )[:limit]
 
     if not organizations:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="No organizations found in the specified area."
+            detail="No organizations found near the specified point."
         )
-    
-    organizations_list = await organizations_to_list(organizations)
 
-    return organizations_list
+    return organizations
 
-async def get_organization_list(db: AsyncSession) -> list[OrganizationSchema]:
+async def search_organizations(
+    db: AsyncSession,
+    limit: int = PAGE_SIZE_DEFAULT,
+    after: Optional[int] = None,
+    name: Optional[str] = None,
+    activity_id: Optional[int] = None,
+    building_id: Optional[int] = None,
+    lat_min: Optional[float] = None,
+    lon_min: Optional[float] = None,
+    lat_max: Optional[float] = None,
+    lon_max: Optional[float] = None,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    radius_m: Optional[float] = None
+) -> List[OrganizationMatchSchema]:
     """
-    Получает список всех организаций.
+    Ищет организации по сочетанию необязательных фильтров: начала слов названия, вида деятельности
+    с дочерними, здания, прямоугольной области и круга радиусом radius_m вокруг точки.
+    Все условия проверяются одним запросом к organization_search, где у каждого фильтра свой индекс.
+    Возвращает не более limit организаций с id больше after по возрастанию id (keyset-пагинация).
     """
-    result = await db.execute(
-        select(Organization)
-        .options(
-            selectinload(Organization.phones),
-            selectinload(Organization.activities),
-            selectinload(Organization.building)
+    for names, values in (
+        ("lat_min, lon_min, lat_max and lon_max", (lat_min, lon_min, lat_max, lon_max)),
+        ("lat, lon and radius_m", (latitude, longitude, radius_m)),
+    ):
+        if None in values and any(value is not None for value in values):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Parameters {names} must be given together."
+            )
+
+    query = (
+        select(
+            OrganizationSearch.organization_id.label("id"),
+            OrganizationSearch.name,
+            OrganizationSearch.building_id,
+            OrganizationSearch.latitude,
+            OrganizationSearch.longitude
         )
+        .order_by(OrganizationSearch.organization_id)
+        .limit(limit)
     )
 
+    if after is not None:
+        query = query.where(OrganizationSearch.organization_id > after)
+
+    if name is not None:
+        name_query = name_prefix_query(name)
+        if name_query is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Name must contain at least one letter or digit."
+            )
+        query = query.where(OrganizationSearch.search_vector.op("@@")(name_query))
+
+    if activity_id is not None:
+        query = query.where(await organization_activity_filter(activity_id, db))
+
+    if building_id is not None:
+        query = query.where(OrganizationSearch.building_id == building_id)
+
+    if lat_min is not None:
+        query = query.where(building_in_rectangle(lat_min, lon_min, lat_max, lon_max, OrganizationSearch))
+
+    if radius_m is not None:
+        query = query.where(building_within_radius(latitude, longitude, radius_m, OrganizationSearch))
+
+    result = await db.execute(query)
+
+    return [OrganizationMatchSchema.model_validate(row) for row in result.all()]
+
+def organization_list_query(after: Optional[int] = None, fields: Optional[FrozenSet[str]] = None):
+    """
+    Запрос организаций по возрастанию id, начиная после указанного id (keyset-пагинация).
+    """
+    query = (
+        select(Organization)
+        .options(*organization_load_options(fields))
+        .order_by(Organization.id)
+    )
+    if after is not None:
+        query = query.where(Organization.id > after)
+
+    return query
+
+async def get_organization_list(
+    db: AsyncSession,
+    limit: int = PAGE_SIZE_DEFAULT,
+    after: Optional[int] = None,
+    fields: Optional[FrozenSet[str]] = None
+) -> list[OrganizationSchema]:
+    """
+    Получает страницу организаций: не более limit записей с id больше after.
+    """
+    result = await db.execute(organization_list_query(after, fields).limit(limit))
+
     organizations = result.scalars().all()
 
-    return [OrganizationSchema.model_validate(org) for org in organizations]
+    with timed_phase("validate"):
+        return [organization_to_schema(org, fields) for org in organizations]
+
+async def stream_organization_list(
+    db: AsyncSession,
+    after: Optional[int] = None,
+    fields: Optional[FrozenSet[str]] = None
+) -> AsyncIterator[bytes]:
+    """
+    Отдает все организации с id больше after в формате NDJSON через серверный курсор.
+    """
+    result = await db.stream(
+        organization_list_query(after, fields).execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
+
+    async for db_organization in result.scalars():
+        yield organization_to_schema(db_organization, fields).model_dump_json(include=fields).encode() + b"\n"
+
+async def get_organization_card_json_by_id(
+    organization_id: int,
+    db: AsyncSession,
+    fields: Optional[FrozenSet[str]] = None
+) -> str:
+    """
+    Получает карточку организации по id готовым JSON-документом, собранным в Postgres.
+    Если организация не найдена, возвращает HTTP 404.
+    """
+    result = await db.execute(
+        select(organization_card_json(fields).cast(Text))
+        .where(Organization.id == organization_id)
+    )
+    document = result.scalar_one_or_none()
+
+    if document is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Organization with id {organization_id} not found."
+        )
+
+    return document
+
+async def get_organization_card_json_by_name(
+    organization_name: str,
+    db: AsyncSession,
+    fields: Optional[FrozenSet[str]] = None
+) -> str:
+    """
+    Получает карточку организации по имени готовым JSON-документом, собранным в Postgres.
+    Если организация не найдена, возвращает HTTP 404.
+    """
+    result = await db.execute(
+        select(organization_card_json(fields).cast(Text))
+        .where(Organization.name.ilike(escape_like(organization_name)))
+        .order_by(Organization.id)
+        .limit(1)
+    )
+    document = result.scalar_one_or_none()
+
+    if document is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Organization with name {organization_name} not found."
+        )
+
+    return document
+
+def organization_cards_json_query(after: Optional[int] = None, fields: Optional[FrozenSet[str]] = None):
+    """
+    Запрос карточек организаций в JSON по возрастанию id, начиная после указанного id (keyset-пагинация).
+    """
+    query = select(Organization.id, organization_card_json(fields).cast(Text).label("card")).order_by(Organization.id)
+    if after is not None:
+        query = query.where(Organization.id > after)
+
+    return query
+
+async def get_organization_cards_json(
+    db: AsyncSession,
+    limit: int = PAGE_SIZE_DEFAULT,
+    after: Optional[int] = None,
+    fields: Optional[FrozenSet[str]] = None
+) -> Tuple[str, Optional[int]]:
+    """
+    Получает страницу карточек организаций JSON-массивом, собранным из готовых документов Postgres.
+    Вторым значением возвращает курсор следующей страницы — id последней записи, если страница заполнена.
+    """
+    rows = (await db.execute(organization_cards_json_query(after, fields).limit(limit))).all()
+
+    next_after = rows[-1].id if len(rows) == limit else None
+    return "[" + ",".join(row.card for row in rows) + "]", next_after
+
+async def stream_organization_cards_json(
+    db: AsyncSession,
+    after: Optional[int] = None,
+    fields: Optional[FrozenSet[str]] = None
+) -> AsyncIterator[bytes]:
+    """
+    Отдает карточки всех организаций с id больше after в формате NDJSON через серверный курсор,
+    без загрузки ORM-объектов.
+    """
+    result = await db.stream(
+        organization_cards_json_query(after, fields).execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
+
+    async for row in result:
+        yield row.card.encode() + b"\n"
 
 async def delete_organization(organization_id: int, db: AsyncSession):
     """
@@ -183,8 +743,11 @@ async def delete_organization(organization_id: int, db: AsyncSession):
             detail=f"Organization with id {organization_id} not found."
         )
 
+    if db_organization.building_id is not None:
+        await adjust_building_clusters(db_organization.building_id, -1, db)
     await db.delete(db_organization)
     await db.commit()
+    await response_cache.invalidate("organizations")
 
     return {"detail": f"Organization with id {organization_id} deleted successfully."}
 
@@ -215,14 +778,24 @@ async def update_organization(
                 detail=f"Building with id {update_data.building_id} does not exist."
             )
 
+    previous_building_id = db_organization.building_id
     for field, value in update_data.model_dump(exclude_unset=True).items():
         setattr(db_organization, field, value)
+    db_organization.version = Organization.version + 1
+
+    if db_organization.building_id != previous_building_id:
+        if previous_building_id is not None:
+            await adjust_building_clusters(previous_building_id, -1, db)
+        if db_organization.building_id is not None:
+            await adjust_building_clusters(db_organization.building_id, 1, db)
 
     db.add(db_organization)
+    await refresh_organization_search([organization_id], db)
     await db.commit()
+    await response_cache.invalidate("organizations")
     await db.refresh(
         db_organization,
-        attribute_names=['phones', 'activities']
+        attribute_names=['phones', 'activities', 'building']
     )
 
     return OrganizationSchema.model_validate(db_organization)
\ No newline at end of file
@@ -1,12 +1,59 @@
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import String, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.future import select
+from typing import List, Optional, AsyncIterator
 from app.models import Phone, Organization
-from app.schemas import PhoneBaseSchema, PhoneSchema, PhoneUpdateSchema
+from app.schemas import PhoneBaseSchema, PhoneSchema, PhoneUpdateSchema, PhoneLookupSchema
+from app.utils import to_e164, stream_ndjson, PAGE_SIZE_DEFAULT, STREAM_BATCH_SIZE
+from app.response_cache import response_cache
+from app.crud.search_crud import refresh_organization_search
+
+async def check_number_is_free(number_e164: Optional[str], db: AsyncSession, phone_id: Optional[int] = None) -> None:
+    """
+    Проверяет, что номер не принадлежит другому телефону; иначе возвращает HTTP 400.
+    Номера без формы E.164 (None) уникальным индексом не ограничены, поэтому не проверяются.
+    """
+    if number_e164 is None:
+        return
+
+    query = select(Phone.id).where(Phone.number_e164 == number_e164)
+    if phone_id is not None:
+        query = query.where(Phone.id != phone_id)
+
+    result = await db.execute(query)
+    if result.first() is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Phone number {number_e164} already exists."
+        )
+
+async def commit_phone(db_phone: Phone, organization_ids: List[Optional[int]], db: AsyncSession) -> None:
+    """
+    Записывает телефон и строки organization_search его организаций и фиксирует транзакцию.
+    Параллельный запрос с тем же номером проходит check_number_is_free одновременно с этим,
+    поэтому нарушение уникального индекса number_e164 при записи тоже возвращает HTTP 400.
+    """
+    number_e164 = db_phone.number_e164
+    try:
+        db.add(db_phone)
+        await refresh_organization_search(organization_ids, db)
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        if "ix_phones_number_e164" not in str(exc.orig):
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Phone number {number_e164} already exists."
+        ) from exc
 
 async def create_phone(phone_data: PhoneBaseSchema, db: AsyncSession) -> PhoneSchema:
     """
     Создает новый телефон.
+    Номер в формате E.164 вычисляется один раз при записи и должен быть уникальным.
     """
     if phone_data.organization_id is not None:
         result = await db.execute(select(Organization).where(Organization.id == phone_data.organization_id))
@@ -17,13 +64,17 @@ async def create_phone(phone_data: PhoneBaseSchema, db: AsyncSession) -> PhoneSc
                 detail=f"Organization with id {phone_data.organization_id} does not exist."
             )
     
+    number_e164 = to_e164(phone_data.number)
+    await check_number_is_free(number_e164, db)
+
     db_phone = Phone(
         number=phone_data.number,
+        number_e164=number_e164,
         organization_id=phone_data.organization_id
     )
 
-    db.add(db_phone)
-    await db.commit()
+    await commit_phone(db_phone, [phone_data.organization_id], db)
+    await response_cache.invalidate("phones")
     await db.refresh(db_phone)
 
     return PhoneSchema.model_validate(db_phone)
@@ -45,16 +96,41 @@ async def get_phone(phone_id: int, db: AsyncSession) -> PhoneSchema:
 
     return PhoneSchema.model_validate(db_phone)
 
-async def get_phones_list(db: AsyncSession) -> list[PhoneSchema]:
+def phone_list_query(after: Optional[int] = None):
+    """
+    Запрос телефонов по возрастанию id, начиная после указанного id (keyset-пагинация).
+    """
+    query = select(Phone).order_by(Phone.id)
+    if after is not None:
+        query = query.where(Phone.id > after)
+
+    return query
+
+async def get_phones_list(
+    db: AsyncSession,
+    limit: int = PAGE_SIZE_DEFAULT,
+    after: Optional[int] = None
+) -> list[PhoneSchema]:
     """
-    Получает список всех телефонов.
+    Получает страницу телефонов: не более limit записей с id больше after.
     """
-    result = await db.execute(select(Phone))
+    result = await db.execute(phone_list_query(after).limit(limit))
 
     phones = result.scalars().all()
 
     return [PhoneSchema.model_validate(phone) for phone in phones]
 
+async def stream_phones_list(db: AsyncSession, after: Optional[int] = None) -> AsyncIterator[bytes]:
+    """
+    Отдает все телефоны с id больше after в формате NDJSON через серверный курсор.
+    """
+    result = await db.stream(
+        phone_list_query(after).execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
+
+    async for line in stream_ndjson(result.scalars(), PhoneSchema):
+        yield line
+
 async def delete_phone(phone_id: int, db: AsyncSession) -> PhoneSchema:
     result = await db.execute(select(Phone).where(Phone.id == phone_id))
     db_phone = result.scalar_one_or_none()
@@ -66,7 +142,9 @@ async def delete_phone(phone_id: int, db: AsyncSession) -> PhoneSchema:
         )
     
     await db.delete(db_phone)
+    await refresh_organization_search([db_phone.organization_id], db)
     await db.commit()
+    await response_cache.invalidate("phones")
 
     return {"detail": f"Phone with id {phone_id} deleted successfully."}
 
@@ -98,12 +176,72 @@ async def update_phone(
                 detail=f"Organization with id {update_data.organization_id} does not exist."
             )
 
+    if update_data.number is not None:
+        number_e164 = to_e164(update_data.number)
+        await check_number_is_free(number_e164, db, phone_id=phone_id)
+        db_phone.number_e164 = number_e164
+
+    previous_organization_id = db_phone.organization_id
     for field, value in update_data.model_dump(exclude_unset=True).items():
         setattr(db_phone, field, value)
+    db_phone.version = Phone.version + 1
 
-    db.add(db_phone)
-    await db.commit()
+    await commit_phone(db_phone, [previous_organization_id, db_phone.organization_id], db)
+    await response_cache.invalidate("phones")
     await db.refresh(db_phone)
 
     return PhoneSchema.model_validate(db_phone)
 
+def phone_lookup_query():
+    """
+    Телефон и его организация-владелец; фильтр по number_e164 использует уникальный индекс.
+    """
+    return (
+        select(
+            Phone.number_e164,
+            Phone.id.label("phone_id"),
+            Organization.id.label("organization_id"),
+            Organization.name.label("organization_name"),
+            Organization.building_id
+        )
+        .outerjoin(Organization, Organization.id == Phone.organization_id)
+    )
+
+async def lookup_phone(number: str, db: AsyncSession) -> PhoneLookupSchema:
+    """
+    Находит телефон и организацию-владельца по номеру в любом формате, который принимает PhoneNumber.
+    Нераспознанный номер — 400, неизвестный — 404.
+    """
+    number_e164 = to_e164(number)
+    if number_e164 is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"'{number}' is not a valid phone number."
+        )
+
+    result = await db.execute(phone_lookup_query().where(Phone.number_e164 == number_e164))
+    row = result.one_or_none()
+
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Phone number {number_e164} not found."
+        )
+
+    return PhoneLookupSchema.model_validate(row)
+
+async def lookup_phones(numbers: List[str], db: AsyncSession) -> List[PhoneLookupSchema]:
+    """
+    Находит телефоны по списку номеров одним запросом.
+    Возвращает только найденные номера в порядке запроса; нераспознанные и неизвестные пропускаются.
+    """
+    keys = list(dict.fromkeys(key for key in map(to_e164, numbers) if key is not None))
+    if not keys:
+        return []
+
+    result = await db.execute(
+        phone_lookup_query().where(Phone.number_e164 == any_(bindparam("numbers", keys, type_=ARRAY(String))))
+    )
+    found = {row.number_e164: row for row in result.all()}
+
+    return [PhoneLookupSchema.model_validate(found[key]) for key in keys if key in found]
@@ -0,0 +1,125 @@
+import re
+from sqlalchemy import Integer, Select, bindparam, distinct, func, literal_column, select, text
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Iterable, Union
+from app.models import Building, Organization, OrganizationSearch, Phone, activity_closure, organizations_activities
+
+SEARCH_CONFIG = "simple" # Конфигурация полнотекстового поиска: без стемминга, названия ищутся по словам как есть
+
+def search_vector(name):
+    """
+    Поисковый вектор названия; запросы к нему строит name_prefix_query в той же конфигурации.
+    """
+    return func.to_tsvector(literal_column(f"'{SEARCH_CONFIG}'::regconfig"), name)
+
+def name_prefix_query(prefix: str):
+    """
+    Запрос к search_vector: каждое слово prefix — начало какого-то слова названия ("вект том" находит "Вектор Томь").
+    Если в prefix нет букв и цифр, возвращает None.
+    """
+    words = re.findall(r"\w+", prefix)
+    if not words:
+        return None
+
+    # Слова из \w не содержат спецсимволов синтаксиса tsquery, поэтому кавычки только ограничивают лексему
+    query = " & ".join(f"'{word}':*" for word in words)
+    return func.to_tsquery(literal_column(f"'{SEARCH_CONFIG}'::regconfig"), query)
+
+def organization_search_rows() -> Select:
+    """
+    Строки organization_search, вычисленные по основным таблицам.
+    Виды деятельности берутся вместе со всеми предками по activity_closure,
+    поэтому отбор по поддереву сводится к проверке вхождения одного id в массив.
+    """
+    activity_ids = (
+        select(
+            func.coalesce(
+                func.array_agg(distinct(activity_closure.c.ancestor_id)),
+                literal_column("'{}'::integer[]")
+            )
+        )
+        .select_from(organizations_activities)
+        .join(activity_closure, activity_closure.c.descendant_id == organizations_activities.c.activity_id)
+        .where(organizations_activities.c.organization_id == Organization.id)
+        .scalar_subquery()
+    )
+    phones = (
+        select(
+            func.coalesce(
+                func.array_agg(aggregate_order_by(Phone.number_e164, Phone.id)),
+                literal_column("'{}'::varchar[]")
+            )
+        )
+        .where(Phone.organization_id == Organization.id, Phone.number_e164.is_not(None))
+        .scalar_subquery()
+    )
+
+    return (
+        select(
+            Organization.id,
+            Organization.name,
+            Organization.building_id,
+            Building.latitude,
+            Building.longitude,
+            activity_ids,
+            phones,
+            search_vector(Organization.name)
+        )
+        .outerjoin(Building, Building.id == Organization.building_id)
+    )
+
+async def refresh_organization_search(organization_ids: Union[Iterable[int], Select], db: AsyncSession) -> None:
+    """
+    Пересчитывает строки organization_search для organization_ids (список id или подзапрос);
+    None в списке пропускаются, чтобы можно было передавать id из необязательных ссылок.
+    Строки удаленных организаций удаляются каскадно по внешнему ключу.
+    Изменения выполняются в текущей транзакции, фиксирует их вызывающая функция.
+    """
+    if not isinstance(organization_ids, Select):
+        ids = sorted(set(organization_ids) - {None})
+        if not ids:
+            return
+        # Список передается одним параметром-массивом: для сотен id планировщик выбирает соединение, а не фильтр
+        organization_ids = select(func.unnest(bindparam(None, ids, type_=ARRAY(Integer))))
+
+    rows = (
+        organization_search_rows()
+        .where(Organization.id.in_(organization_ids))
+        # Единый порядок блокировки строк, чтобы параллельные записи не взаимоблокировались
+        .order_by(Organization.id)
+    )
+    upsert = pg_insert(OrganizationSearch).from_select(
+        ["organization_id", "name", "building_id", "latitude", "longitude", "activity_ids", "phones", "search_vector"],
+        rows
+    )
+    await db.execute(
+        upsert.on_conflict_do_update(
+            index_elements=[OrganizationSearch.organization_id],
+            set_={
+                name: upsert.excluded[name]
+                for name in ("name", "building_id", "latitude", "longitude", "activity_ids", "phones", "search_vector")
+            }
+        )
+    )
+
+async def index_new_organizations(db: AsyncSession) -> None:
+    """
+    Добавляет строки организаций, которых еще нет в organization_search, например после загрузки.
+    """
+    await refresh_organization_search(
+        select(Organization.id).where(
+            ~select(OrganizationSearch.organization_id)
+            .where(OrganizationSearch.organization_id == Organization.id)
+            .exists()
+        ),
+        db
+    )
+
+async def rebuild_organization_search(db: AsyncSession) -> None:
+    """
+    Пересчитывает organization_search по всем организациям. Нужна после загрузки данных в обход crud-функций.
+    """
+    await db.execute(text("TRUNCATE organization_search"))
+    await refresh_organization_search(select(Organization.id), db)
+    await db.commit()
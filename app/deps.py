@@ -1,11 +1,175 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+import asyncio
+import itertools
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from fastapi import Depends, Request
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.settings import settings
-from typing import AsyncGenerator
+from app.response_cache import cache_bypass, read_source
+from app.crud.organizations_crud import OrganizationLoader
+from app.metrics import (
+    DB_POOL_CHECKOUT_WAIT,
+    DB_READ_SESSIONS,
+    DB_REPLICA_FAILURES,
+    update_pool_gauges,
+    register_sql_hooks,
+)
+from typing import AsyncGenerator, Dict, List, Optional, Tuple
 
-engine = create_async_engine(settings.DB_URL, echo=True)
+# Cookie с временем последней записи клиента для окна read-your-writes
+LAST_WRITE_COOKIE = "last_write"
 
-AsyncSessionLocal = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, измеряющий время ожидания свободного соединения
+    и публикующий свое состояние при каждой выдаче и возврате соединения.
+    """
+    pool_name = "primary"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(pool=self.pool_name).observe(time.perf_counter() - started)
+            update_pool_gauges(self, self.pool_name)
+
+    def _do_return_conn(self, record):
+        try:
+            super()._do_return_conn(record)
+        finally:
+            update_pool_gauges(self, self.pool_name)
+
+def create_db_engine(url: str, pool_name: str, **connect_args) -> AsyncEngine:
+    """
+    Создает движок с инструментированным пулом; настройки пула общие для основной БД и реплик.
+    """
+    # Имя пула хранится в классе, так как при dispose() пул пересоздается с тем же классом
+    poolclass = type(f"InstrumentedQueuePool_{pool_name}", (InstrumentedQueuePool,), {"pool_name": pool_name})
+    pool_size, max_overflow = settings.db_pool_limits
+    db_engine = create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        poolclass=poolclass,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        connect_args={
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE,
+            **connect_args,
+        },
+    )
+    update_pool_gauges(db_engine.pool, pool_name)
+    register_sql_hooks(db_engine)
+
+    return db_engine
+
+@dataclass
+class RequestWrites:
+    """
+    Отметка о том, что текущий HTTP-запрос зафиксировал транзакцию в основной БД.
+    """
+    committed: bool = False
+
+request_writes: ContextVar[Optional[RequestWrites]] = ContextVar("request_writes", default=None)
+
+class PrimarySession(Session):
+    """
+    Сессия основной БД; после фиксации транзакции отмечает запрос как записывающий.
+    """
+
+@event.listens_for(PrimarySession, "after_commit")
+def mark_request_write(session: Session) -> None:
+    writes = request_writes.get()
+    if writes is not None:
+        writes.committed = True
+
+engine = create_db_engine(settings.DB_URL, InstrumentedQueuePool.pool_name)
+
+AsyncSessionLocal = sessionmaker(
+    bind=engine, class_=AsyncSession, sync_session_class=PrimarySession, expire_on_commit=False
+)
+
+class ReadReplicas:
+    """
+    Реплики для чтения. Сессии выдаются по кругу; реплика, к которой не удалось подключиться,
+    пропускается DB_REPLICA_RETRY_INTERVAL секунд. Если доступных реплик нет, возвращается None,
+    и чтение идет в основную БД.
+    """
+
+    def __init__(self, urls: List[str], retry_interval: float, connect_timeout: float):
+        self.retry_interval = retry_interval
+        self.replicas: List[Tuple[str, sessionmaker]] = []
+        for number, url in enumerate(urls):
+            name = f"replica_{number}"
+            replica_engine = create_db_engine(url, name, timeout=connect_timeout)
+            self.replicas.append((name, sessionmaker(bind=replica_engine, class_=AsyncSession, expire_on_commit=False)))
+
+        self._next = itertools.count()
+        self._down_until: Dict[str, float] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    def candidates(self) -> List[Tuple[str, sessionmaker]]:
+        """
+        Доступные реплики, начиная со следующей по кругу.
+        """
+        start = next(self._next) % len(self.replicas)
+        now = time.monotonic()
+
+        return [
+            replica for replica in self.replicas[start:] + self.replicas[:start]
+            if self._down_until.get(replica[0], 0.0) <= now
+        ]
+
+    async def open_session(self) -> Optional[AsyncSession]:
+        """
+        Открывает сессию на первой доступной реплике. Соединение берется сразу,
+        чтобы ошибка подключения переключила чтение на другую реплику, а не завершила запрос.
+        """
+        for name, session_factory in self.candidates():
+            session = session_factory()
+            try:
+                await session.connection()
+            except (DBAPIError, OSError, asyncio.TimeoutError):
+                # На python 3.10 таймаут подключения asyncpg — asyncio.TimeoutError, не подкласс OSError
+                await session.close()
+                self._down_until[name] = time.monotonic() + self.retry_interval
+                DB_REPLICA_FAILURES.labels(pool=name).inc()
+                continue
+
+            DB_READ_SESSIONS.labels(pool=name).inc()
+            return session
+
+        return None
+
+read_replicas = ReadReplicas(
+    settings.db_replica_urls,
+    retry_interval=settings.DB_REPLICA_RETRY_INTERVAL,
+    connect_timeout=settings.DB_REPLICA_CONNECT_TIMEOUT,
+)
+
+def wrote_recently(request: Request) -> bool:
+    """
+    Проверяет, попадает ли запрос в окно read-your-writes после записи того же клиента.
+    """
+    if settings.READ_YOUR_WRITES_WINDOW <= 0:
+        return False
+    try:
+        last_write = float(request.cookies.get(LAST_WRITE_COOKIE, ""))
+    except ValueError:
+        return False
+
+    return time.time() - last_write < settings.READ_YOUR_WRITES_WINDOW
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
@@ -13,3 +177,30 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
     async with AsyncSessionLocal() as session:
         yield session
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Возвращает сессию для чтения: с реплики, а без реплик, при их недоступности
+    или в окне read-your-writes после записи клиента — с основной БД.
+    Источник чтения и окно read-your-writes передаются кэшу ответов.
+    """
+    own_writes = wrote_recently(request)
+    cache_bypass.set(own_writes)
+
+    session = None
+    if read_replicas and not own_writes:
+        session = await read_replicas.open_session()
+    read_source.set("primary" if session is None else "replica")
+
+    if session is None:
+        DB_READ_SESSIONS.labels(pool=InstrumentedQueuePool.pool_name).inc()
+        session = AsyncSessionLocal()
+
+    async with session:
+        yield session
+
+async def get_organization_loader(db: AsyncSession = Depends(get_read_db)) -> OrganizationLoader:
+    """
+    Возвращает загрузчик организаций на время запроса; он использует ту же сессию чтения, что и эндпоинт.
+    """
+    return OrganizationLoader(db)
@@ -1,14 +1,32 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from app.metrics import mark_process_exit
+from app.middleware import ContentNegotiationMiddleware, ReadYourWritesMiddleware, TimingMiddleware
+from app.responses import TimedResponse
+from app.settings import settings
 from app.routers import (
     phones_router, 
     organizations_router, 
     buildings_router, 
     activities_router,
     act_org_router,
-    main_logic_router
+    main_logic_router,
+    import_router,
+    metrics_router
 )
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    mark_process_exit()
+
+app = FastAPI(default_response_class=TimedResponse, lifespan=lifespan)
+
+if settings.RESPONSE_MSGPACK:
+    app.add_middleware(ContentNegotiationMiddleware)
+if settings.READ_YOUR_WRITES_WINDOW > 0:
+    app.add_middleware(ReadYourWritesMiddleware, window=settings.READ_YOUR_WRITES_WINDOW)
+app.add_middleware(TimingMiddleware)
 
 app.include_router(main_logic_router.router, prefix="/api")
 app.include_router(phones_router.router, prefix="/api")
@@ -16,3 +34,5 @@ app.include_router(organizations_router.router, prefix="/api")
 app.include_router(buildings_router.router, prefix="/api")
 app.include_router(activities_router.router, prefix="/api")
 app.include_router(act_org_router.router, prefix="/api")
+app.include_router(import_router.router, prefix="/api")
+app.include_router(metrics_router.router, prefix="/api")
\ No newline at end of file
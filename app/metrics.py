@@ -0,0 +1,161 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, Optional
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import Pool
+
+# Каталог файлов метрик, общий для процессов-обработчиков. Переменная окружения читается
+# prometheus_client при импорте, поэтому задается в окружении процесса, а не только в .env
+PROMETHEUS_MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+def collect_metrics() -> bytes:
+    """
+    Возвращает метрики в текстовом формате Prometheus. Если задан PROMETHEUS_MULTIPROC_DIR,
+    метрики собираются по файлам всех процессов-обработчиков, иначе — только текущего процесса.
+    """
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return generate_latest(REGISTRY)
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+def mark_process_exit() -> None:
+    """
+    Удаляет значения live-метрик завершающегося процесса из PROMETHEUS_MULTIPROC_DIR.
+    """
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
+"""Пул соединений с БД"""
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Время ожидания соединения из пула",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+# В режиме нескольких процессов значения пулов суммируются по работающим процессам
+DB_POOL_IN_USE = Gauge("db_pool_connections_in_use", "Соединения, выданные из пула", ["pool"], multiprocess_mode="livesum")
+DB_POOL_IDLE = Gauge("db_pool_connections_idle", "Свободные соединения в пуле", ["pool"], multiprocess_mode="livesum")
+DB_POOL_OVERFLOW = Gauge("db_pool_connections_overflow", "Соединения сверх pool_size", ["pool"], multiprocess_mode="livesum")
+DB_POOL_SIZE = Gauge("db_pool_size", "Настроенный размер пула", ["pool"], multiprocess_mode="livesum")
+
+def update_pool_gauges(pool: Pool, pool_name: str) -> None:
+    """
+    Публикует состояние пула соединений. Вызывается пулом при выдаче и возврате соединения:
+    вычисляемые при сборе значения (set_function) не видны из других процессов.
+    """
+    DB_POOL_IN_USE.labels(pool=pool_name).set(pool.checkedout())
+    DB_POOL_IDLE.labels(pool=pool_name).set(pool.checkedin())
+    DB_POOL_OVERFLOW.labels(pool=pool_name).set(max(pool.overflow(), 0))
+    DB_POOL_SIZE.labels(pool=pool_name).set(pool.size())
+
+DB_READ_SESSIONS = Counter("db_read_sessions_total", "Сессии только для чтения по источнику: primary или реплика", ["pool"])
+DB_REPLICA_FAILURES = Counter(
+    "db_replica_connect_failures_total",
+    "Неудачные подключения к реплике, после которых она временно исключается из чтения",
+    ["pool"]
+)
+
+"""Запросы к API"""
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Полное время обработки запроса",
+    ["method", "route", "status"]
+)
+HTTP_REQUEST_SQL_STATEMENTS = Histogram(
+    "http_request_sql_statements",
+    "Число SQL-запросов за один HTTP-запрос",
+    ["route"],
+    buckets=(0, 1, 2, 3, 4, 5, 8, 10, 20, 50, 100)
+)
+HTTP_REQUEST_SQL_DURATION = Histogram(
+    "http_request_sql_duration_seconds",
+    "Суммарное время SQL-запросов за один HTTP-запрос",
+    ["route"]
+)
+HTTP_REQUEST_PHASE_DURATION = Histogram(
+    "http_request_phase_duration_seconds",
+    "Время этапов обработки запроса вне БД (validate — Pydantic-валидация, serialize — проверка по response_model и кодирование ответа)",
+    ["route", "phase"]
+)
+
+@dataclass
+class RequestStats:
+    """
+    Счетчики одного HTTP-запроса, которые наполняются по ходу его обработки.
+    """
+    sql_count: int = 0
+    sql_time: float = 0.0
+    phases: Dict[str, float] = field(default_factory=dict)
+    endpoint_returned_at: Optional[float] = None # Момент возврата из эндпоинта, начало этапа serialize
+
+    def add_phase(self, phase: str, duration: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + duration
+
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+@contextmanager
+def timed_phase(phase: str) -> Iterator[None]:
+    """
+    Учитывает время блока как этап текущего запроса (например, validate).
+    """
+    stats = request_stats.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.add_phase(phase, time.perf_counter() - started)
+
+def register_sql_hooks(engine: AsyncEngine) -> None:
+    """
+    Считает SQL-запросы и их время для текущего HTTP-запроса.
+    Контекст запроса доступен в обработчиках событий, так как SQLAlchemy
+    переносит contextvars в greenlet, выполняющий синхронную часть драйвера.
+    """
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        stats = request_stats.get()
+        if stats is not None:
+            stats.sql_count += 1
+            stats.sql_time += time.perf_counter() - started
+
+"""Кэш ответов"""
+
+RESPONSE_CACHE_REQUESTS = Counter(
+    "response_cache_requests_total",
+    "Обращения к кэшу ответов",
+    ["endpoint", "result"]
+)
+RESPONSE_CACHE_EVICTIONS = Counter(
+    "response_cache_evictions_total",
+    "Вытесненные из кэша ответов записи (size — по размеру, ttl — по времени жизни)",
+    ["reason"]
+)
+# Доля попаданий не суммируется, поэтому в режиме нескольких процессов публикуется по каждому (метка pid)
+RESPONSE_CACHE_HIT_RATIO = Gauge(
+    "response_cache_hit_ratio",
+    "Доля попаданий в кэш ответов с момента запуска процесса",
+    multiprocess_mode="liveall"
+)
+RESPONSE_CACHE_ENTRIES = Gauge("response_cache_entries", "Записи в кэше ответов процессов", multiprocess_mode="livesum")
+
+def update_response_cache_gauges(cache) -> None:
+    """
+    Публикует долю попаданий и размер кэша ответов; вызывается кэшем после каждого обращения.
+    """
+    RESPONSE_CACHE_HIT_RATIO.set(cache.hit_ratio())
+    RESPONSE_CACHE_ENTRIES.set(cache.backend.size())
@@ -0,0 +1,165 @@
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.metrics import (
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUEST_PHASE_DURATION,
+    HTTP_REQUEST_SQL_DURATION,
+    HTTP_REQUEST_SQL_STATEMENTS,
+    RequestStats,
+    request_stats,
+)
+from app.deps import LAST_WRITE_COOKIE, RequestWrites, request_writes
+from app.responses import JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, response_media_type
+
+class TimingMiddleware:
+    """
+    Измеряет каждый запрос: полное время, число и время SQL-запросов, время этапов
+    validate/serialize. Значения отдаются клиенту в заголовке Server-Timing
+    и накапливаются в гистограммах для /api/metrics.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", self._server_timing(stats, started).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_stats.reset(token)
+            self._observe(scope, stats, status_code, time.perf_counter() - started)
+
+    @staticmethod
+    def _server_timing(stats: RequestStats, started: float) -> str:
+        total_ms = (time.perf_counter() - started) * 1000
+        parts = [
+            f'db;dur={stats.sql_time * 1000:.2f};desc="{stats.sql_count} queries"',
+            *(f"{phase};dur={duration * 1000:.2f}" for phase, duration in stats.phases.items()),
+            f"total;dur={total_ms:.2f}",
+        ]
+        return ", ".join(parts)
+
+    @staticmethod
+    def _observe(scope: Scope, stats: RequestStats, status_code: int, duration: float) -> None:
+        # Шаблон пути вместо фактического пути, чтобы число рядов метрик не зависело от id в URL
+        route = getattr(scope.get("route"), "path", "unmatched")
+
+        HTTP_REQUEST_DURATION.labels(method=scope["method"], route=route, status=str(status_code)).observe(duration)
+        HTTP_REQUEST_SQL_STATEMENTS.labels(route=route).observe(stats.sql_count)
+        HTTP_REQUEST_SQL_DURATION.labels(route=route).observe(stats.sql_time)
+        for phase, phase_duration in stats.phases.items():
+            HTTP_REQUEST_PHASE_DURATION.labels(route=route, phase=phase).observe(phase_duration)
+
+class ContentNegotiationMiddleware:
+    """
+    Выбирает формат тела ответа по заголовку Accept: application/json или application/msgpack
+    (для внутренних сервисов). Выбранный формат передается в TimedResponse через contextvar.
+    Ошибки FastAPI (HTTPException, ошибки валидации) всегда отдаются в JSON.
+    """
+
+    MEDIA_TYPES = {
+        JSON_MEDIA_TYPE: JSON_MEDIA_TYPE,
+        MSGPACK_MEDIA_TYPE: MSGPACK_MEDIA_TYPE,
+        "application/x-msgpack": MSGPACK_MEDIA_TYPE,
+    }
+
+    def __init__(self, app: ASGIApp):
+        try:
+            import msgpack  # noqa: F401
+        except ImportError as exc:
+            raise RuntimeError("Для RESPONSE_MSGPACK=true установите пакет msgpack.") from exc
+
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = next((value for name, value in scope["headers"] if name == b"accept"), b"")
+        token = response_media_type.set(self.negotiate(accept.decode("latin-1")))
+
+        async def send_with_vary(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # Ответ зависит от Accept, поэтому общие кэши должны хранить варианты раздельно
+                message = {**message, "headers": [*message.get("headers", []), (b"vary", b"Accept")]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_vary)
+        finally:
+            response_media_type.reset(token)
+
+    @classmethod
+    def negotiate(cls, accept: str) -> str:
+        """
+        Возвращает поддерживаемый формат с наибольшим q; при равных q — первый в заголовке.
+        Без подходящего формата (в том числе при */*) ответ остается в JSON.
+        """
+        best, best_quality = JSON_MEDIA_TYPE, 0.0
+        for item in accept.split(","):
+            media_type, *params = (part.strip() for part in item.split(";"))
+            media_type = cls.MEDIA_TYPES.get(media_type.lower())
+            if media_type is None:
+                continue
+
+            quality = 1.0
+            for param in params:
+                name, _, value = param.partition("=")
+                if name.strip().lower() == "q":
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+
+            if quality > best_quality:
+                best, best_quality = media_type, quality
+
+        return best
+
+class ReadYourWritesMiddleware:
+    """
+    После запроса, зафиксировавшего транзакцию в основной БД, выставляет cookie с временем записи.
+    Пока cookie действует (READ_YOUR_WRITES_WINDOW секунд), get_read_db читает из основной БД,
+    и клиент видит свои изменения независимо от отставания реплик.
+    """
+
+    def __init__(self, app: ASGIApp, window: int):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        writes = RequestWrites()
+        token = request_writes.set(writes)
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start" and writes.committed:
+                cookie = f"{LAST_WRITE_COOKIE}={time.time():.3f}; Max-Age={self.window}; Path=/; HttpOnly; SameSite=Lax"
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            request_writes.reset(token)
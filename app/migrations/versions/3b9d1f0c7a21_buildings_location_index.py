@@ -0,0 +1,34 @@
+"""buildings location index
+
+Revision ID: 3b9d1f0c7a21
+Revises: 5ef7a507fc68
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9d1f0c7a21'
+down_revision: Union[str, Sequence[str], None] = '5ef7a507fc68'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_buildings_location',
+        'buildings',
+        [sa.text('point(longitude, latitude)')],
+        unique=False,
+        postgresql_using='gist'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_buildings_location', table_name='buildings')
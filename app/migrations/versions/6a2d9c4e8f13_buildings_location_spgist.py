@@ -0,0 +1,55 @@
+"""buildings location spgist
+
+Revision ID: 6a2d9c4e8f13
+Revises: d92f4b7a13e6
+Create Date: 2026-10-18 21:05:37.284519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a2d9c4e8f13'
+down_revision: Union[str, Sequence[str], None] = 'd92f4b7a13e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Выражения должны совпадать с app.models, иначе планировщик не использует индексы
+LOCATION = 'point(longitude, latitude)'
+
+# (имя индекса, таблица, выражение)
+INDEXES = (
+    ('ix_buildings_location', 'buildings', LOCATION),
+)
+
+
+def replace_indexes(using: str) -> None:
+    """Перестраивает индексы с другим методом доступа, не блокируя запись в таблицы."""
+    # Новый индекс строится рядом со старым, поэтому запросы не остаются без индекса
+    with op.get_context().autocommit_block():
+        for name, table, expression in INDEXES:
+            op.drop_index(f'{name}_new', table_name=table, postgresql_concurrently=True, if_exists=True)
+            op.create_index(
+                f'{name}_new',
+                table,
+                [sa.text(expression)],
+                unique=False,
+                postgresql_using=using,
+                postgresql_concurrently=True
+            )
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+            op.execute(f'ALTER INDEX {name}_new RENAME TO {name}')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # SP-GiST (quad_point_ops) поддерживает тот же оператор <@ box, а вставка в него в разы дешевле GiST
+    replace_indexes('spgist')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    replace_indexes('gist')
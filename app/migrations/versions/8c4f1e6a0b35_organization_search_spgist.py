@@ -0,0 +1,57 @@
+"""organization search spgist
+
+Revision ID: 8c4f1e6a0b35
+Revises: 7b3e0d5f9a24
+Create Date: 2026-10-18 21:34:52.118460
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c4f1e6a0b35'
+down_revision: Union[str, Sequence[str], None] = '7b3e0d5f9a24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Выражения должны совпадать с app.models, иначе планировщик не использует индексы
+LOCATION = 'point(longitude, latitude)'
+MERCATOR = 'point(6371008.8 * radians(longitude), 6371008.8 * asinh(tan(radians(latitude))))'
+
+# (имя индекса, таблица, выражение)
+INDEXES = (
+    ('ix_organization_search_location', 'organization_search', LOCATION),
+    ('ix_organization_search_mercator', 'organization_search', MERCATOR),
+)
+
+
+def replace_indexes(using: str) -> None:
+    """Перестраивает индексы с другим методом доступа, не блокируя запись в таблицы."""
+    # Новый индекс строится рядом со старым, поэтому запросы не остаются без индекса
+    with op.get_context().autocommit_block():
+        for name, table, expression in INDEXES:
+            op.drop_index(f'{name}_new', table_name=table, postgresql_concurrently=True, if_exists=True)
+            op.create_index(
+                f'{name}_new',
+                table,
+                [sa.text(expression)],
+                unique=False,
+                postgresql_using=using,
+                postgresql_concurrently=True
+            )
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+            op.execute(f'ALTER INDEX {name}_new RENAME TO {name}')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # SP-GiST (quad_point_ops) поддерживает те же операторы <@ box и <->, а вставка в него в разы дешевле GiST; organization_search пересчитывается при каждом импорте
+    replace_indexes('spgist')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    replace_indexes('gist')
@@ -0,0 +1,49 @@
+"""activity closure
+
+Revision ID: 8e42c6d1b5f0
+Revises: 3b9d1f0c7a21
+Create Date: 2026-10-18 11:03:57.442915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e42c6d1b5f0'
+down_revision: Union[str, Sequence[str], None] = '3b9d1f0c7a21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('activity_closure',
+    sa.Column('ancestor_id', sa.Integer(), nullable=False),
+    sa.Column('descendant_id', sa.Integer(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['activities.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['descendant_id'], ['activities.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    op.create_index(op.f('ix_activity_closure_descendant_id'), 'activity_closure', ['descendant_id'], unique=False)
+
+    # Заполняем замыкание для уже существующих видов деятельности по их path
+    op.execute("""
+        INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+        SELECT
+            a.id,
+            d.id,
+            array_length(string_to_array(d.path, '.'), 1) - array_length(string_to_array(a.path, '.'), 1)
+        FROM activities a
+        JOIN activities d
+            ON d.path = a.path OR left(d.path, length(a.path) + 1) = a.path || '.'
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_activity_closure_descendant_id'), table_name='activity_closure')
+    op.drop_table('activity_closure')
@@ -0,0 +1,39 @@
+"""buildings mercator index
+
+Revision ID: a5d9e1c37b62
+Revises: f3c8d2a61e94
+Create Date: 2026-10-18 14:02:11.482913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5d9e1c37b62'
+down_revision: Union[str, Sequence[str], None] = 'f3c8d2a61e94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Выражение должно совпадать с app.models.mercator_point, иначе планировщик не использует индекс
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_buildings_mercator',
+            'buildings',
+            [sa.text('point(6371008.8 * radians(longitude), 6371008.8 * asinh(tan(radians(latitude))))')],
+            unique=False,
+            postgresql_using='gist',
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_buildings_mercator', table_name='buildings', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,59 @@
+"""organization clusters
+
+Revision ID: b7e4f0a29c15
+Revises: a5d9e1c37b62
+Create Date: 2026-10-18 15:21:47.106238
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e4f0a29c15'
+down_revision: Union[str, Sequence[str], None] = 'a5d9e1c37b62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('organization_clusters',
+    sa.Column('zoom', sa.SmallInteger(), nullable=False),
+    sa.Column('cell_x', sa.Integer(), nullable=False),
+    sa.Column('cell_y', sa.Integer(), nullable=False),
+    sa.Column('organizations', sa.Integer(), nullable=False),
+    sa.Column('latitude_sum', sa.Float(), nullable=False),
+    sa.Column('longitude_sum', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('zoom', 'cell_x', 'cell_y')
+    )
+
+    # Заполняем кластеры по существующим организациям, так же как app.crud.clusters_crud.adjust_clusters
+    op.execute("""
+        WITH points AS (
+            SELECT b.latitude, b.longitude,
+                   least(greatest(b.latitude, -85.0511287798), 85.0511287798) AS clamped_latitude,
+                   count(*) AS organizations
+            FROM buildings b
+            JOIN organizations o ON o.building_id = b.id
+            WHERE b.latitude IS NOT NULL AND b.longitude IS NOT NULL
+            GROUP BY b.id
+        ), cells AS (
+            SELECT zoom, power(2, zoom + 3)::int AS cells, points.*
+            FROM points, generate_series(0, 18) AS zoom
+        )
+        INSERT INTO organization_clusters (zoom, cell_x, cell_y, organizations, latitude_sum, longitude_sum)
+        SELECT zoom,
+               least(greatest(floor((longitude + 180) / 360 * cells), 0), cells - 1)::int,
+               least(greatest(floor((1 - asinh(tan(radians(clamped_latitude))) / pi()) / 2 * cells), 0), cells - 1)::int,
+               sum(organizations), sum(organizations * latitude), sum(organizations * longitude)
+        FROM cells
+        GROUP BY 1, 2, 3
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('organization_clusters')
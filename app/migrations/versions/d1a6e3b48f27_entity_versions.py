@@ -0,0 +1,32 @@
+"""entity versions
+
+Revision ID: d1a6e3b48f27
+Revises: c4f7a2e9d318
+Create Date: 2026-10-18 14:02:41.318206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1a6e3b48f27'
+down_revision: Union[str, Sequence[str], None] = 'c4f7a2e9d318'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('organizations', 'phones', 'buildings', 'activities')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in TABLES:
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        op.drop_column(table, 'version')
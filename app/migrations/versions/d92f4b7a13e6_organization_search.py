@@ -0,0 +1,80 @@
+"""organization search
+
+Revision ID: d92f4b7a13e6
+Revises: b7e4f0a29c15
+Create Date: 2026-10-18 19:42:10.518320
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd92f4b7a13e6'
+down_revision: Union[str, Sequence[str], None] = 'b7e4f0a29c15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('organization_search',
+    sa.Column('organization_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('building_id', sa.Integer(), nullable=True),
+    sa.Column('latitude', sa.Float(), nullable=True),
+    sa.Column('longitude', sa.Float(), nullable=True),
+    sa.Column('activity_ids', postgresql.ARRAY(sa.Integer()), server_default='{}', nullable=False),
+    sa.Column('phones', postgresql.ARRAY(sa.String()), server_default='{}', nullable=False),
+    sa.Column('search_vector', postgresql.TSVECTOR(), nullable=False),
+    sa.ForeignKeyConstraint(['organization_id'], ['organizations.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('organization_id')
+    )
+
+    # Заполняем по существующим организациям, так же как app.crud.search_crud.organization_search_rows
+    op.execute("""
+        INSERT INTO organization_search
+            (organization_id, name, building_id, latitude, longitude, activity_ids, phones, search_vector)
+        SELECT o.id, o.name, o.building_id, b.latitude, b.longitude,
+               coalesce((
+                   SELECT array_agg(DISTINCT c.ancestor_id)
+                   FROM organizations_activities oa
+                   JOIN activity_closure c ON c.descendant_id = oa.activity_id
+                   WHERE oa.organization_id = o.id
+               ), '{}'::integer[]),
+               coalesce((
+                   SELECT array_agg(p.number_e164 ORDER BY p.id)
+                   FROM phones p
+                   WHERE p.organization_id = o.id AND p.number_e164 IS NOT NULL
+               ), '{}'::varchar[]),
+               to_tsvector('simple'::regconfig, o.name)
+        FROM organizations o
+        LEFT JOIN buildings b ON b.id = o.building_id
+    """)
+
+    op.create_index(op.f('ix_organization_search_building_id'), 'organization_search', ['building_id'], unique=False)
+    op.create_index('ix_organization_search_activity_ids', 'organization_search', ['activity_ids'], unique=False, postgresql_using='gin')
+    op.create_index('ix_organization_search_search_vector', 'organization_search', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index(
+        'ix_organization_search_location',
+        'organization_search',
+        [sa.text('point(longitude, latitude)')],
+        unique=False,
+        postgresql_using='gist'
+    )
+    # Выражение должно совпадать с app.models.mercator_point, иначе планировщик не использует индекс
+    op.create_index(
+        'ix_organization_search_mercator',
+        'organization_search',
+        [sa.text('point(6371008.8 * radians(longitude), 6371008.8 * asinh(tan(radians(latitude))))')],
+        unique=False,
+        postgresql_using='gist'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('organization_search')
@@ -0,0 +1,69 @@
+"""phones number e164
+
+Revision ID: e7b2c9f4a105
+Revises: d1a6e3b48f27
+Create Date: 2026-10-18 15:10:27.604918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import phonenumbers
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b2c9f4a105'
+down_revision: Union[str, Sequence[str], None] = 'd1a6e3b48f27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def to_e164(number: str) -> Union[str, None]:
+    try:
+        parsed = phonenumbers.parse(number, None)
+    except phonenumbers.NumberParseException:
+        return None
+    if not phonenumbers.is_valid_number(parsed):
+        return None
+    return phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('phones', sa.Column('number_e164', sa.String(), nullable=True))
+
+    phones = sa.table(
+        'phones',
+        sa.column('id', sa.Integer),
+        sa.column('number', sa.String),
+        sa.column('number_e164', sa.String)
+    )
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(phones.c.id, phones.c.number).order_by(phones.c.id)).all()
+
+    # Нераспознанные номера и повторы уже встреченного номера остаются без ключа
+    seen = set()
+    updates = []
+    for phone_id, number in rows:
+        number_e164 = to_e164(number)
+        if number_e164 is None or number_e164 in seen:
+            continue
+        seen.add(number_e164)
+        updates.append({'phone_id': phone_id, 'number_e164': number_e164})
+
+    if updates:
+        connection.execute(
+            phones.update()
+            .where(phones.c.id == sa.bindparam('phone_id'))
+            .values(number_e164=sa.bindparam('number_e164')),
+            updates
+        )
+
+    op.create_index('ix_phones_number_e164', 'phones', ['number_e164'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_phones_number_e164', table_name='phones')
+    op.drop_column('phones', 'number_e164')
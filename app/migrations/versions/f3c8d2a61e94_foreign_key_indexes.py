@@ -0,0 +1,76 @@
+"""foreign key indexes
+
+Revision ID: f3c8d2a61e94
+Revises: e7b2c9f4a105
+Create Date: 2026-10-18 15:48:03.117482
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c8d2a61e94'
+down_revision: Union[str, Sequence[str], None] = 'e7b2c9f4a105'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (имя индекса, таблица, колонка, уникальный)
+INDEXES = (
+    ('ix_organizations_building_id', 'organizations', 'building_id', False),
+    ('ix_phones_organization_id', 'phones', 'organization_id', False),
+    ('ix_organizations_activities_activity_id', 'organizations_activities', 'activity_id', False),
+    ('ix_activities_path', 'activities', 'path', True),
+)
+
+
+def index_is_valid(connection, name: str) -> Union[bool, None]:
+    """Возвращает pg_index.indisvalid индекса или None, если индекса нет."""
+    return connection.execute(
+        sa.text(
+            "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND pg_table_is_visible(c.oid)"
+        ),
+        {'name': name}
+    ).scalar_one_or_none()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    connection = op.get_bind()
+
+    # Уникальный индекс не построится на повторяющихся путях; проверяем заранее, пока ничего не создано
+    duplicates = connection.execute(
+        sa.text("SELECT path FROM activities GROUP BY path HAVING count(*) > 1 ORDER BY path LIMIT 10")
+    ).scalars().all()
+    if duplicates:
+        raise RuntimeError(
+            f"activities.path has duplicates ({', '.join(duplicates)}); rename them before creating ix_activities_path."
+        )
+
+    # CONCURRENTLY не блокирует запись в таблицы, но не может выполняться внутри транзакции.
+    # Прерванное построение оставляет невалидный индекс: при повторном запуске он удаляется и строится заново
+    with op.get_context().autocommit_block():
+        for name, table, column, unique in INDEXES:
+            valid = index_is_valid(connection, name)
+            if valid:
+                continue
+            if valid is not None:
+                op.drop_index(name, table_name=table, postgresql_concurrently=True)
+
+            op.create_index(
+                name,
+                table,
+                [column],
+                unique=unique,
+                postgresql_concurrently=True
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
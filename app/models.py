@@ -1,5 +1,7 @@
 from sqlalchemy.orm import declarative_base, relationship
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Table
+import math
+from sqlalchemy import Column, Integer, SmallInteger, String, Float, ForeignKey, Table, Index, func, literal
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
 
 Base = declarative_base()
 
@@ -7,7 +9,17 @@ organizations_activities = Table(
     'organizations_activities',
     Base.metadata,
     Column("organization_id", Integer, ForeignKey("organizations.id"), primary_key=True),
-    Column("activity_id", Integer, ForeignKey("activities.id"), primary_key=True)
+    Column("activity_id", Integer, ForeignKey("activities.id"), primary_key=True, index=True)
+)
+
+# Транзитивное замыкание дерева видов деятельности: пара (предок, потомок) для каждого узла,
+# включая сам узел с depth = 0
+activity_closure = Table(
+    'activity_closure',
+    Base.metadata,
+    Column("ancestor_id", Integer, ForeignKey("activities.id", ondelete="CASCADE"), primary_key=True),
+    Column("descendant_id", Integer, ForeignKey("activities.id", ondelete="CASCADE"), primary_key=True, index=True),
+    Column("depth", Integer, nullable=False) # Расстояние от предка до потомка
 )
 
 class Organization(Base):
@@ -15,7 +27,8 @@ class Organization(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False) # Название организации
-    building_id = Column(Integer, ForeignKey("buildings.id"), nullable=True) # Идентификатор здания организации
+    building_id = Column(Integer, ForeignKey("buildings.id"), nullable=True, index=True) # Идентификатор здания организации
+    version = Column(Integer, nullable=False, server_default="1") # Версия записи, увеличивается при каждом изменении
 
     phones = relationship("Phone", back_populates="organization", cascade="all, delete-orphan")
     building = relationship("Building", back_populates="organizations")
@@ -26,7 +39,9 @@ class Phone(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     number = Column(String, nullable=False) # Номер телефона
-    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=True) # Идентификатор организации
+    number_e164 = Column(String, nullable=True, unique=True, index=True) # Номер в формате E.164 для обратного поиска
+    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=True, index=True) # Идентификатор организации
+    version = Column(Integer, nullable=False, server_default="1") # Версия записи, увеличивается при каждом изменении
 
     organization = relationship("Organization", back_populates="phones")
 
@@ -40,14 +55,106 @@ class Building(Base):
     house_number = Column(String, nullable=False) # Номер дома
     latitude = Column(Float, nullable=True) # Широта
     longitude = Column(Float, nullable=True) # Долгота
+    version = Column(Integer, nullable=False, server_default="1") # Версия записи, увеличивается при каждом изменении
 
     organizations = relationship("Organization", back_populates="building")
 
+# Триграммный GIN-индекс для поиска организаций по части названия
+Index(
+    "ix_organizations_name_trgm",
+    Organization.name,
+    postgresql_using="gin",
+    postgresql_ops={"name": "gin_trgm_ops"}
+)
+
+# SP-GiST-индекс по точке (долгота, широта) для поиска зданий в прямоугольной области.
+# Поддерживает тот же оператор <@ box, что GiST, а вставка в него в разы дешевле
+Index(
+    "ix_buildings_location",
+    func.point(Building.longitude, Building.latitude),
+    postgresql_using="spgist"
+)
+
+EARTH_RADIUS_M = 6371008.8 # Средний радиус Земли, м
+
+def mercator_point(latitude, longitude):
+    """
+    Точка здания в проекции Меркатора, в метрах на экваторе.
+    Проекция равноугольная: вблизи точки масштаб одинаков по всем направлениям,
+    поэтому порядок по евклидову расстоянию совпадает с порядком по расстоянию на местности.
+    Радиус встроен в SQL литералом, чтобы выражение в запросе совпадало с выражением индекса.
+    """
+    radius = literal(EARTH_RADIUS_M, literal_execute=True)
+
+    return func.point(radius * func.radians(longitude), radius * func.asinh(func.tan(func.radians(latitude))))
+
+def mercator_xy(latitude: float, longitude: float) -> tuple[float, float]:
+    """
+    То же преобразование, что mercator_point, для координат из запроса.
+    """
+    return (
+        EARTH_RADIUS_M * math.radians(longitude),
+        EARTH_RADIUS_M * math.asinh(math.tan(math.radians(latitude)))
+    )
+
+# SP-GiST-индекс по точке в проекции Меркатора для поиска ближайших зданий (KNN, оператор <->)
+Index(
+    "ix_buildings_mercator",
+    mercator_point(Building.latitude, Building.longitude),
+    postgresql_using="spgist"
+)
+
+# Кластеры организаций для карты: ячейки — тайлы уровня zoom + CLUSTER_GRID_SHIFT в проекции Меркатора.
+# Обновляются вместе с организациями и зданиями в crud-функциях (app/crud/clusters_crud.py)
+class OrganizationCluster(Base):
+    __tablename__ = "organization_clusters"
+
+    zoom = Column(SmallInteger, primary_key=True) # Уровень масштаба карты
+    cell_x = Column(Integer, primary_key=True) # Номер ячейки по долготе
+    cell_y = Column(Integer, primary_key=True) # Номер ячейки по широте, с севера на юг
+    organizations = Column(Integer, nullable=False) # Число организаций в ячейке
+    latitude_sum = Column(Float, nullable=False) # Сумма широт зданий по организациям, для центра кластера
+    longitude_sum = Column(Float, nullable=False) # Сумма долгот зданий по организациям
+
 class Activity(Base):
     __tablename__ = "activities"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False) # Название вида деятельности
-    path = Column(String, nullable=False) # Ссылка на деятельность в древовидной структуре
+    path = Column(String, nullable=False, unique=True, index=True) # Ссылка на деятельность в древовидной структуре
+    version = Column(Integer, nullable=False, server_default="1") # Версия записи, увеличивается при каждом изменении
 
     organizations = relationship('Organization', secondary=organizations_activities, back_populates="activities")
+
+# Денормализованная модель чтения для фильтров main_logic: одна строка на организацию с координатами здания,
+# видами деятельности вместе с предками, телефонами и поисковым вектором названия.
+# Обновляется вместе с исходными таблицами в crud-функциях (app/crud/search_crud.py)
+class OrganizationSearch(Base):
+    __tablename__ = "organization_search"
+
+    organization_id = Column(Integer, ForeignKey("organizations.id", ondelete="CASCADE"), primary_key=True) # Идентификатор организации
+    name = Column(String, nullable=False) # Название организации
+    building_id = Column(Integer, nullable=True, index=True) # Идентификатор здания организации
+    latitude = Column(Float, nullable=True) # Широта здания
+    longitude = Column(Float, nullable=True) # Долгота здания
+    activity_ids = Column(ARRAY(Integer), nullable=False, server_default="{}") # Виды деятельности организации и все их предки
+    phones = Column(ARRAY(String), nullable=False, server_default="{}") # Телефоны организации в формате E.164
+    search_vector = Column(TSVECTOR, nullable=False) # Слова названия для полнотекстового поиска
+
+# GIN-индекс для отбора по виду деятельности с дочерними: activity_ids @> ARRAY[id]
+Index("ix_organization_search_activity_ids", OrganizationSearch.activity_ids, postgresql_using="gin")
+
+# GIN-индекс для поиска по словам и префиксам слов названия
+Index("ix_organization_search_search_vector", OrganizationSearch.search_vector, postgresql_using="gin")
+
+# SP-GiST-индексы по точке здания: прямоугольная область и ближайшие организации (KNN)
+Index(
+    "ix_organization_search_location",
+    func.point(OrganizationSearch.longitude, OrganizationSearch.latitude),
+    postgresql_using="spgist"
+)
+Index(
+    "ix_organization_search_mercator",
+    mercator_point(OrganizationSearch.latitude, OrganizationSearch.longitude),
+    postgresql_using="spgist"
+)
@@ -0,0 +1,194 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+from pydantic_core import to_jsonable_python
+from app.metrics import RESPONSE_CACHE_EVICTIONS, RESPONSE_CACHE_REQUESTS, update_response_cache_gauges
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Откуда читает текущий запрос: "primary" или "replica"; выставляется зависимостью get_read_db
+read_source: ContextVar[str] = ContextVar("read_source", default="primary")
+# Запрос в окне read-your-writes после записи клиента: кэш не читается и не пополняется
+cache_bypass: ContextVar[bool] = ContextVar("cache_bypass", default=False)
+
+class InMemoryBackend:
+    """
+    LRU-кэш в памяти процесса с ограничением по числу записей и времени жизни.
+    Инвалидация видна только в текущем процессе, поэтому бэкенд допустим,
+    только если приложение работает в одном процессе.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            RESPONSE_CACHE_EVICTIONS.labels(reason="ttl").inc()
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            RESPONSE_CACHE_EVICTIONS.labels(reason="size").inc()
+
+    async def generations(self, tags: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    async def bump(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+
+    def size(self) -> int:
+        return len(self._entries)
+
+class RedisBackend:
+    """
+    Кэш в Redis (или совместимом сервере), общий для всех процессов.
+    Вытеснение по размеру выполняет сам сервер согласно maxmemory-policy (allkeys-lru).
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("Для RESPONSE_CACHE_BACKEND=redis установите пакет redis.") from exc
+
+        self._redis = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self._redis.get(f"response:{key}")
+        return None if value is None else json.loads(value)
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        await self._redis.set(f"response:{key}", json.dumps(value), ex=ttl)
+
+    async def generations(self, tags: Iterable[str]) -> Tuple[int, ...]:
+        values = await self._redis.mget([f"generation:{tag}" for tag in tags])
+        return tuple(int(value or 0) for value in values)
+
+    async def bump(self, tags: Iterable[str]) -> None:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.incr(f"generation:{tag}")
+            await pipe.execute()
+
+    def size(self) -> int:
+        return 0
+
+class ResponseCache:
+    """
+    Кэш ответов read-эндпоинтов.
+    Ключ включает эндпоинт, параметры и поколения тегов — сущностей, от которых зависит ответ.
+    Запись в сущность увеличивает поколение ее тега, и все зависящие ключи перестают совпадать.
+    Ответы, прочитанные с реплики, хранятся под отдельными ключами и не дольше replica_ttl:
+    отстающая реплика может вернуть данные до записи уже под новым поколением тега.
+    """
+
+    def __init__(self, backend, ttl: int, replica_ttl: int, enabled: bool = True):
+        self.backend = backend
+        self.ttl = ttl
+        self.replica_ttl = min(ttl, replica_ttl)
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_set(
+        self,
+        endpoint: str,
+        params: dict,
+        tags: Tuple[str, ...],
+        loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Возвращает закэшированный ответ или вызывает loader и кэширует его результат.
+        Исключения loader (например, 404) не кэшируются.
+        В окне read-your-writes кэш пропускается, чтобы клиент не получил ответ, сохраненный до его записи.
+        """
+        if not self.enabled or cache_bypass.get():
+            return await loader()
+
+        source = read_source.get()
+        generations = await self.backend.generations(tags)
+        key = f"{endpoint}:{json.dumps(params, sort_keys=True, default=str)}:{generations}:{source}"
+
+        cached = await self.backend.get(key)
+        if cached is not None:
+            self.hits += 1
+            RESPONSE_CACHE_REQUESTS.labels(endpoint=endpoint, result="hit").inc()
+            update_response_cache_gauges(self)
+            return cached
+
+        self.misses += 1
+        RESPONSE_CACHE_REQUESTS.labels(endpoint=endpoint, result="miss").inc()
+
+        # Сериализатор pydantic-core на порядок быстрее jsonable_encoder на списках схем
+        value = to_jsonable_python(await loader())
+        await self.backend.set(key, value, self.replica_ttl if source == "replica" else self.ttl)
+        update_response_cache_gauges(self)
+
+        return value
+
+    async def invalidate(self, *tags: str) -> None:
+        if self.enabled:
+            await self.backend.bump(tags)
+
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+def create_response_cache() -> ResponseCache:
+    """
+    Создает кэш ответов по RESPONSE_CACHE_BACKEND. Кэш в памяти не видит инвалидаций из других
+    процессов, поэтому при нескольких процессах (WEB_WORKERS * WEB_INSTANCES) режим auto выключает кэш
+    с предупреждением в журнале, а явный memory считается ошибкой конфигурации.
+    Общий кэш для нескольких процессов — redis.
+    """
+    processes = settings.web_workers * settings.WEB_INSTANCES
+    backend_name = settings.RESPONSE_CACHE_BACKEND
+    if backend_name == "auto":
+        backend_name = "memory" if processes == 1 else "none"
+        if backend_name == "none":
+            logger.warning(
+                "Кэш ответов выключен: RESPONSE_CACHE_BACKEND=auto при %d процессах. "
+                "Для кэша при нескольких процессах задайте RESPONSE_CACHE_BACKEND=redis и REDIS_URL.",
+                processes
+            )
+
+    if backend_name == "memory" and processes > 1:
+        raise RuntimeError(
+            f"RESPONSE_CACHE_BACKEND=memory не работает в {processes} процессах: "
+            "установите RESPONSE_CACHE_BACKEND=redis или none."
+        )
+
+    if backend_name == "redis":
+        backend = RedisBackend(settings.REDIS_URL)
+    else:
+        backend = InMemoryBackend(max_size=settings.RESPONSE_CACHE_MAX_SIZE)
+
+    return ResponseCache(
+        backend=backend,
+        ttl=settings.RESPONSE_CACHE_TTL,
+        replica_ttl=settings.RESPONSE_CACHE_REPLICA_TTL,
+        enabled=backend_name != "none"
+    )
+
+response_cache = create_response_cache()
+
+update_response_cache_gauges(response_cache)
@@ -0,0 +1,116 @@
+import functools
+import inspect
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, FrozenSet
+import orjson
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from pydantic_core import to_jsonable_python
+from app.metrics import request_stats
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+# Формат тела ответа, выбранный ContentNegotiationMiddleware по заголовку Accept
+response_media_type: ContextVar[str] = ContextVar("response_media_type", default=JSON_MEDIA_TYPE)
+
+def accepts_raw_json() -> bool:
+    """
+    Можно ли отдать готовый JSON-документ как есть: клиент не запросил msgpack.
+    """
+    return response_media_type.get() == JSON_MEDIA_TYPE
+
+def encode_default(obj: Any) -> Any:
+    """
+    Приводит к сериализуемому виду объекты, которые orjson и msgpack не знают сами,
+    чтобы схемы из app/schemas.py можно было отдавать в ответе напрямую.
+    """
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+def encode_json(content: Any) -> bytes:
+    return orjson.dumps(content, default=encode_default, option=orjson.OPT_NON_STR_KEYS)
+
+def encode_msgpack(content: Any) -> bytes:
+    import msgpack
+
+    return msgpack.packb(content, default=encode_default)
+
+def mark_endpoint_return(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Оборачивает эндпоинт, чтобы при успешном возврате отметить время в статистике запроса.
+    Синхронные эндпоинты остаются синхронными: FastAPI по-прежнему выполняет их в пуле потоков.
+    """
+    def mark() -> None:
+        stats = request_stats.get()
+        if stats is not None:
+            stats.endpoint_returned_at = time.perf_counter()
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def timed_endpoint(*args: Any, **kwargs: Any) -> Any:
+            result = await endpoint(*args, **kwargs)
+            mark()
+            return result
+    else:
+        @functools.wraps(endpoint)
+        def timed_endpoint(*args: Any, **kwargs: Any) -> Any:
+            result = endpoint(*args, **kwargs)
+            mark()
+            return result
+
+    return timed_endpoint
+
+class TimedRoute(APIRoute):
+    """
+    Маршрут, отмечающий возврат из эндпоинта. От этой отметки TimedResponse.render отсчитывает этап serialize,
+    поэтому в него входят проверка результата по response_model, приведение к JSON-совместимым типам
+    и кодирование тела.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        super().__init__(path, mark_endpoint_return(endpoint), **kwargs)
+
+class TimedResponse(JSONResponse):
+    """
+    Ответ по умолчанию: кодирует тело через orjson, а если клиент запросил application/msgpack —
+    через msgpack. Время от возврата из эндпоинта (для ответов, созданных в самом эндпоинте, —
+    время кодирования) учитывается как этап serialize текущего запроса.
+    """
+
+    def render(self, content: Any) -> bytes:
+        stats = request_stats.get()
+        started = time.perf_counter()
+        if stats is not None and stats.endpoint_returned_at is not None:
+            started, stats.endpoint_returned_at = stats.endpoint_returned_at, None
+        try:
+            if response_media_type.get() == MSGPACK_MEDIA_TYPE:
+                self.media_type = MSGPACK_MEDIA_TYPE
+                return encode_msgpack(content)
+            return encode_json(content)
+        finally:
+            if stats is not None:
+                stats.add_phase("serialize", time.perf_counter() - started)
+
+class RawJSONResponse(Response):
+    """
+    Ответ с готовым JSON-документом (например, собранным в Postgres): тело отдается как есть,
+    без разбора, проверки по response_model и повторного кодирования.
+    """
+    media_type = JSON_MEDIA_TYPE
+
+def fields_response(content: Any, fields: FrozenSet[str]) -> TimedResponse:
+    """
+    Ответ с карточкой или списком карточек, в которых оставлены только поля верхнего уровня из fields.
+    Отдается в обход response_model, так как схема требует полный набор полей.
+    """
+    content = to_jsonable_python(content)
+    if isinstance(content, list):
+        content = [{name: value for name, value in item.items() if name in fields} for item in content]
+    else:
+        content = {name: value for name, value in content.items() if name in fields}
+
+    return TimedResponse(content)
@@ -1,13 +1,25 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import PositiveInt
 from typing import List
-from ..schemas import ActOrgSchema, ActOrgUpdateSchema, ActivitySchema, OrganizationSchema
+from ..schemas import (
+    ActOrgSchema,
+    ActOrgUpdateSchema,
+    ActOrgBatchSchema,
+    ActOrgBatchResultSchema,
+    ActivitySchema,
+    OrganizationActivitiesSchema
+)
+from ..responses import TimedRoute
 from ..utils import verify_api_key
-from ..deps import get_db
+from ..deps import get_db, get_read_db
 
 from ..crud.act_org_crud import (
     create_act_org,
+    link_act_org_batch,
+    unlink_act_org_batch,
+    replace_organization_activities,
+    get_act_org,
     get_activities_by_org_id,
     get_organizations_by_act_id,
     delete_act_org,
@@ -17,6 +29,7 @@ from ..crud.act_org_crud import (
 router = APIRouter(
     prefix="/act_org",
     tags=["Activities/Organizations"],
+    route_class=TimedRoute,
 )
 
 @router.post("/organizations/{org_id}/activities/{activity_id}", response_model=ActOrgSchema, status_code=status.HTTP_201_CREATED)
@@ -33,7 +46,7 @@ async def create_act_org_endpoint(
 @router.get("/activities/{organization_id}", response_model=List[ActivitySchema], status_code=status.HTTP_200_OK)
 async def get_activities_by_org_id_endpoint(
     organization_id: PositiveInt,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     _: None = Depends(verify_api_key)
 ):
     """
@@ -44,10 +57,91 @@ async def get_activities_by_org_id_endpoint(
 @router.get("/organizations/{activity_id}", response_model=List[str], status_code=status.HTTP_200_OK)
 async def get_organizations_by_act_id_endpoint(
     activity_id: PositiveInt,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     _: None = Depends(verify_api_key)
 ):
     """
     Эндпоинт для получения организаций с указанным видом деятельности.
     """
-    return await get_organizations_by_act_id(activity_id=activity_id, db=db)
\ No newline at end of file
+    return await get_organizations_by_act_id(activity_id=activity_id, db=db)
+
+@router.get("/organizations/{organization_id}/activities/{activity_id}", response_model=ActOrgSchema, status_code=status.HTTP_200_OK)
+async def get_act_org_endpoint(
+    organization_id: PositiveInt,
+    activity_id: PositiveInt,
+    db: AsyncSession = Depends(get_read_db),
+    _: None = Depends(verify_api_key)
+):
+    """
+    Эндпоинт для получения связи организации с видом деятельности.
+    """
+    return await get_act_org(organization_id=organization_id, activity_id=activity_id, db=db)
+
+@router.put("/organizations/{organization_id}/activities/{activity_id}", response_model=ActOrgSchema, status_code=status.HTTP_200_OK)
+async def update_act_org_endpoint(
+    organization_id: PositiveInt,
+    activity_id: PositiveInt,
+    update_data: ActOrgUpdateSchema,
+    db: AsyncSession = Depends(get_db),
+    _: None = Depends(verify_api_key)
+):
+    """
+    Эндпоинт для переноса связи на другую организацию или другой вид деятельности.
+    """
+    return await update_act_org(
+        organization_id=organization_id,
+        activity_id=activity_id,
+        update_data=update_data,
+        db=db
+    )
+
+@router.delete("/organizations/{organization_id}/activities/{activity_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_act_org_endpoint(
+    organization_id: PositiveInt,
+    activity_id: PositiveInt,
+    db: AsyncSession = Depends(get_db),
+    _: None = Depends(verify_api_key)
+):
+    """
+    Эндпоинт для удаления связи организации с видом деятельности.
+    Возвращает 204 No Content при успешном удалении.
+    """
+    await delete_act_org(organization_id=organization_id, activity_id=activity_id, db=db)
+
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.put("/organizations/{organization_id}/activities", response_model=ActOrgBatchResultSchema, status_code=status.HTTP_200_OK)
+async def replace_organization_activities_endpoint(
+    organization_id: PositiveInt,
+    data: OrganizationActivitiesSchema,
+    db: AsyncSession = Depends(get_db),
+    _: None = Depends(verify_api_key)
+):
+    """
+    Эндпоинт для замены всего набора видов деятельности организации.
+    Пустой список удаляет все связи организации.
+    """
+    return await replace_organization_activities(organization_id=organization_id, data=data, db=db)
+
+@router.post("/batch", response_model=ActOrgBatchResultSchema, status_code=status.HTTP_200_OK)
+async def link_act_org_batch_endpoint(
+    data: ActOrgBatchSchema,
+    db: AsyncSession = Depends(get_db),
+    _: None = Depends(verify_api_key)
+):
+    """
+    Эндпоинт для создания многих связей за один запрос.
+    Все id проверяются до вставки; уже существующие связи пропускаются.
+    """
+    return await link_act_org_batch(data=data, db=db)
+
+@router.post("/batch/delete", response_model=ActOrgBatchResultSchema, status_code=status.HTTP_200_OK)
+async def unlink_act_org_batch_endpoint(
+    data: ActOrgBatchSchema,
+    db: AsyncSession = Depends(get_db),
+    _: None = Depends(verify_api_key)
+):
+    """
+    Эндпоинт для удаления многих связей за один запрос.
+    """
+    return await unlink_act_org_batch(data=data, db=db)
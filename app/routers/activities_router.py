@@ -1,15 +1,18 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Header, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 from ..schemas import ActivitySchema, ActivityBaseSchema, ActivityUpdateSchema, ActivityTreeSchema
-from ..utils import verify_api_key
-from ..deps import get_db
+from ..responses import TimedRoute
+from ..utils import verify_api_key, not_modified
+from ..deps import get_db, get_read_db
+from ..activity_cache import activity_cache
 
 from ..crud.activities_crud import (
     create_activity,
     get_activity,
     get_activities_list,
     get_activity_tree,
+    get_activity_tree_etag,
     delete_activity,
     update_activity
 )
@@ -17,6 +20,7 @@ from ..crud.activities_crud import (
 router = APIRouter(
     prefix="/activities",
     tags=["Activities"],
+    route_class=TimedRoute,
 )
 
 @router.post("/", response_model=ActivitySchema, status_code=status.HTTP_201_CREATED)
@@ -30,10 +34,19 @@ async def create_activity_endpoint(
     """
     return await create_activity(activity_data=activity_data, db=db)
 
+@router.get("/cache/stats", status_code=status.HTTP_200_OK)
+async def get_activity_cache_stats_endpoint(
+    _: None = Depends(verify_api_key)
+):
+    """
+    Эндпоинт для получения счетчиков кэша дерева видов деятельности.
+    """
+    return activity_cache.stats()
+
 @router.get("/{activity_id}", response_model=ActivitySchema, status_code=status.HTTP_200_OK)
 async def get_activity_endpoint(
     activity_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     _: None = Depends(verify_api_key)
 ):
     """
@@ -44,17 +57,27 @@ async def get_activity_endpoint(
 @router.get("/{activity_id}/tree", response_model=ActivityTreeSchema, status_code=status.HTTP_200_OK)
 async def get_activity_tree_endpoint(
     activity_id: int,
-    db: AsyncSession = Depends(get_db),
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
     _: None = Depends(verify_api_key)
 ):
     """
     Эндпоинт для получения вида деятельности со вложенной структурой по id.
+    Возвращает ETag; при совпадении If-None-Match отвечает 304 без сборки дерева.
     """
-    return await get_activity_tree(activity_id=activity_id, db=db)
+    etag = await get_activity_tree_etag(activity_id=activity_id, db=db)
+    if (not_modified_response := not_modified(etag, if_none_match)) is not None:
+        return not_modified_response
+
+    activity_tree = await get_activity_tree(activity_id=activity_id, db=db)
+    response.headers["ETag"] = etag
+
+    return activity_tree
 
 @router.get("/", response_model=List[ActivityTreeSchema], status_code=status.HTTP_200_OK)
 async def get_activities_list_endpoint(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     _: None = Depends(verify_api_key),
 ):
     """
@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Header, Query, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import PositiveInt
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 from ..schemas import BuildingSchema, BuildingBaseSchema, BuildingUpdateSchema
-from ..utils import verify_api_key
-from ..deps import get_db
+from ..responses import TimedRoute
+from ..utils import verify_api_key, set_next_cursor, not_modified, PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+from ..deps import get_db, get_read_db
 
 from ..crud.buildings_crud import (
     create_building,
     get_building,
+    get_building_etag,
     get_buildings_list,
+    stream_buildings_list,
     delete_building,
     update_building
 )
@@ -16,6 +21,7 @@ from ..crud.buildings_crud import (
 router = APIRouter(
     prefix="/buildings",
     tags=["Buildings"],
+    route_class=TimedRoute,
 )
 
 @router.post("/", response_model=BuildingSchema, status_code=status.HTTP_201_CREATED)
@@ -32,23 +38,45 @@ async def create_building_endpoint(
 @router.get("/{building_id}", response_model=BuildingSchema, status_code=status.HTTP_200_OK)
 async def get_building_endpoint(
     building_id: int,
-    db: AsyncSession = Depends(get_db),
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
     _: None = Depends(verify_api_key)
 ):
     """
     Эндпоинт для получения здания по id.
+    Возвращает ETag; при совпадении If-None-Match отвечает 304.
     """
-    return await get_building(building_id=building_id, db=db)
+    etag = await get_building_etag(building_id=building_id, db=db)
+    if (not_modified_response := not_modified(etag, if_none_match)) is not None:
+        return not_modified_response
+
+    building = await get_building(building_id=building_id, db=db)
+    response.headers["ETag"] = etag
+
+    return building
 
 @router.get("/", response_model=List[BuildingSchema], status_code=status.HTTP_200_OK)
 async def get_buildings_list_endpoint(
-    db: AsyncSession = Depends(get_db),
+    response: Response,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX, description="Размер страницы"),
+    after: Optional[PositiveInt] = Query(None, description="Id последней записи предыдущей страницы"),
+    stream: bool = Query(False, description="Отдать все записи потоком в формате NDJSON"),
+    db: AsyncSession = Depends(get_read_db),
     _: None = Depends(verify_api_key),
 ):
     """
-    Эндпоинт для получения всех зданий.
+    Эндпоинт для получения списка зданий с keyset-пагинацией по id.
+    Если страница заполнена, id последней записи возвращается в заголовке X-Next-After.
+    При stream=true все записи отдаются построчно в формате NDJSON.
     """
-    return await get_buildings_list(db=db)
+    if stream:
+        return StreamingResponse(stream_buildings_list(db=db, after=after), media_type="application/x-ndjson")
+
+    buildings = await get_buildings_list(db=db, limit=limit, after=after)
+    set_next_cursor(response, buildings, limit)
+
+    return buildings
 
 @router.delete("/{building_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_building_endpoint(
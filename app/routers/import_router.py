@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, Query, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..schemas import ImportResultSchema
+from ..responses import TimedRoute
+from ..utils import verify_api_key
+from ..deps import get_db
+from ..crud.import_crud import ImportEntity, ImportFormat, import_records
+
+router = APIRouter(
+    prefix="/import",
+    tags=["Import"],
+    route_class=TimedRoute,
+)
+
+@router.post("/{entity}", response_model=ImportResultSchema, status_code=status.HTTP_200_OK)
+async def import_records_endpoint(
+    entity: ImportEntity,
+    request: Request,
+    data_format: ImportFormat = Query(ImportFormat.ndjson, alias="format", description="Формат тела запроса"),
+    dry_run: bool = Query(False, description="Проверить данные без сохранения"),
+    db: AsyncSession = Depends(get_db),
+    _: None = Depends(verify_api_key)
+):
+    """
+    Эндпоинт для массового импорта зданий, организаций, телефонов или связей организаций с видами деятельности.
+    Тело запроса — NDJSON (одна запись на строку) или CSV с заголовком; поля совпадают со схемами создания,
+    для зданий, организаций и телефонов можно задать id, чтобы ссылаться на них в следующих импортах.
+    Тело читается потоком. Записи с ошибками не добавляются и возвращаются с номерами строк.
+    """
+    return await import_records(
+        entity=entity,
+        chunks=request.stream(),
+        data_format=data_format,
+        db=db,
+        dry_run=dry_run
+    )
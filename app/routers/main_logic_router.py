@@ -1,72 +1,148 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Path, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import PositiveInt
-from typing import List
-from ..schemas import OrganizationSchema
-from ..utils import verify_api_key
-from ..deps import get_db
+from typing import FrozenSet, List, Optional, Union
+from ..schemas import ClusterSchema, OrganizationSchema, OrganizationSearchSchema, OrganizationNearbySchema, OrganizationMatchSchema
+from ..utils import verify_api_key, organization_fields, set_next_cursor, PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+from ..deps import get_read_db
+from ..responses import RawJSONResponse, accepts_raw_json, fields_response, TimedRoute
+from ..settings import settings
+from ..response_cache import response_cache
 from ..crud.act_org_crud import get_organizations_by_act_id
+from ..crud.clusters_crud import get_tile_clusters, CLUSTER_MAX_ZOOM
 from ..crud.organizations_crud import (get_organization_by_id, 
-                                       get_organization_by_name, 
+                                       get_organization_by_name,
+                                       get_organization_card_json_by_id,
+                                       get_organization_card_json_by_name,
                                        get_organizations_in_rectangle,
-                                       get_organizations_by_building_id)
+                                       get_organizations_by_building_id,
+                                       get_organizations_nearby,
+                                       search_organizations,
+                                       search_organizations_by_name)
 
 router = APIRouter(
     prefix="/main_logic",
     tags=["Главный функционал"],
+    route_class=TimedRoute,
 )
 
+# Карточка организации включает здание, телефоны и виды деятельности
+ORGANIZATION_CARD_TAGS = ("organizations", "buildings", "phones", "activities", "act_org")
+
 @router.get("/organizations_by_building_id/{building_id}", response_model=List[str], status_code=status.HTTP_200_OK)
 async def get_organizations_by_building_id_endpoint(
     building_id: PositiveInt,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     _: None = Depends(verify_api_key)
 ):
     """
     Эндпоинт для получения списка организаций в указанном здании.
     """
-    return await get_organizations_by_building_id(building_id=building_id, db=db)
+    return await response_cache.get_or_set(
+        "organizations_by_building_id",
+        {"building_id": building_id},
+        tags=("organizations", "buildings"),
+        loader=lambda: get_organizations_by_building_id(building_id=building_id, db=db)
+    )
 
 @router.get("/organizations/{activity_id}", response_model=List[str], status_code=status.HTTP_200_OK)
 async def get_organizations_by_act_id_endpoint(
     activity_id: PositiveInt,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     _: None = Depends(verify_api_key)
 ):
     """
     Эндпоинт для получения организаций с указанным видом деятельности.
     """
-    return await get_organizations_by_act_id(activity_id=activity_id, db=db)
+    return await response_cache.get_or_set(
+        "organizations_by_act_id",
+        {"activity_id": activity_id},
+        tags=("organizations", "activities", "act_org"),
+        loader=lambda: get_organizations_by_act_id(activity_id=activity_id, db=db)
+    )
 
 @router.get("/org_by_id/{organization_id}", response_model=OrganizationSchema, status_code=status.HTTP_200_OK)
 async def get_organization_by_id_endpoint(
     organization_id: int,
-    db: AsyncSession = Depends(get_db),
+    fields: Optional[FrozenSet[str]] = Depends(organization_fields),
+    db: AsyncSession = Depends(get_read_db),
     _: None = Depends(verify_api_key),
 ):
     """
     Эндпоинт для получения организации по id.
+    С RESPONSE_SQL_JSON карточка собирается в Postgres и отдается без ORM и pydantic.
     """
-    return await get_organization_by_id(organization_id=organization_id, db=db)
+    if settings.RESPONSE_SQL_JSON and accepts_raw_json():
+        return RawJSONResponse(await response_cache.get_or_set(
+            "org_by_id",
+            {"organization_id": organization_id, "fields": fields and sorted(fields), "sql_json": True},
+            tags=ORGANIZATION_CARD_TAGS,
+            loader=lambda: get_organization_card_json_by_id(organization_id=organization_id, db=db, fields=fields)
+        ))
+
+    organization = await response_cache.get_or_set(
+        "org_by_id",
+        {"organization_id": organization_id, "fields": fields and sorted(fields)},
+        tags=ORGANIZATION_CARD_TAGS,
+        loader=lambda: get_organization_by_id(organization_id=organization_id, db=db, fields=fields)
+    )
+
+    return organization if fields is None else fields_response(organization, fields)
 
 @router.get("/org_by_name/{organization_name}", response_model=OrganizationSchema, status_code=status.HTTP_200_OK)
 async def get_organization_by_name_endpoint(
     organization_name: str,
-    db: AsyncSession = Depends(get_db),
+    fields: Optional[FrozenSet[str]] = Depends(organization_fields),
+    db: AsyncSession = Depends(get_read_db),
     _: None = Depends(verify_api_key),
 ):
     """
     Эндпоинт для получения организации по его имени.
+    С RESPONSE_SQL_JSON карточка собирается в Postgres и отдается без ORM и pydantic.
+    """
+    if settings.RESPONSE_SQL_JSON and accepts_raw_json():
+        return RawJSONResponse(await response_cache.get_or_set(
+            "org_by_name",
+            {"organization_name": organization_name, "fields": fields and sorted(fields), "sql_json": True},
+            tags=ORGANIZATION_CARD_TAGS,
+            loader=lambda: get_organization_card_json_by_name(organization_name=organization_name, db=db, fields=fields)
+        ))
+
+    organization = await response_cache.get_or_set(
+        "org_by_name",
+        {"organization_name": organization_name, "fields": fields and sorted(fields)},
+        tags=ORGANIZATION_CARD_TAGS,
+        loader=lambda: get_organization_by_name(organization_name=organization_name, db=db, fields=fields)
+    )
+
+    return organization if fields is None else fields_response(organization, fields)
+
+@router.get("/orgs_search_by_name", response_model=List[OrganizationSearchSchema], status_code=status.HTTP_200_OK)
+async def search_organizations_by_name_endpoint(
+    q: str = Query(min_length=1, max_length=255, description="Часть названия организации"),
+    limit: int = Query(10, ge=1, le=100, description="Максимальное число результатов"),
+    db: AsyncSession = Depends(get_read_db),
+    _: None = Depends(verify_api_key),
+):
     """
-    return await get_organization_by_name(organization_name=organization_name, db=db)
+    Эндпоинт для поиска организаций по части названия.
+    Результаты упорядочены по убыванию сходства названия с запросом.
+    """
+    return await response_cache.get_or_set(
+        "orgs_search_by_name",
+        {"q": q, "limit": limit},
+        tags=("organizations",),
+        loader=lambda: search_organizations_by_name(query=q, limit=limit, db=db)
+    )
 
-@router.get("/orgs_in_rectangle", response_model=List[str], status_code=status.HTTP_200_OK)
+@router.get("/orgs_in_rectangle", response_model=Union[List[str], List[OrganizationSchema]], status_code=status.HTTP_200_OK)
 async def get_organizations_in_rectangle_endpoint(
     lat_min: float,
     lon_min: float,
     lat_max: float,
     lon_max: float,
-    db: AsyncSession = Depends(get_db),
+    fields: Optional[FrozenSet[str]] = Depends(organization_fields),
+    db: AsyncSession = Depends(get_read_db),
     _: None = Depends(verify_api_key)
 ):
     """
@@ -76,11 +152,115 @@ async def get_organizations_in_rectangle_endpoint(
         Параметры:
         - lat_min, lon_min — юго-западная точка
         - lat_max, lon_max — северо-восточная точка
+        - fields, expand — если задан любой из них, вместо названий возвращаются карточки с этими полями и связями
+          (например, expand=building — названия и адреса без запросов телефонов и видов деятельности)
+    """
+    organizations = await response_cache.get_or_set(
+        "orgs_in_rectangle",
+        {"lat_min": lat_min, "lon_min": lon_min, "lat_max": lat_max, "lon_max": lon_max, "fields": fields and sorted(fields)},
+        tags=ORGANIZATION_CARD_TAGS if fields else ("organizations", "buildings"),
+        loader=lambda: get_organizations_in_rectangle(
+            lat_min=lat_min,
+            lon_min=lon_min,
+            lat_max=lat_max,
+            lon_max=lon_max,
+            db=db,
+            fields=fields
+        )
+    )
+
+    return organizations if fields is None else fields_response(organizations, fields)
+
+@router.get("/orgs_nearby", response_model=List[OrganizationNearbySchema], status_code=status.HTTP_200_OK)
+async def get_organizations_nearby_endpoint(
+    lat: float = Query(ge=-90, le=90, description="Широта точки"),
+    lon: float = Query(ge=-180, le=180, description="Долгота точки"),
+    limit: int = Query(20, ge=1, le=100, description="Число ближайших организаций"),
+    radius_m: Optional[float] = Query(None, gt=0, le=100_000, description="Максимальное расстояние, м"),
+    activity_id: Optional[PositiveInt] = Query(None, description="Вид деятельности, включая дочерние"),
+    db: AsyncSession = Depends(get_read_db),
+    _: None = Depends(verify_api_key)
+):
+    """
+    Эндпоинт для получения ближайших к точке организаций с расстоянием до них.
+    Результаты упорядочены по возрастанию расстояния.
+    """
+    tags = ("organizations", "buildings") + (("activities", "act_org") if activity_id is not None else ())
+
+    return await response_cache.get_or_set(
+        "orgs_nearby",
+        {"lat": lat, "lon": lon, "limit": limit, "radius_m": radius_m, "activity_id": activity_id},
+        tags=tags,
+        loader=lambda: get_organizations_nearby(
+            latitude=lat,
+            longitude=lon,
+            limit=limit,
+            radius_m=radius_m,
+            activity_id=activity_id,
+            db=db
+        )
+    )
+
+@router.get("/search", response_model=List[OrganizationMatchSchema], status_code=status.HTTP_200_OK)
+async def search_organizations_endpoint(
+    response: Response,
+    q: Optional[str] = Query(None, min_length=1, max_length=255, description="Начала слов названия, например \"вект том\""),
+    activity_id: Optional[PositiveInt] = Query(None, description="Вид деятельности, включая дочерние"),
+    building_id: Optional[PositiveInt] = Query(None, description="Идентификатор здания"),
+    lat_min: Optional[float] = Query(None, ge=-90, le=90, description="Широта юго-западной точки области"),
+    lon_min: Optional[float] = Query(None, ge=-180, le=180, description="Долгота юго-западной точки области"),
+    lat_max: Optional[float] = Query(None, ge=-90, le=90, description="Широта северо-восточной точки области"),
+    lon_max: Optional[float] = Query(None, ge=-180, le=180, description="Долгота северо-восточной точки области"),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Широта центра круга"),
+    lon: Optional[float] = Query(None, ge=-180, le=180, description="Долгота центра круга"),
+    radius_m: Optional[float] = Query(None, gt=0, le=100_000, description="Радиус круга, м"),
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX, description="Размер страницы"),
+    after: Optional[PositiveInt] = Query(None, description="Id последней записи предыдущей страницы"),
+    db: AsyncSession = Depends(get_read_db),
+    _: None = Depends(verify_api_key)
+):
     """
-    return await get_organizations_in_rectangle(
+    Эндпоинт для поиска организаций по нескольким фильтрам сразу: все заданные условия
+    (название, вид деятельности, здание, прямоугольная область, круг) должны выполняться одновременно.
+    Область задается всеми четырьмя lat_min, lon_min, lat_max, lon_max, круг — lat, lon и radius_m.
+    Результаты упорядочены по id; если страница заполнена, id последней записи возвращается в заголовке X-Next-After.
+    Комбинации фильтров почти не повторяются, поэтому ответ не кэшируется.
+    """
+    organizations = await search_organizations(
+        db=db,
+        limit=limit,
+        after=after,
+        name=q,
+        activity_id=activity_id,
+        building_id=building_id,
         lat_min=lat_min,
         lon_min=lon_min,
         lat_max=lat_max,
         lon_max=lon_max,
-        db=db
-    )
\ No newline at end of file
+        latitude=lat,
+        longitude=lon,
+        radius_m=radius_m
+    )
+    set_next_cursor(response, organizations, limit)
+
+    return organizations
+
+@router.get("/clusters/{zoom}/{x}/{y}", response_model=List[ClusterSchema], status_code=status.HTTP_200_OK)
+async def get_tile_clusters_endpoint(
+    zoom: int = Path(ge=0, le=CLUSTER_MAX_ZOOM, description="Уровень масштаба карты"),
+    x: int = Path(ge=0, description="Номер тайла по горизонтали"),
+    y: int = Path(ge=0, description="Номер тайла по вертикали"),
+    db: AsyncSession = Depends(get_read_db),
+    _: None = Depends(verify_api_key)
+):
+    """
+    Эндпоинт для получения кластеров организаций в тайле карты (схема нумерации тайлов z/x/y
+    как у OpenStreetMap). Возвращает для каждой непустой ячейки сетки 8x8 внутри тайла
+    число организаций и центр; пустой тайл — пустой список.
+    """
+    return await response_cache.get_or_set(
+        "clusters",
+        {"zoom": zoom, "x": x, "y": y},
+        tags=("organizations", "buildings"),
+        loader=lambda: get_tile_clusters(zoom=zoom, x=x, y=y, db=db)
+    )
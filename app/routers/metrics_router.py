@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, Response, status
+from prometheus_client import CONTENT_TYPE_LATEST
+from ..metrics import collect_metrics
+from ..responses import TimedRoute
+from ..utils import verify_api_key
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["Metrics"],
+    route_class=TimedRoute,
+)
+
+@router.get("", status_code=status.HTTP_200_OK)
+async def get_metrics_endpoint(
+    _: None = Depends(verify_api_key),
+):
+    """
+    Эндпоинт для получения метрик в формате Prometheus.
+    С PROMETHEUS_MULTIPROC_DIR возвращает метрики всех процессов-обработчиков, иначе — обработавшего запрос.
+    """
+    return Response(content=collect_metrics(), media_type=CONTENT_TYPE_LATEST)
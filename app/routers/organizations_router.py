@@ -1,15 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status, Response
+from fastapi.responses import StreamingResponse
+from pydantic import PositiveInt
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List
+from typing import FrozenSet, List, Optional
 from ..schemas import OrganizationSchema, OrganizationBaseSchema, OrganizationUpdateSchema
-from ..utils import verify_api_key
-from ..deps import get_db
+from ..utils import verify_api_key, set_next_cursor, not_modified, parse_id_list, organization_fields, PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+from ..deps import get_db, get_read_db, get_organization_loader
 from ..models import Organization
+from ..responses import RawJSONResponse, accepts_raw_json, fields_response, TimedRoute
+from ..settings import settings
 
 from ..crud.organizations_crud import (
     get_organization_list,
+    get_organization_cards_json,
+    stream_organization_list,
+    stream_organization_cards_json,
     get_organization_by_id,
+    get_organization_card_json_by_id,
+    get_organization_etag,
+    OrganizationLoader,
     create_organization,
     update_organization,
     delete_organization,
@@ -18,6 +28,7 @@ from ..crud.organizations_crud import (
 router = APIRouter(
     prefix="/organizations",
     tags=["Organizations"],
+    route_class=TimedRoute,
 )
 
 @router.post("/", response_model=OrganizationSchema, status_code=status.HTTP_201_CREATED)
@@ -34,23 +45,76 @@ async def create_organization_endpoint(
 @router.get("/{organization_id}", response_model=OrganizationSchema, status_code=status.HTTP_200_OK)
 async def get_organization_by_id_endpoint(
     organization_id: int,
-    db: AsyncSession = Depends(get_db),
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    fields: Optional[FrozenSet[str]] = Depends(organization_fields),
+    db: AsyncSession = Depends(get_read_db),
     _: None = Depends(verify_api_key),
 ):
     """
     Эндпоинт для получения организации по id.
+    Возвращает ETag; при совпадении If-None-Match отвечает 304 без загрузки связанных данных.
+    С RESPONSE_SQL_JSON карточка собирается в Postgres и отдается без ORM и pydantic.
     """
-    return await get_organization_by_id(organization_id=organization_id, db=db)
+    etag = await get_organization_etag(organization_id=organization_id, db=db, fields=fields)
+    if (not_modified_response := not_modified(etag, if_none_match)) is not None:
+        return not_modified_response
+
+    if settings.RESPONSE_SQL_JSON and accepts_raw_json():
+        document = await get_organization_card_json_by_id(organization_id=organization_id, db=db, fields=fields)
+        return RawJSONResponse(document, headers={"ETag": etag})
+
+    organization = await get_organization_by_id(organization_id=organization_id, db=db, fields=fields)
+    if fields is not None:
+        organization = response = fields_response(organization, fields)
+    response.headers["ETag"] = etag
+
+    return organization
 
 @router.get("/", response_model=List[OrganizationSchema], status_code=status.HTTP_200_OK)
 async def get_organization_list_endpoint(
-    db: AsyncSession = Depends(get_db),
+    response: Response,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX, description="Размер страницы"),
+    after: Optional[PositiveInt] = Query(None, description="Id последней записи предыдущей страницы"),
+    stream: bool = Query(False, description="Отдать все записи потоком в формате NDJSON"),
+    ids: Optional[str] = Query(None, description="Id организаций через запятую, например 1,2,3"),
+    fields: Optional[FrozenSet[str]] = Depends(organization_fields),
+    db: AsyncSession = Depends(get_read_db),
+    loader: OrganizationLoader = Depends(get_organization_loader),
     _: None = Depends(verify_api_key),
 ):
     """
-    Эндпоинт для получения всех организаций.
+    Эндпоинт для получения списка организаций с keyset-пагинацией по id.
+    Если страница заполнена, id последней записи возвращается в заголовке X-Next-After.
+    При stream=true все записи отдаются построчно в формате NDJSON.
+    При ids=1,2,3 возвращаются карточки только этих организаций в порядке ids за четыре запроса к БД;
+    несуществующие id пропускаются, limit, after и stream не учитываются.
+    Параметр fields ограничивает состав ответа, а для страниц и потока — и загружаемые связи.
+    С RESPONSE_SQL_JSON страницы и поток собираются в JSON в Postgres и отдаются без ORM и pydantic.
     """
-    return await get_organization_list(db=db)
+    if ids is not None:
+        organizations = [
+            organization for organization in await loader.load_many(parse_id_list(ids)) if organization is not None
+        ]
+        # Загрузчик общий на запрос и хранит полные карточки, поэтому fields здесь только отбирает поля ответа
+        return organizations if fields is None else fields_response(organizations, fields)
+
+    if stream:
+        # Поток всегда в NDJSON, поэтому готовые документы подходят при любом Accept
+        rows = stream_organization_cards_json if settings.RESPONSE_SQL_JSON else stream_organization_list
+        return StreamingResponse(rows(db=db, after=after, fields=fields), media_type="application/x-ndjson")
+
+    if settings.RESPONSE_SQL_JSON and accepts_raw_json():
+        document, next_after = await get_organization_cards_json(db=db, limit=limit, after=after, fields=fields)
+        headers = {"X-Next-After": str(next_after)} if next_after is not None else None
+        return RawJSONResponse(document, headers=headers)
+
+    organizations = await get_organization_list(db=db, limit=limit, after=after, fields=fields)
+    if fields is not None:
+        response = fields_response(organizations, fields)
+    set_next_cursor(response, organizations, limit)
+
+    return organizations if fields is None else response
 
 @router.delete("/{organization_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_organization_endpoint(
@@ -1,21 +1,28 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import PositiveInt
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
-from ..schemas import PhoneSchema, PhoneBaseSchema, PhoneUpdateSchema
-from ..utils import verify_api_key
-from ..deps import get_db
+from typing import List, Optional
+from ..schemas import PhoneSchema, PhoneBaseSchema, PhoneUpdateSchema, PhoneLookupSchema, PhoneLookupBatchSchema
+from ..responses import TimedRoute
+from ..utils import verify_api_key, set_next_cursor, PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+from ..deps import get_db, get_read_db
 
 from ..crud.phones_crud import (
     get_phones_list,
+    stream_phones_list,
     get_phone,
     create_phone,
     update_phone,
     delete_phone,
+    lookup_phone,
+    lookup_phones,
 )
 
 router = APIRouter(
     prefix="/phones",
     tags=["Phones"],
+    route_class=TimedRoute,
 )
 
 @router.post("/", response_model=PhoneSchema, status_code=status.HTTP_201_CREATED)
@@ -29,10 +36,34 @@ async def create_phone_endpoint(
     """
     return await create_phone(phone_data=phone_data, db=db)
 
+@router.get("/lookup", response_model=PhoneLookupSchema, status_code=status.HTTP_200_OK)
+async def lookup_phone_endpoint(
+    number: str = Query(min_length=1, max_length=64, description="Номер телефона, например +7 913 123-45-67"),
+    db: AsyncSession = Depends(get_read_db),
+    _: None = Depends(verify_api_key)
+):
+    """
+    Эндпоинт для поиска организации-владельца по номеру телефона.
+    Номер приводится к E.164, поэтому формат записи не важен.
+    """
+    return await lookup_phone(number=number, db=db)
+
+@router.post("/lookup", response_model=List[PhoneLookupSchema], status_code=status.HTTP_200_OK)
+async def lookup_phones_endpoint(
+    data: PhoneLookupBatchSchema,
+    db: AsyncSession = Depends(get_read_db),
+    _: None = Depends(verify_api_key)
+):
+    """
+    Эндпоинт для поиска организаций-владельцев по списку номеров одним запросом.
+    Возвращаются только найденные номера.
+    """
+    return await lookup_phones(numbers=data.numbers, db=db)
+
 @router.get("/{phone_id}", response_model=PhoneSchema, status_code=status.HTTP_200_OK)
 async def get_phone_endpoint(
     phone_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     _: None = Depends(verify_api_key)
 ):
     """
@@ -42,13 +73,25 @@ async def get_phone_endpoint(
 
 @router.get("/", response_model=List[PhoneSchema], status_code=status.HTTP_200_OK)
 async def get_phones_list_endpoint(
-    db: AsyncSession = Depends(get_db),
+    response: Response,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX, description="Размер страницы"),
+    after: Optional[PositiveInt] = Query(None, description="Id последней записи предыдущей страницы"),
+    stream: bool = Query(False, description="Отдать все записи потоком в формате NDJSON"),
+    db: AsyncSession = Depends(get_read_db),
     _: None = Depends(verify_api_key),
 ):
     """
-    Эндпоинт для получения всех телефонов.
+    Эндпоинт для получения списка телефонов с keyset-пагинацией по id.
+    Если страница заполнена, id последней записи возвращается в заголовке X-Next-After.
+    При stream=true все записи отдаются построчно в формате NDJSON.
     """
-    return await get_phones_list(db=db)
+    if stream:
+        return StreamingResponse(stream_phones_list(db=db, after=after), media_type="application/x-ndjson")
+
+    phones = await get_phones_list(db=db, limit=limit, after=after)
+    set_next_cursor(response, phones, limit)
+
+    return phones
 
 @router.delete("/{phone_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_phone_endpoint(
@@ -18,6 +18,18 @@ class PhoneUpdateSchema(BaseModel):
     number: Optional[PhoneNumber] = Field(None, description="Номер телефона")
     organization_id: Optional[PositiveInt] = Field(None, description="Идентификатор организации")
 
+class PhoneLookupSchema(BaseModel):
+    number_e164: str = Field(description="Номер в формате E.164")
+    phone_id: PositiveInt = Field(description="Идентификатор телефона")
+    organization_id: Optional[PositiveInt] = Field(None, description="Идентификатор организации-владельца")
+    organization_name: Optional[str] = Field(None, description="Название организации-владельца")
+    building_id: Optional[PositiveInt] = Field(None, description="Идентификатор здания организации")
+
+    model_config = ConfigDict(from_attributes=True)
+
+class PhoneLookupBatchSchema(BaseModel):
+    numbers: List[str] = Field(min_length=1, max_length=1000, description="Номера в любом формате, который принимает PhoneNumber")
+
 """Здания"""
 
 class BuildingBaseSchema(BaseModel):
@@ -74,10 +86,39 @@ class OrganizationSchema(OrganizationBaseSchema):
     building: Optional[BuildingSchema] = Field(description="Здание организации", default=None)
     activities: List[ActivitySchema] = Field(description="Виды деятельности организации", default_factory=list)
 
+class OrganizationSearchSchema(BaseModel):
+    id: PositiveInt = Field(description="Идентификатор организации")
+    name: str = Field(description="Название организации")
+    similarity: float = Field(description="Триграммное сходство названия с запросом (0..1)")
+
+    model_config = ConfigDict(from_attributes=True)
+
+class OrganizationNearbySchema(BaseModel):
+    id: PositiveInt = Field(description="Идентификатор организации")
+    name: str = Field(description="Название организации")
+    building_id: PositiveInt = Field(description="Идентификатор здания")
+    distance_m: float = Field(description="Расстояние от точки до здания организации, м")
+
+    model_config = ConfigDict(from_attributes=True)
+
+class OrganizationMatchSchema(BaseModel):
+    id: PositiveInt = Field(description="Идентификатор организации")
+    name: str = Field(description="Название организации")
+    building_id: Optional[PositiveInt] = Field(description="Идентификатор здания", default=None)
+    latitude: Optional[float] = Field(description="Широта здания", default=None)
+    longitude: Optional[float] = Field(description="Долгота здания", default=None)
+
+    model_config = ConfigDict(from_attributes=True)
+
 class OrganizationUpdateSchema(BaseModel):
     name: Optional[str] = Field(None, description="Название организации")
     building_id: Optional[PositiveInt] = Field(None, description="Идентификатор здания")
 
+class ClusterSchema(BaseModel):
+    organizations: PositiveInt = Field(description="Число организаций в кластере")
+    latitude: float = Field(description="Широта центра кластера")
+    longitude: float = Field(description="Долгота центра кластера")
+
 """Схемы для связи деятельности и организации"""
 
 class ActOrgSchema(BaseModel):
@@ -88,4 +129,37 @@ class ActOrgSchema(BaseModel):
 
 class ActOrgUpdateSchema(BaseModel):
     organization_id: Optional[PositiveInt] = Field(description="Идентификатор организации", default=None)
-    activity_id: Optional[PositiveInt] = Field(description="Идентификатор вида деятельности", default=None)
\ No newline at end of file
+    activity_id: Optional[PositiveInt] = Field(description="Идентификатор вида деятельности", default=None)
+
+class ActOrgBatchSchema(BaseModel):
+    links: List[ActOrgSchema] = Field(min_length=1, max_length=10000, description="Пары организация — вид деятельности")
+
+class OrganizationActivitiesSchema(BaseModel):
+    activity_ids: List[PositiveInt] = Field(max_length=10000, description="Полный набор видов деятельности организации")
+
+class ActOrgBatchResultSchema(BaseModel):
+    added: int = Field(0, description="Добавлено связей")
+    removed: int = Field(0, description="Удалено связей")
+
+"""Массовый импорт"""
+
+class BuildingImportSchema(BuildingBaseSchema):
+    id: Optional[PositiveInt] = Field(None, description="Идентификатор здания; если не задан, назначается БД")
+
+class OrganizationImportSchema(OrganizationBaseSchema):
+    id: Optional[PositiveInt] = Field(None, description="Идентификатор организации; если не задан, назначается БД")
+
+class PhoneImportSchema(PhoneBaseSchema):
+    id: Optional[PositiveInt] = Field(None, description="Идентификатор телефона; если не задан, назначается БД")
+
+class ImportErrorSchema(BaseModel):
+    line: PositiveInt = Field(description="Номер строки во входных данных")
+    detail: str = Field(description="Описание ошибки")
+
+class ImportResultSchema(BaseModel):
+    received: int = Field(description="Прочитано записей")
+    inserted: int = Field(description="Добавлено записей")
+    skipped: int = Field(description="Пропущено уже существующих связей")
+    errors_total: int = Field(description="Записей с ошибками")
+    errors: List[ImportErrorSchema] = Field(description="Ошибки по строкам, не более IMPORT_MAX_ERRORS", default_factory=list)
+    dry_run: bool = Field(description="Изменения проверены и отменены")
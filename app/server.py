@@ -0,0 +1,24 @@
+import uvicorn
+from app.settings import settings
+
+def run() -> None:
+    """
+    Запускает приложение в production-режиме: несколько процессов,
+    цикл событий uvloop и HTTP-парсер httptools, без отслеживания изменений файлов.
+    Миграции здесь не применяются — для них есть отдельный шаг entrypoint.sh migrate.
+    """
+    uvicorn.run(
+        "app.main:app",
+        host=settings.WEB_HOST,
+        port=settings.WEB_PORT,
+        workers=settings.web_workers,
+        loop="uvloop",
+        http="httptools",
+        timeout_graceful_shutdown=settings.WEB_GRACEFUL_SHUTDOWN_TIMEOUT,
+        timeout_keep_alive=settings.WEB_KEEPALIVE_TIMEOUT,
+        access_log=settings.WEB_ACCESS_LOG,
+        proxy_headers=True,
+    )
+
+if __name__ == "__main__":
+    run()
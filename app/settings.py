@@ -1,3 +1,6 @@
+import os
+from typing import List, Optional, Tuple
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -8,6 +11,74 @@ class Settings(BaseSettings):
     POSTGRES_PORT: int
     API_KEY: str
 
+    WEB_HOST: str = "0.0.0.0"
+    WEB_PORT: int = 80
+    WEB_WORKERS: int = 1 # Число процессов-обработчиков; 0 — по числу доступных CPU (entrypoint.sh serve задает его сам)
+    WEB_INSTANCES: int = 1 # Число экземпляров (контейнеров) приложения, работающих с одной БД
+    WEB_GRACEFUL_SHUTDOWN_TIMEOUT: int = 30 # Время на завершение текущих запросов при остановке, сек
+    WEB_KEEPALIVE_TIMEOUT: int = 5 # Время удержания keep-alive соединения, сек
+    WEB_ACCESS_LOG: bool = False # Журнал каждого запроса в stdout
+
+    DB_ECHO: bool = False # Логирование всех SQL-запросов, только для отладки
+    DB_MAX_CONNECTIONS: int = 90 # Бюджет соединений с одним сервером Postgres на все процессы всех экземпляров (max_connections по умолчанию 100)
+    DB_POOL_SIZE: Optional[int] = None # Постоянные соединения в пуле процесса; не задано — половина доли процесса в DB_MAX_CONNECTIONS
+    DB_MAX_OVERFLOW: Optional[int] = None # Дополнительные соединения сверх DB_POOL_SIZE; не задано — остаток доли процесса
+    DB_POOL_TIMEOUT: float = 10 # Ожидание свободного соединения, сек
+    DB_POOL_PRE_PING: bool = True # Проверка соединения перед выдачей из пула
+    DB_POOL_RECYCLE: int = 1800 # Пересоздание соединений старше указанного возраста, сек
+    DB_STATEMENT_CACHE_SIZE: int = 100 # Кэш подготовленных выражений asyncpg (0 — для pgbouncer в режиме transaction)
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 100 # Кэш подготовленных выражений диалекта SQLAlchemy
+
+    DB_REPLICA_URLS: str = "" # DSN реплик для чтения через запятую; пусто — все чтения идут в основную БД
+    DB_REPLICA_CONNECT_TIMEOUT: float = 2 # Таймаут подключения к реплике, сек
+    DB_REPLICA_RETRY_INTERVAL: float = 10 # Сколько секунд не обращаться к реплике после ошибки подключения
+    READ_YOUR_WRITES_WINDOW: int = 0 # Сколько секунд после записи клиент читает из основной БД; 0 — выключено
+
+    ACTIVITY_CACHE_TTL: int = 60 # Максимальный возраст снимка дерева видов деятельности, сек
+
+    RESPONSE_CACHE_BACKEND: str = "auto" # Кэш ответов main_logic: memory (только один процесс), redis, none или auto — memory при одном процессе, иначе none
+    RESPONSE_CACHE_TTL: int = 30 # Время жизни записи кэша ответов, сек
+    RESPONSE_CACHE_REPLICA_TTL: int = 5 # Время жизни записи, прочитанной с реплики, сек — граница устаревания сверх отставания реплики
+    RESPONSE_CACHE_MAX_SIZE: int = 10000 # Максимум записей в кэше memory
+    REDIS_URL: str = "redis://localhost:6379/0" # Адрес Redis для RESPONSE_CACHE_BACKEND=redis
+
+    RESPONSE_MSGPACK: bool = False # Отдавать application/msgpack по заголовку Accept (нужен пакет msgpack)
+    RESPONSE_SQL_JSON: bool = False # Карточки организаций собирает в JSON сам Postgres, без ORM и pydantic
+
+    @property
+    def web_workers(self) -> int:
+        if self.WEB_WORKERS > 0:
+            return self.WEB_WORKERS
+        return len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+
+    @property
+    def db_connections_share(self) -> int:
+        # Доля процесса в бюджете соединений: DB_MAX_CONNECTIONS делится на все процессы всех экземпляров.
+        # Пул каждой реплики того же размера и расходует такой же бюджет на своем сервере
+        return self.DB_MAX_CONNECTIONS // (self.web_workers * self.WEB_INSTANCES)
+
+    @property
+    def db_pool_limits(self) -> Tuple[int, int]:
+        share = self.db_connections_share
+        pool_size = self.DB_POOL_SIZE if self.DB_POOL_SIZE is not None else max(1, share // 2)
+        max_overflow = self.DB_MAX_OVERFLOW if self.DB_MAX_OVERFLOW is not None else max(0, share - pool_size)
+        return pool_size, max_overflow
+
+    @model_validator(mode="after")
+    def check_connection_budget(self) -> "Settings":
+        """
+        Не дает запустить приложение, если пулы всех процессов не помещаются в DB_MAX_CONNECTIONS.
+        """
+        processes = self.web_workers * self.WEB_INSTANCES
+        pool_size, max_overflow = self.db_pool_limits
+        if (pool_size + max_overflow) * processes > self.DB_MAX_CONNECTIONS:
+            raise ValueError(
+                f"Пулы {processes} процессов (WEB_WORKERS * WEB_INSTANCES) по {pool_size} + {max_overflow} соединений "
+                f"превышают DB_MAX_CONNECTIONS={self.DB_MAX_CONNECTIONS}: уменьшите DB_POOL_SIZE, DB_MAX_OVERFLOW "
+                "или число процессов либо увеличьте бюджет."
+            )
+        return self
+
     @property
     def DB_URL(self) -> str:
         return (
@@ -16,6 +87,15 @@ class Settings(BaseSettings):
             f"{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
         )
 
+    @property
+    def db_replica_urls(self) -> List[str]:
+        # DSN вида postgresql://... переводятся на драйвер asyncpg
+        return [
+            url.strip().replace("postgresql://", "postgresql+asyncpg://", 1)
+            for url in self.DB_REPLICA_URLS.split(",")
+            if url.strip()
+        ]
+
     class Config:
         env_file = ".env"
 
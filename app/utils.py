@@ -1,13 +1,24 @@
-from fastapi import HTTPException, Header, status
+from fastapi import HTTPException, Header, Query, Response, status
+from sqlalchemy import exists, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import List
+from typing import FrozenSet, List, AsyncIterator, Optional, Type
+from pydantic import BaseModel
+from pydantic_extra_types.phone_numbers import PhoneNumber
 from app.settings import settings
 from app.schemas import ActivityBaseSchema, ActivitySchema, ActivityTreeSchema, OrganizationSchema
-from app.models import Activity
+from app.models import Activity, activity_closure
+import hashlib
 import re
+import phonenumbers
 import unidecode
 
+PAGE_SIZE_DEFAULT = 100 # Размер страницы списков по умолчанию
+PAGE_SIZE_MAX = 1000 # Максимальный размер страницы списков
+STREAM_BATCH_SIZE = 500 # Сколько строк серверный курсор отдает за одну выборку
+ORGANIZATION_REQUIRED_FIELDS = frozenset({"id", "name"}) # Поля карточки, которые возвращаются при любом fields
+ORGANIZATION_RELATIONS = frozenset({"building", "phones", "activities"}) # Связи карточки, которые можно передать в expand
+
 async def verify_api_key(x_api_key: str = Header(...)):
     if x_api_key != settings.API_KEY:
         raise HTTPException(status_code=401, detail="Invalid API Key")
@@ -22,9 +33,17 @@ def transliterate(name: str) -> str:
     name = re.sub(r'[^a-z0-9_]', '', name)  # только допустимые символы
     return name
 
+def escape_like(value: str) -> str:
+    """
+    Экранирует спецсимволы шаблонов LIKE/ILIKE символом по умолчанию (обратный слэш).
+    """
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
 async def get_path(activity_data: ActivityBaseSchema, db: AsyncSession) -> str:
     """
     Генерирует путь для древовидной структуры на основе имени.
+    Родитель, его глубина (по строкам замыкания) и уникальность пути проверяются запросами к БД:
+    снимок в кэше может не знать о записях других процессов.
     """
     MAX_ACTIVITY_DEPTH = 3  # Максимальный 3 уровня вложенности
 
@@ -32,26 +51,32 @@ async def get_path(activity_data: ActivityBaseSchema, db: AsyncSession) -> str:
     node_name = transliterate(activity_data.name)
 
     if parent_id:
-        parent_activity = await db.scalar(select(Activity).where(Activity.id == parent_id))
+        result = await db.execute(
+            select(Activity.path, func.count())
+            .join(activity_closure, activity_closure.c.descendant_id == Activity.id)
+            .where(Activity.id == parent_id)
+            .group_by(Activity.id)
+        )
+        parent_activity = result.one_or_none()
         if not parent_activity:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Родительская деятельность с id={parent_id} не найдена."
             )
 
-        parent_depth = len(str(parent_activity.path).split('.'))
+        # Строк замыкания у родителя столько, сколько уровней от корня до него включительно
+        parent_path, parent_depth = parent_activity
         if parent_depth >= MAX_ACTIVITY_DEPTH:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Максимальная глубина дерева ({MAX_ACTIVITY_DEPTH}) превышена."
             )
 
-        ltree_path = f"{parent_activity.path}.{node_name}"
+        ltree_path = f"{parent_path}.{node_name}"
     else:
         ltree_path = node_name
 
-    existing = await db.scalar(select(Activity).where(Activity.path == ltree_path))
-    if existing:
+    if await db.scalar(select(exists().where(Activity.path == ltree_path))):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Деятельность с путем '{ltree_path}' уже существует."
@@ -88,6 +113,26 @@ async def build_activity_tree(activities: List[ActivitySchema], root_path: str)
     
     return activity_tree
 
+def build_activity_forest(activities) -> List[ActivityTreeSchema]:
+    """
+    Строит лес видов деятельности из плоского списка за один проход по path.
+    Узлы, родитель которых отсутствует в списке, становятся корнями.
+    """
+    path_to_node = {
+        activity.path: ActivityTreeSchema(id=activity.id, name=activity.name, children=[])
+        for activity in activities
+    }
+
+    roots = []
+    for path, node in path_to_node.items():
+        parent_node = path_to_node.get(path.rpartition('.')[0]) if '.' in path else None
+        if parent_node is None:
+            roots.append(node)
+        else:
+            parent_node.children.append(node)
+
+    return roots
+
 async def organizations_to_list(organizations: List[OrganizationSchema]) -> List[dict]:
     """
     Преобразует список объектов OrganizationSchema в список с именами организаций.
@@ -99,3 +144,119 @@ async def organizations_to_list(organizations: List[OrganizationSchema]) -> List
 
 
 
+
+
+def set_next_cursor(response: Response, items: list, limit: int) -> None:
+    """
+    Если страница заполнена целиком, сообщает клиенту курсор следующей страницы
+    в заголовке X-Next-After.
+    """
+    if len(items) == limit:
+        response.headers["X-Next-After"] = str(items[-1].id)
+
+def parse_id_list(value: str, max_ids: int = PAGE_SIZE_MAX) -> List[int]:
+    """
+    Разбирает список id через запятую ("1,2,3"), убирая повторы с сохранением порядка.
+    """
+    try:
+        ids = list(dict.fromkeys(int(part) for part in value.split(",") if part.strip()))
+    except ValueError:
+        ids = []
+    if not ids or any(item_id < 1 for item_id in ids):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids must be a comma-separated list of positive integers."
+        )
+    if len(ids) > max_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {max_ids} ids can be requested at once."
+        )
+
+    return ids
+
+def split_names(value: str) -> FrozenSet[str]:
+    """
+    Разбирает список имен через запятую, пропуская пустые элементы.
+    """
+    return frozenset(part.strip() for part in value.split(",") if part.strip())
+
+def organization_fields(
+    fields: Optional[str] = Query(
+        None,
+        description="Поля карточки через запятую: building_id, building, phones, activities; id и name возвращаются всегда. "
+                    "Связи, которых нет в списке, не загружаются. По умолчанию все поля"
+    ),
+    expand: Optional[str] = Query(
+        None,
+        description="Связи карточки через запятую: building, phones, activities. Загружаются и возвращаются только они; "
+                    "без fields к ним добавляются простые поля карточки (id, name, building_id)"
+    )
+) -> Optional[FrozenSet[str]]:
+    """
+    Разбирает параметры fields и expand в набор полей OrganizationSchema; None означает все поля.
+    expand без fields оставляет в карточке простые поля и перечисленные связи, с fields — добавляет связи к полям.
+    """
+    if fields is None and expand is None:
+        return None
+
+    requested = split_names(fields) if fields is not None else OrganizationSchema.model_fields.keys() - ORGANIZATION_RELATIONS
+    unknown = requested - OrganizationSchema.model_fields.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown organization fields: {', '.join(sorted(unknown))}."
+        )
+
+    expanded = split_names(expand) if expand is not None else frozenset()
+    unknown = expanded - ORGANIZATION_RELATIONS
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown organization relations: {', '.join(sorted(unknown))}."
+        )
+
+    return frozenset(requested) | expanded | ORGANIZATION_REQUIRED_FIELDS
+
+async def stream_ndjson(rows: AsyncIterator, schema: Type[BaseModel]) -> AsyncIterator[bytes]:
+    """
+    Сериализует строки по одной в NDJSON по мере их получения из БД.
+    """
+    async for row in rows:
+        yield schema.model_validate(row).model_dump_json().encode() + b"\n"
+
+def make_etag(*parts) -> str:
+    """
+    Строит сильный ETag из версий сущностей, от которых зависит ответ.
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+def not_modified(etag: Optional[str], if_none_match: Optional[str]) -> Optional[Response]:
+    """
+    Возвращает 304 Not Modified, если клиент прислал совпадающий ETag в If-None-Match.
+    """
+    if etag is None or if_none_match is None:
+        return None
+
+    # Для If-None-Match используется слабое сравнение: префикс W/ не учитывается
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if "*" in tags or etag in tags:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    return None
+
+def to_e164(number: str) -> Optional[str]:
+    """
+    Приводит номер к формату E.164 по тем же правилам разбора, что и тип PhoneNumber.
+    Если номер не распознан или недействителен, возвращает None.
+    """
+    try:
+        parsed = phonenumbers.parse(number, PhoneNumber.default_region_code)
+    except phonenumbers.NumberParseException:
+        return None
+
+    if not phonenumbers.is_valid_number(parsed):
+        return None
+
+    return phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
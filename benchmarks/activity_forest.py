@@ -0,0 +1,84 @@
+"""
+Бенчмарк построения дерева видов деятельности для GET /activities/:
+прежняя схема (поддерево для каждого вида деятельности) против однопроходного леса.
+Работает без БД, на синтетическом трехуровневом дереве.
+
+Запуск:
+    python -m benchmarks.activity_forest --sizes 10000 100000
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from app.activity_cache import build_snapshot
+from app.utils import build_activity_forest, build_activity_tree
+
+def generate_activities(size: int, fanout: int = 20) -> list[SimpleNamespace]:
+    """
+    Генерирует size видов деятельности с тремя уровнями вложенности.
+    """
+    activities = []
+    next_id = 1
+
+    def add(path: str) -> None:
+        nonlocal next_id
+        activities.append(SimpleNamespace(id=next_id, name=path, path=path, version=1))
+        next_id += 1
+
+    root = 0
+    while len(activities) < size:
+        root_path = f"root_{root}"
+        add(root_path)
+        for child in range(fanout):
+            if len(activities) >= size:
+                break
+            child_path = f"{root_path}.child_{child}"
+            add(child_path)
+            for leaf in range(fanout):
+                if len(activities) >= size:
+                    break
+                add(f"{child_path}.leaf_{leaf}")
+        root += 1
+
+    return activities
+
+async def legacy_listing(activities: list) -> list:
+    """
+    Повторяет прежний get_activities_list: поддерево и его сборка для каждого вида деятельности.
+    """
+    trees = []
+    for activity in activities:
+        descendants = [a for a in activities if a.path.startswith(activity.path)]
+        trees.append(await build_activity_tree(descendants, root_path=activity.path))
+    return trees
+
+def timed(func, *args) -> float:
+    started = time.perf_counter()
+    func(*args)
+    return (time.perf_counter() - started) * 1000
+
+def run(sizes: list[int], legacy_limit: int) -> None:
+    print(f"{'activities':>10} {'legacy, ms':>12} {'snapshot, ms':>13} {'forest, ms':>11}")
+    for size in sizes:
+        activities = generate_activities(size)
+
+        legacy = "skipped"
+        if size <= legacy_limit:
+            legacy = f"{timed(lambda: asyncio.run(legacy_listing(activities))):.1f}"
+
+        snapshot_ms = timed(build_snapshot, activities)
+        snapshot = build_snapshot(activities)
+        forest_ms = timed(build_activity_forest, snapshot.by_id.values())
+
+        print(f"{size:>10} {legacy:>12} {snapshot_ms:>13.1f} {forest_ms:>11.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument(
+        "--legacy-limit", type=int, default=10_000,
+        help="максимальный размер, для которого запускается квадратичная прежняя схема"
+    )
+    args = parser.parse_args()
+    run(args.sizes, args.legacy_limit)
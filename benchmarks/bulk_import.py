@@ -0,0 +1,117 @@
+"""
+Бенчмарк массового импорта: скорость разбора и валидации записей без БД
+и полного пути через COPY и промежуточную таблицу с откатом транзакции (dry_run).
+Ссылки на здания, организации и виды деятельности берутся из уже заполненной БД
+(например, после benchmarks.datagen), поэтому данные в ней не меняются.
+
+Запуск:
+    POSTGRES_HOST=localhost python -m benchmarks.bulk_import --rows 100000
+    POSTGRES_HOST=localhost python -m benchmarks.bulk_import --rows 100000 --format csv
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import random
+import time
+
+from pydantic import TypeAdapter
+from sqlalchemy import text
+
+from app.deps import AsyncSessionLocal
+from app.crud.import_crud import (
+    IMPORT_BATCH_SIZE,
+    IMPORT_SPECS,
+    ImportEntity,
+    ImportFormat,
+    ImportReport,
+    import_records,
+    parse_csv,
+    read_csv_batches,
+    read_line_batches,
+    validate_batch,
+    validate_ndjson_batch
+)
+
+def generate(entity: ImportEntity, count: int, ids: dict, rng: random.Random, data_format: ImportFormat) -> bytes:
+    records = []
+    for i in range(count):
+        if entity == ImportEntity.buildings:
+            record = {
+                "country": "Россия", "city": "Томск", "street": "пр. Ленина", "house_number": str(i),
+                "latitude": rng.uniform(56.4, 56.6), "longitude": rng.uniform(84.8, 85.1),
+            }
+        elif entity == ImportEntity.organizations:
+            record = {"name": f"Импорт {i}", "building_id": rng.choice(ids["buildings"])}
+        elif entity == ImportEntity.phones:
+            record = {"number": f"+7 913 {rng.randint(0, 9999999):07d}", "organization_id": rng.choice(ids["organizations"])}
+        else:
+            record = {
+                "organization_id": rng.choice(ids["organizations"]),
+                "activity_id": rng.choice(ids["activities"]),
+            }
+        records.append(record)
+
+    if data_format == ImportFormat.csv:
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=list(records[0]))
+        writer.writeheader()
+        writer.writerows(records)
+        return output.getvalue().encode()
+
+    return ("\n".join(json.dumps(record, ensure_ascii=False) for record in records) + "\n").encode()
+
+async def chunks_of(data: bytes, size: int = 1 << 20):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+async def validate_only(entity: ImportEntity, data: bytes, data_format: ImportFormat) -> None:
+    spec = IMPORT_SPECS[entity]
+    adapter = TypeAdapter(list[spec.schema])
+    report = ImportReport()
+    if data_format == ImportFormat.ndjson:
+        async for batch in read_line_batches(chunks_of(data)):
+            validate_ndjson_batch(batch, spec, adapter, report)
+        return
+
+    header = None
+    async for batch in read_csv_batches(chunks_of(data)):
+        if header is None:
+            (_, header), batch = batch[0], batch[1:]
+        validate_batch(parse_csv(batch, header, report), spec, adapter, report)
+
+async def run(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    data_format = ImportFormat(args.format)
+    # Внешние ключи выбираются из существующих id: после удалений id идут с пропусками
+    async with AsyncSessionLocal() as db:
+        ids = {
+            table: (await db.execute(text(f"SELECT id FROM {table}"))).scalars().all()
+            for table in ("buildings", "organizations", "activities")
+        }
+
+    print(f"batch size {IMPORT_BATCH_SIZE}, {args.rows} rows per entity, {data_format.value}")
+    print(f"{'entity':<14} {'validate, rows/s':>17} {'import, rows/s':>15}")
+    for entity in ImportEntity:
+        data = generate(entity, args.rows, ids, rng, data_format)
+
+        started = time.perf_counter()
+        await validate_only(entity, data, data_format)
+        validate_rate = args.rows / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            result = await import_records(entity, chunks_of(data), data_format, db, dry_run=True)
+        import_rate = args.rows / (time.perf_counter() - started)
+
+        if result.errors_total:
+            print(f"{entity.value}: {result.errors_total} errors, first: {result.errors[0].detail}")
+        print(f"{entity.value:<14} {validate_rate:>17,.0f} {import_rate:>15,.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", choices=[data_format.value for data_format in ImportFormat], default="ndjson")
+    asyncio.run(run(parser.parse_args()))
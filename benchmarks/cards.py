@@ -0,0 +1,98 @@
+"""
+Бенчмарк карточек организаций: ORM-путь (selectinload связей, model_validate, сериализация по response_model
+и orjson) против JSON, собранного в Postgres через json_build_object/json_agg (RESPONSE_SQL_JSON).
+Меряется полный путь от запроса к БД до байтов тела ответа: одна карточка по id и страницы списка.
+
+Нужна заполненная БД (например, benchmarks.datagen).
+
+Запуск:
+    POSTGRES_HOST=localhost python -m benchmarks.cards --pages 100 1000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import List, Optional
+
+from fastapi.utils import create_model_field
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.crud.organizations_crud import (
+    get_organization_by_id,
+    get_organization_card_json_by_id,
+    get_organization_cards_json,
+    get_organization_list,
+)
+from app.models import Organization
+from app.responses import encode_json
+from app.schemas import OrganizationSchema
+from app.settings import settings
+from app.utils import organization_fields
+
+card_field = create_model_field("response", OrganizationSchema, mode="serialization")
+list_field = create_model_field("response", List[OrganizationSchema], mode="serialization")
+
+async def measure(search, arguments: list, repeats: int) -> float:
+    """
+    Возвращает медианную задержку в миллисекундах.
+    """
+    timings = []
+    for _ in range(repeats):
+        for argument in arguments:
+            started = time.perf_counter()
+            await search(argument)
+            timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+async def run(pages: List[int], fields: Optional[str], repeats: int) -> None:
+    engine = create_async_engine(settings.DB_URL)
+    selected = organization_fields(fields, expand=None)
+
+    try:
+        async with AsyncSession(engine) as db:
+            all_ids = (await db.execute(select(Organization.id).order_by(Organization.id))).scalars().all()
+            random.seed(42)
+            ids = random.sample(all_ids, min(50, len(all_ids)))
+
+            async def orm_card(organization_id: int) -> bytes:
+                organization = await get_organization_by_id(organization_id, db, selected)
+                # Как в приложении, где у каждого запроса своя сессия без загруженных объектов
+                db.expunge_all()
+                return encode_json(card_field.serialize(organization))
+
+            async def sql_card(organization_id: int) -> bytes:
+                return (await get_organization_card_json_by_id(organization_id, db, selected)).encode()
+
+            print(f"fields={fields or 'все'}, median ms")
+            print(f"{'request':>12} {'orm':>9} {'sql json':>9} {'speedup':>8}")
+            orm = await measure(orm_card, ids, repeats)
+            sql = await measure(sql_card, ids, repeats)
+            print(f"{'card':>12} {orm:>9.2f} {sql:>9.2f} {orm / sql:>7.1f}x")
+
+            for size in pages:
+                afters = [all_ids[random.randint(0, max(len(all_ids) - size, 0))] - 1 for _ in range(5)]
+
+                async def orm_page(after: int) -> bytes:
+                    organizations = await get_organization_list(db, size, after, selected)
+                    db.expunge_all()
+                    return encode_json(list_field.serialize(organizations))
+
+                async def sql_page(after: int) -> bytes:
+                    document, _ = await get_organization_cards_json(db, size, after, selected)
+                    return document.encode()
+
+                orm = await measure(orm_page, afters, repeats)
+                sql = await measure(sql_page, afters, repeats)
+                print(f"{f'page {size}':>12} {orm:>9.2f} {sql:>9.2f} {orm / sql:>7.1f}x")
+    finally:
+        await engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--fields", default=None, help="набор полей, как в параметре fields эндпоинтов")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.pages, args.fields, args.repeats))
@@ -0,0 +1,178 @@
+"""
+Генератор синтетических данных справочника для бенчмарков.
+Заполняет таблицы из app/models.py через COPY: здания, организации, телефоны,
+трехуровневое дерево видов деятельности и связи организаций с видами деятельности.
+
+Запуск (таблицы очищаются, поэтому флаг --truncate обязателен):
+    POSTGRES_HOST=localhost python -m benchmarks.datagen --organizations 100000 --truncate
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import asyncpg
+
+from app.crud.clusters_crud import rebuild_clusters
+from app.crud.search_crud import rebuild_organization_search
+from app.deps import AsyncSessionLocal
+from app.settings import settings
+
+# Область генерации координат — окрестности Томска
+LAT_RANGE = (56.40, 56.60)
+LON_RANGE = (84.80, 85.10)
+
+WORDS = [
+    "Альфа", "Бета", "Вектор", "Гранит", "Дельта", "Енисей", "Заря", "Исток", "Кедр", "Лидер",
+    "Мастер", "Норд", "Омега", "Прогресс", "Радуга", "Сибирь", "Томь", "Успех", "Феникс", "Эталон",
+]
+STREETS = ["пр. Ленина", "ул. Советская", "пр. Фрунзе", "ул. Некрасова", "ул. Сибирская", "ул. Красноармейская"]
+
+def generate_activities(fanout: int) -> list[tuple]:
+    """
+    Трехуровневое дерево: fanout корней, у каждого fanout детей, у каждого ребенка fanout листьев.
+    """
+    rows = []
+    next_id = 1
+    for root in range(fanout):
+        root_path = f"r{root}"
+        rows.append((next_id, f"Деятельность {root}", root_path))
+        next_id += 1
+        for child in range(fanout):
+            child_path = f"{root_path}.c{child}"
+            rows.append((next_id, f"Деятельность {root}.{child}", child_path))
+            next_id += 1
+            for leaf in range(fanout):
+                rows.append((next_id, f"Деятельность {root}.{child}.{leaf}", f"{child_path}.l{leaf}"))
+                next_id += 1
+    return rows
+
+def generate_buildings(count: int, rng: random.Random) -> list[tuple]:
+    return [
+        (
+            building_id,
+            "Россия",
+            "Томск",
+            rng.choice(STREETS),
+            str(rng.randint(1, 200)),
+            rng.uniform(*LAT_RANGE),
+            rng.uniform(*LON_RANGE),
+        )
+        for building_id in range(1, count + 1)
+    ]
+
+def generate_organizations(count: int, buildings: int, rng: random.Random) -> list[tuple]:
+    return [
+        (
+            organization_id,
+            f"{rng.choice(WORDS)} {rng.choice(WORDS)} {organization_id}",
+            rng.randint(1, buildings),
+        )
+        for organization_id in range(1, count + 1)
+    ]
+
+def generate_phones(organizations: int, per_organization: int, rng: random.Random) -> list[tuple]:
+    rows = []
+    phone_id = 1
+    for organization_id in range(1, organizations + 1):
+        for _ in range(per_organization):
+            # Номер выводится из id, чтобы номера не повторялись
+            digits = f"{phone_id:09d}"
+            number = f"tel:+7-9{digits[:2]}-{digits[2:5]}-{digits[5:7]}-{digits[7:9]}"
+            rows.append((phone_id, number, f"+79{digits}", organization_id))
+            phone_id += 1
+    return rows
+
+def generate_links(organizations: int, activities: int, per_organization: int, rng: random.Random) -> list[tuple]:
+    rows = []
+    for organization_id in range(1, organizations + 1):
+        for activity_id in rng.sample(range(1, activities + 1), per_organization):
+            rows.append((organization_id, activity_id))
+    return rows
+
+async def load(conn: asyncpg.Connection, table: str, columns: tuple, records: list[tuple]) -> None:
+    started = time.perf_counter()
+    await conn.copy_records_to_table(table, records=records, columns=columns)
+    print(f"{table:<26} {len(records):>10} rows {time.perf_counter() - started:>8.2f} s")
+
+async def refresh_derived(conn: asyncpg.Connection) -> None:
+    """
+    Пересчитывает производные таблицы так же, как это делают миграции.
+    """
+    await conn.execute("""
+        INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+        SELECT
+            a.id,
+            d.id,
+            array_length(string_to_array(d.path, '.'), 1) - array_length(string_to_array(a.path, '.'), 1)
+        FROM activities a
+        JOIN activities d
+            ON d.path = a.path OR left(d.path, length(a.path) + 1) = a.path || '.'
+    """)
+
+async def run(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    conn = await asyncpg.connect(settings.DB_URL.replace("+asyncpg", ""))
+    try:
+        existing = await conn.fetchval("SELECT count(*) FROM organizations")
+        if existing and not args.truncate:
+            raise SystemExit("Таблицы не пусты: перезапустите с --truncate, чтобы заменить данные.")
+
+        activities = generate_activities(args.activity_fanout)
+        buildings = max(args.organizations // args.organizations_per_building, 1)
+
+        async with conn.transaction():
+            await conn.execute(
+                "TRUNCATE organizations_activities, phones, organizations, buildings, "
+                "activity_closure, activities RESTART IDENTITY CASCADE"
+            )
+            await load(conn, "activities", ("id", "name", "path"), activities)
+            await load(
+                conn, "buildings",
+                ("id", "country", "city", "street", "house_number", "latitude", "longitude"),
+                generate_buildings(buildings, rng)
+            )
+            await load(
+                conn, "organizations", ("id", "name", "building_id"),
+                generate_organizations(args.organizations, buildings, rng)
+            )
+            await load(
+                conn, "phones", ("id", "number", "number_e164", "organization_id"),
+                generate_phones(args.organizations, args.phones_per_organization, rng)
+            )
+            await load(
+                conn, "organizations_activities", ("organization_id", "activity_id"),
+                generate_links(args.organizations, len(activities), args.activities_per_organization, rng)
+            )
+            await refresh_derived(conn)
+
+            for table in ("activities", "buildings", "organizations", "phones"):
+                await conn.execute(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"
+                )
+
+        # Кластеры карты и organization_search пересчитываются теми же функциями, которыми пользуется приложение
+        started = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            await rebuild_clusters(db)
+        print(f"{'organization_clusters':<26} {'rebuilt':>15} {time.perf_counter() - started:>8.2f} s")
+
+        started = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            await rebuild_organization_search(db)
+        print(f"{'organization_search':<26} {'rebuilt':>15} {time.perf_counter() - started:>8.2f} s")
+
+        await conn.execute("ANALYZE")
+    finally:
+        await conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--organizations", type=int, default=10_000, help="число организаций (10^3..10^6)")
+    parser.add_argument("--organizations-per-building", type=int, default=3)
+    parser.add_argument("--phones-per-organization", type=int, default=2)
+    parser.add_argument("--activities-per-organization", type=int, default=2)
+    parser.add_argument("--activity-fanout", type=int, default=10, help="ветвление дерева; всего fanout + fanout^2 + fanout^3 узлов")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--truncate", action="store_true", help="очистить таблицы перед загрузкой")
+    asyncio.run(run(parser.parse_args()))
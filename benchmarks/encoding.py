@@ -0,0 +1,101 @@
+"""
+Бенчмарк кодирования ответа со списком организаций (телефоны, здание, виды деятельности):
+- to_python — преобразование схем в dict, которое FastAPI делает по response_model;
+- json.dumps — прежний JSONResponse из starlette;
+- orjson, msgpack — TimedResponse для Accept: application/json и application/msgpack;
+- jsonable_encoder против to_jsonable_python — подготовка значения для кэша ответов.
+Работает без БД; время приводится к 10 000 организаций.
+
+Запуск:
+    python -m benchmarks.encoding --sizes 1000 10000 100000
+"""
+import argparse
+import time
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.utils import create_model_field
+from pydantic_core import to_jsonable_python
+
+from app.responses import encode_json
+from app.schemas import ActivitySchema, BuildingSchema, OrganizationSchema, PhoneSchema
+
+def generate_organizations(size: int) -> List[OrganizationSchema]:
+    """
+    Генерирует size организаций с двумя телефонами и двумя видами деятельности.
+    """
+    activities = [ActivitySchema(id=i, name=f"Вид деятельности {i}", parent_id=None) for i in range(1, 101)]
+    buildings = [
+        BuildingSchema(
+            id=i, country="Россия", city="Томск", street=f"ул. Улица {i}", house_number=str(i),
+            latitude=56.4 + i / 10_000, longitude=84.9 + i / 10_000
+        )
+        for i in range(1, 1001)
+    ]
+    # Валидация PhoneNumber дорогая, поэтому номера собираются без нее
+    return [
+        OrganizationSchema(
+            id=i,
+            name=f"ООО Организация {i}",
+            building_id=buildings[i % len(buildings)].id,
+            building=buildings[i % len(buildings)],
+            phones=[
+                PhoneSchema.model_construct(id=2 * i + k, number=f"tel:+7-913-{i % 1000:03d}-00-0{k}", organization_id=i)
+                for k in range(2)
+            ],
+            activities=[activities[i % 100], activities[(i * 7) % 100]],
+        )
+        for i in range(1, size + 1)
+    ]
+
+def timed(func, *args) -> float:
+    """
+    Лучшее время из трех запусков, мс.
+    """
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+def run(sizes: list[int]) -> None:
+    try:
+        import msgpack
+    except ImportError:
+        msgpack = None
+
+    field = create_model_field("response", List[OrganizationSchema], mode="serialization")
+
+    print("ms per 10k organizations")
+    print(
+        f"{'orgs':>8} {'to_python':>10} {'json.dumps':>11} {'orjson':>8} {'msgpack':>8}"
+        f" {'jsonable_encoder':>17} {'to_jsonable':>12} {'json, KB':>9} {'msgpack, KB':>12}"
+    )
+    for size in sizes:
+        organizations = generate_organizations(size)
+        content = field.serialize(organizations)
+        scale = 10_000 / size
+
+        msgpack_ms, msgpack_kb = "-", "-"
+        if msgpack is not None:
+            msgpack_ms = f"{timed(msgpack.packb, content) * scale:.1f}"
+            msgpack_kb = f"{len(msgpack.packb(content)) / 1024:.0f}"
+
+        print(
+            f"{size:>8}"
+            f" {timed(field.serialize, organizations) * scale:>10.1f}"
+            f" {timed(JSONResponse, content) * scale:>11.1f}"
+            f" {timed(encode_json, content) * scale:>8.1f}"
+            f" {msgpack_ms:>8}"
+            f" {timed(jsonable_encoder, organizations) * scale:>17.1f}"
+            f" {timed(to_jsonable_python, organizations) * scale:>12.1f}"
+            f" {len(encode_json(content)) / 1024:>9.0f}"
+            f" {msgpack_kb:>12}"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    run(parser.parse_args().sizes)
@@ -0,0 +1,244 @@
+"""
+Нагрузочный бенчмарк эндпоинтов /api/main_logic.
+Каждый эндпоинт нагружается отдельно с фиксированной конкурентностью;
+для каждого выводятся RPS и задержки p50/p95/p99.
+Параметры запросов (id, названия, координаты) выбираются из данных в БД.
+
+Запуск против работающего приложения и локального Postgres, заполненного benchmarks.datagen:
+    POSTGRES_HOST=localhost python -m benchmarks.load --base-url http://localhost:8001 --concurrency 32 --requests 2000
+
+Сравнение с сохраненным результатом (код возврата 1 при регрессии):
+    python -m benchmarks.load --save baseline.json
+    python -m benchmarks.load --baseline baseline.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import statistics
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Callable
+
+import asyncpg
+import httpx
+
+from app.settings import settings
+
+@dataclass
+class Sample:
+    """
+    Значения, из которых генерируются параметры запросов.
+    """
+    building_ids: list
+    activity_ids: list
+    organization_ids: list
+    organization_names: list
+    coordinates: list
+
+@dataclass
+class Result:
+    endpoint: str
+    requests: int
+    errors: int
+    rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    statuses: dict = field(default_factory=dict)
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[int(q) - 1] if len(values) > 1 else values[0]
+
+async def load_sample(size: int) -> Sample:
+    conn = await asyncpg.connect(settings.DB_URL.replace("+asyncpg", ""))
+    try:
+        async def column(query: str) -> list:
+            return [row[0] for row in await conn.fetch(query, size)]
+
+        return Sample(
+            building_ids=await column("SELECT building_id FROM (SELECT DISTINCT building_id FROM organizations WHERE building_id IS NOT NULL) b ORDER BY random() LIMIT $1"),
+            activity_ids=await column("SELECT id FROM activities ORDER BY random() LIMIT $1"),
+            organization_ids=await column("SELECT id FROM organizations ORDER BY random() LIMIT $1"),
+            organization_names=await column("SELECT name FROM organizations ORDER BY random() LIMIT $1"),
+            coordinates=[
+                (row["latitude"], row["longitude"])
+                for row in await conn.fetch(
+                    "SELECT latitude, longitude FROM buildings WHERE latitude IS NOT NULL ORDER BY random() LIMIT $1", size
+                )
+            ],
+        )
+    finally:
+        await conn.close()
+
+def endpoints(sample: Sample, rectangle_size: float) -> dict[str, Callable[[random.Random], tuple[str, dict]]]:
+    """
+    Для каждого эндпоинта — функция, возвращающая путь и query-параметры очередного запроса.
+    """
+    def rectangle(rng: random.Random):
+        lat, lon = rng.choice(sample.coordinates)
+        return "/api/main_logic/orgs_in_rectangle", {
+            "lat_min": lat - rectangle_size, "lon_min": lon - rectangle_size,
+            "lat_max": lat + rectangle_size, "lon_max": lon + rectangle_size,
+        }
+
+    def nearby(rng: random.Random):
+        lat, lon = rng.choice(sample.coordinates)
+        return "/api/main_logic/orgs_nearby", {"lat": lat, "lon": lon, "limit": 20}
+
+    def clusters(rng: random.Random):
+        # Тайл карты с одним из зданий выборки на случайном уровне масштаба городского диапазона
+        lat, lon = rng.choice(sample.coordinates)
+        zoom = rng.randint(10, 16)
+        tiles = 2 ** zoom
+        x = int((lon + 180) / 360 * tiles)
+        y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * tiles)
+        return f"/api/main_logic/clusters/{zoom}/{x}/{y}", {}
+
+    def search(rng: random.Random):
+        _, parameters = rectangle(rng)
+        return "/api/main_logic/search", {
+            **parameters,
+            "activity_id": rng.choice(sample.activity_ids),
+            "q": rng.choice(sample.organization_names).split()[0][:3],
+        }
+
+    return {
+        "organizations_by_building_id": lambda rng: (
+            f"/api/main_logic/organizations_by_building_id/{rng.choice(sample.building_ids)}", {}
+        ),
+        "organizations_by_activity": lambda rng: (
+            f"/api/main_logic/organizations/{rng.choice(sample.activity_ids)}", {}
+        ),
+        "org_by_id": lambda rng: (
+            f"/api/main_logic/org_by_id/{rng.choice(sample.organization_ids)}", {}
+        ),
+        "org_by_name": lambda rng: (
+            f"/api/main_logic/org_by_name/{rng.choice(sample.organization_names)}", {}
+        ),
+        "orgs_search_by_name": lambda rng: (
+            "/api/main_logic/orgs_search_by_name", {"q": rng.choice(sample.organization_names).split()[0]}
+        ),
+        "orgs_in_rectangle": rectangle,
+        "orgs_nearby": nearby,
+        "clusters": clusters,
+        "search": search,
+    }
+
+async def drive(
+    client: httpx.AsyncClient,
+    name: str,
+    make_request: Callable,
+    total: int,
+    concurrency: int,
+    seed: int
+) -> Result:
+    """
+    Выполняет total запросов к эндпоинту, держа concurrency запросов в полете.
+    """
+    rng = random.Random(seed)
+    requests = [make_request(rng) for _ in range(total)]
+    queue = iter(requests)
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        for path, params in queue:
+            started = time.perf_counter()
+            try:
+                response = await client.get(path, params=params)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+                statuses[0] = statuses.get(0, 0) + 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return Result(
+        endpoint=name,
+        requests=total,
+        errors=errors,
+        rps=total / elapsed,
+        p50_ms=percentile(latencies, 50),
+        p95_ms=percentile(latencies, 95),
+        p99_ms=percentile(latencies, 99),
+        statuses=statuses,
+    )
+
+def compare(results: list[Result], baseline_path: str, tolerance: float) -> bool:
+    """
+    Сравнивает p95 и RPS с сохраненным результатом. Возвращает False при регрессии.
+    """
+    with open(baseline_path) as file:
+        baseline = {item["endpoint"]: item for item in json.load(file)}
+
+    ok = True
+    for result in results:
+        previous = baseline.get(result.endpoint)
+        if previous is None:
+            continue
+        if result.p95_ms > previous["p95_ms"] * (1 + tolerance):
+            print(f"REGRESSION {result.endpoint}: p95 {previous['p95_ms']:.2f} -> {result.p95_ms:.2f} ms")
+            ok = False
+        if result.rps < previous["rps"] * (1 - tolerance):
+            print(f"REGRESSION {result.endpoint}: rps {previous['rps']:.0f} -> {result.rps:.0f}")
+            ok = False
+    return ok
+
+async def run(args: argparse.Namespace) -> int:
+    sample = await load_sample(args.sample_size)
+    targets = endpoints(sample, args.rectangle_size)
+    selected = args.endpoints or list(targets)
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(
+        base_url=args.base_url,
+        headers={"x-api-key": settings.API_KEY},
+        limits=limits,
+        timeout=args.timeout,
+    ) as client:
+        results = []
+        for name in selected:
+            # Прогрев: соединения, кэши приложения и БД
+            await drive(client, name, targets[name], args.concurrency * 2, args.concurrency, args.seed)
+            results.append(await drive(client, name, targets[name], args.requests, args.concurrency, args.seed))
+
+    print(f"{'endpoint':<30} {'rps':>8} {'p50, ms':>9} {'p95, ms':>9} {'p99, ms':>9} {'errors':>7}")
+    for result in results:
+        print(
+            f"{result.endpoint:<30} {result.rps:>8.0f} {result.p50_ms:>9.2f} "
+            f"{result.p95_ms:>9.2f} {result.p99_ms:>9.2f} {result.errors:>7}"
+        )
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump([asdict(result) for result in results], file, indent=2)
+
+    if args.baseline and not compare(results, args.baseline, args.tolerance):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000, help="запросов на каждый эндпоинт")
+    parser.add_argument("--endpoints", nargs="*", help="подмножество эндпоинтов, по умолчанию все")
+    parser.add_argument("--sample-size", type=int, default=1000)
+    parser.add_argument("--rectangle-size", type=float, default=0.005, help="полуразмер прямоугольника, градусы")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="сохранить результат в JSON")
+    parser.add_argument("--baseline", help="JSON предыдущего прогона для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допустимое ухудшение p95 и RPS")
+    raise SystemExit(asyncio.run(run(parser.parse_args())))
@@ -0,0 +1,120 @@
+"""
+Бенчмарк поиска ближайших организаций (GET /main_logic/orgs_nearby) при росте числа зданий:
+KNN-сканирование SP-GiST-индекса ix_organization_search_mercator через get_organizations_nearby,
+с радиусом и без, против выборки прямоугольника вокруг точки с сортировкой на клиенте.
+
+Таблицы создаются в отдельной схеме по образцу основных (LIKE ... INCLUDING ALL, с теми же индексами),
+crud-функции выполняются с search_path на эту схему. Нужен доступный Postgres с примененными миграциями.
+
+Запуск:
+    POSTGRES_HOST=localhost python -m benchmarks.nearby --sizes 100000 1000000
+"""
+import argparse
+import asyncio
+import math
+import random
+import statistics
+import time
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.crud.organizations_crud import building_in_rectangle, get_organizations_nearby
+from app.crud.search_crud import rebuild_organization_search
+from app.models import Building, Organization, EARTH_RADIUS_M
+from app.settings import settings
+
+SCHEMA = "bench_nearby"
+
+# Область генерации координат — юг Западной Сибири, около 440 x 380 км
+LAT_RANGE = (54.0, 58.0)
+LON_RANGE = (82.0, 88.0)
+
+async def seed(db: AsyncSession, size: int) -> None:
+    """
+    Пересоздает здания и по одной организации в каждом.
+    """
+    await db.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    await db.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    for table in ("buildings", "organizations", "phones", "organizations_activities", "activity_closure", "organization_search"):
+        await db.execute(text(f"CREATE TABLE {SCHEMA}.{table} (LIKE public.{table} INCLUDING ALL)"))
+
+    await db.execute(text("SELECT setseed(0.42)"))
+    await db.execute(
+        text(f"""
+            INSERT INTO {SCHEMA}.buildings (id, country, city, street, house_number, latitude, longitude)
+            SELECT i, 'Россия', 'Город', 'Улица', i::text,
+                   {LAT_RANGE[0]} + random() * {LAT_RANGE[1] - LAT_RANGE[0]},
+                   {LON_RANGE[0]} + random() * {LON_RANGE[1] - LON_RANGE[0]}
+            FROM generate_series(1, :size) AS i
+        """),
+        {"size": size}
+    )
+    await db.execute(
+        text(f"INSERT INTO {SCHEMA}.organizations (id, name, building_id) SELECT id, 'Организация ' || id, id FROM {SCHEMA}.buildings")
+    )
+    await rebuild_organization_search(db)
+    for table in ("buildings", "organizations", "organization_search"):
+        await db.execute(text(f"ANALYZE {SCHEMA}.{table}"))
+    await db.commit()
+
+async def rectangle_sort(db: AsyncSession, latitude: float, longitude: float, limit: int, radius_m: float) -> list:
+    """
+    Прежний способ: все организации в прямоугольнике вокруг точки, сортировка по расстоянию на клиенте.
+    """
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    dlon = dlat / math.cos(math.radians(latitude))
+    result = await db.execute(
+        select(Organization.id, Building.latitude, Building.longitude)
+        .join(Building, Building.id == Organization.building_id)
+        .where(building_in_rectangle(latitude - dlat, longitude - dlon, latitude + dlat, longitude + dlon))
+    )
+    return sorted(
+        result.all(),
+        key=lambda row: math.hypot(row.latitude - latitude, (row.longitude - longitude) * math.cos(math.radians(latitude)))
+    )[:limit]
+
+async def measure(db: AsyncSession, search, points: list, repeats: int) -> float:
+    """
+    Возвращает медианную задержку поиска в миллисекундах.
+    """
+    timings = []
+    for _ in range(repeats):
+        for latitude, longitude in points:
+            started = time.perf_counter()
+            await search(db, latitude, longitude)
+            timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+async def run(sizes: list[int], limit: int, radius_m: float, repeats: int) -> None:
+    engine = create_async_engine(settings.DB_URL, connect_args={"server_settings": {"search_path": SCHEMA}})
+    random.seed(42)
+    points = [(random.uniform(*LAT_RANGE), random.uniform(*LON_RANGE)) for _ in range(20)]
+
+    searches = {
+        "knn": lambda db, lat, lon: get_organizations_nearby(lat, lon, limit, None, None, db),
+        "knn+radius": lambda db, lat, lon: get_organizations_nearby(lat, lon, limit, radius_m, None, db),
+        "rect+sort": lambda db, lat, lon: rectangle_sort(db, lat, lon, limit, radius_m),
+    }
+
+    try:
+        async with AsyncSession(engine) as db:
+            print(f"limit={limit}, radius={radius_m:.0f} m, median ms")
+            print(f"{'buildings':>10}" + "".join(f" {name:>11}" for name in searches))
+            for size in sizes:
+                await seed(db, size)
+                timings = [await measure(db, search, points, repeats) for search in searches.values()]
+                print(f"{size:>10}" + "".join(f" {timing:>11.2f}" for timing in timings))
+            await db.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            await db.commit()
+    finally:
+        await engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--radius", type=float, default=5_000, help="радиус поиска и полуширина прямоугольника, м")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes, args.limit, args.radius, args.repeats))
@@ -0,0 +1,239 @@
+"""
+Проверка планов запросов crud-слоя.
+Каждый сценарий вызывает функции из app/crud на заполненной БД внутри внешней транзакции,
+которая затем откатывается, поэтому записи тоже проверяются и данные не меняются.
+Все выполненные SQL-запросы перехватываются и прогоняются через EXPLAIN; скрипт завершается
+с кодом 1, если план ищет строки последовательным сканированием с фильтром по таблице больше порога.
+Сканирование без фильтра (снимок дерева, hash join по большой выборке) означает, что таблица
+нужна целиком, и ошибкой не считается. Поиск по имени рассчитан на GIN-индекс pg_trgm и без
+этого расширения тоже попадает в список.
+
+Запуск (БД заполняется, например, benchmarks.datagen):
+    POSTGRES_HOST=localhost python -m benchmarks.plans --min-rows 10000
+Те же проверки выполняет pytest в tests/test_plans.py.
+"""
+import argparse
+import asyncio
+import json
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple, Union
+
+from fastapi import HTTPException
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.activity_cache import activity_cache
+from app.deps import engine
+from app.schemas import (
+    ActOrgBatchSchema,
+    ActOrgSchema,
+    ActivityUpdateSchema,
+    BuildingUpdateSchema,
+    OrganizationActivitiesSchema,
+    OrganizationUpdateSchema,
+    PhoneUpdateSchema
+)
+from app.crud import act_org_crud, activities_crud, buildings_crud, clusters_crud, organizations_crud, phones_crud
+
+SCENARIOS = {
+    "organization_by_id": lambda db, s: organizations_crud.get_organization_by_id(s.organization_id, db),
+    "organizations_by_ids": lambda db, s: organizations_crud.OrganizationLoader(db).load_many(
+        list(range(s.organization_id, s.organization_id + 50))
+    ),
+    "organization_card_json": lambda db, s: organizations_crud.get_organization_card_json_by_id(s.organization_id, db),
+    "organization_card_json_by_name": lambda db, s: organizations_crud.get_organization_card_json_by_name(s.organization_name, db),
+    "organization_cards_json": lambda db, s: organizations_crud.get_organization_cards_json(db, 100, s.organization_id),
+    "organization_etag": lambda db, s: organizations_crud.get_organization_etag(s.organization_id, db),
+    "organization_by_name": lambda db, s: organizations_crud.get_organization_by_name(s.organization_name, db),
+    "organizations_search": lambda db, s: organizations_crud.search_organizations_by_name(s.organization_name[:5], 10, db),
+    "organizations_by_building": lambda db, s: organizations_crud.get_organizations_by_building_id(s.building_id, db),
+    "organizations_in_rectangle": lambda db, s: organizations_crud.get_organizations_in_rectangle(
+        s.latitude - 0.001, s.longitude - 0.001, s.latitude + 0.001, s.longitude + 0.001, db
+    ),
+    "organizations_nearby": lambda db, s: organizations_crud.get_organizations_nearby(
+        s.latitude, s.longitude, 20, 1000, s.linked_activity_id, db
+    ),
+    "organizations_filter_search": lambda db, s: organizations_crud.search_organizations(
+        db, 100, name=s.organization_name[:4], activity_id=s.activity_id,
+        lat_min=s.latitude - 0.05, lon_min=s.longitude - 0.05, lat_max=s.latitude + 0.05, lon_max=s.longitude + 0.05
+    ),
+    "organizations_filter_search_radius": lambda db, s: organizations_crud.search_organizations(
+        db, 100, activity_id=s.linked_activity_id, latitude=s.latitude, longitude=s.longitude, radius_m=1000
+    ),
+    "tile_clusters": lambda db, s: clusters_crud.get_tile_clusters(12, 3015, 1242, db),
+    "organization_list": lambda db, s: organizations_crud.get_organization_list(db, 100, s.organization_id),
+    "organization_update": lambda db, s: organizations_crud.update_organization(
+        s.organization_id, OrganizationUpdateSchema(name="plan check"), db
+    ),
+    "organization_delete": lambda db, s: organizations_crud.delete_organization(s.organization_id, db),
+    "building_by_id": lambda db, s: buildings_crud.get_building(s.building_id, db),
+    "building_etag": lambda db, s: buildings_crud.get_building_etag(s.building_id, db),
+    "building_list": lambda db, s: buildings_crud.get_buildings_list(db, 100, s.building_id),
+    "building_update": lambda db, s: buildings_crud.update_building(s.building_id, BuildingUpdateSchema(city="plan check"), db),
+    "building_delete": lambda db, s: buildings_crud.delete_building(s.building_id, db),
+    "phone_by_id": lambda db, s: phones_crud.get_phone(s.phone_id, db),
+    "phone_list": lambda db, s: phones_crud.get_phones_list(db, 100, s.phone_id),
+    "phone_lookup": lambda db, s: phones_crud.lookup_phone(s.phone_number, db),
+    "phone_lookup_batch": lambda db, s: phones_crud.lookup_phones([s.phone_number, "+79130000000"], db),
+    "phone_update": lambda db, s: phones_crud.update_phone(s.phone_id, PhoneUpdateSchema(number="+7 913 000-00-01"), db),
+    "phone_delete": lambda db, s: phones_crud.delete_phone(s.phone_id, db),
+    "activity_tree": lambda db, s: activities_crud.get_activity_tree(s.activity_id, db),
+    "activity_update": lambda db, s: activities_crud.update_activity(s.activity_id, ActivityUpdateSchema(name="plan check"), db),
+    "activity_delete": lambda db, s: activities_crud.delete_activity(s.activity_id, db),
+    "activities_by_organization": lambda db, s: act_org_crud.get_activities_by_org_id(s.organization_id, db),
+    "organizations_by_activity": lambda db, s: act_org_crud.get_organizations_by_act_id(s.activity_id, db),
+    "act_org_get": lambda db, s: act_org_crud.get_act_org(s.organization_id, s.linked_activity_id, db),
+    "act_org_link_batch": lambda db, s: act_org_crud.link_act_org_batch(
+        ActOrgBatchSchema(links=[ActOrgSchema(organization_id=s.organization_id, activity_id=s.activity_id)]), db
+    ),
+    "act_org_unlink_batch": lambda db, s: act_org_crud.unlink_act_org_batch(
+        ActOrgBatchSchema(links=[ActOrgSchema(organization_id=s.organization_id, activity_id=s.linked_activity_id)]), db
+    ),
+    "act_org_replace": lambda db, s: act_org_crud.replace_organization_activities(
+        s.organization_id, OrganizationActivitiesSchema(activity_ids=[s.activity_id]), db
+    ),
+}
+
+async def load_sample(db: AsyncSession) -> SimpleNamespace:
+    """
+    Берет реальные id из БД, чтобы сценарии выполняли те же запросы, что и в работе.
+    """
+    row = (await db.execute(text("""
+        SELECT o.id AS organization_id, o.name AS organization_name, b.id AS building_id,
+               b.latitude, b.longitude, p.id AS phone_id, p.number AS phone_number,
+               oa.activity_id AS linked_activity_id
+        FROM organizations o
+        JOIN buildings b ON b.id = o.building_id
+        JOIN phones p ON p.organization_id = o.id
+        JOIN organizations_activities oa ON oa.organization_id = o.id
+        ORDER BY o.id
+        LIMIT 1
+    """))).one()
+    # Вид деятельности второго уровня с потомками: корень покрывает заметную долю организаций,
+    # и последовательное сканирование для него — законный выбор планировщика, зависящий от выборки ANALYZE
+    activity_id = (await db.execute(text(
+        "SELECT min(id) FROM activities WHERE path LIKE '%.%' AND path NOT LIKE '%.%.%' "
+        "AND EXISTS (SELECT 1 FROM activities c WHERE c.path LIKE activities.path || '.%')"
+    ))).scalar_one()
+
+    return SimpleNamespace(**row._mapping, activity_id=activity_id)
+
+# Поиск по имени рассчитан на pg_trgm (GIN-индекс и similarity); без расширения его планы не проверяются
+TRGM_SCENARIOS = frozenset({"organization_by_name", "organization_card_json_by_name", "organizations_search"})
+
+def filtered_seq_scans(plan: dict):
+    if plan["Node Type"] == "Seq Scan" and "Filter" in plan:
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from filtered_seq_scans(child)
+
+def scan_nodes(plan: dict):
+    name = plan.get("Index Name") or plan.get("Relation Name")
+    if "Scan" in plan["Node Type"] and name:
+        yield f"{plan['Node Type']} {name}"
+    for child in plan.get("Plans", []):
+        yield from scan_nodes(child)
+
+def seq_scan_violations(plan: dict, table_rows: Dict[str, int], min_rows: int) -> List[str]:
+    """
+    Таблицы больше min_rows, в которых план ищет строки последовательным сканированием с фильтром.
+    """
+    return [table for table in filtered_seq_scans(plan) if table_rows.get(table, 0) > min_rows]
+
+async def prepare() -> Tuple[Dict[str, int], SimpleNamespace]:
+    """
+    Обновляет статистику и возвращает размеры таблиц и образец данных для сценариев.
+    """
+    async with engine.connect() as conn:
+        await conn.execute(text("ANALYZE"))
+        await conn.commit()
+        table_rows = dict((await conn.execute(text(
+            "SELECT relname, reltuples::bigint FROM pg_class WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace"
+        ))).all())
+        async with AsyncSession(bind=conn) as db:
+            sample = await load_sample(db)
+        await conn.rollback()
+
+    return table_rows, sample
+
+async def has_extension(name: str) -> bool:
+    async with engine.connect() as conn:
+        result = await conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = :name"), {"name": name})
+        return result.scalar() is not None
+
+async def explain_scenario(name: str, sample: SimpleNamespace) -> Tuple[Optional[str], List[Tuple[str, Union[dict, str]]]]:
+    """
+    Выполняет сценарий во внешней транзакции с откатом и возвращает ошибку сценария (если была)
+    и для каждого SQL-запроса его план или текст ошибки EXPLAIN.
+    """
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+            captured.append((statement, parameters[0] if executemany else parameters))
+
+    activity_cache.invalidate()
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    async with engine.connect() as conn:
+        await conn.begin()
+        db = AsyncSession(bind=conn, join_transaction_mode="create_savepoint", expire_on_commit=False)
+        error = None
+        try:
+            await SCENARIOS[name](db, sample)
+        except HTTPException as exc:
+            error = f"HTTP {exc.status_code}: {exc.detail}"
+        except DBAPIError as exc:
+            error = str(exc.orig).splitlines()[0]
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", capture)
+            await db.close()
+            await conn.rollback()
+
+        plans = []
+        for statement, parameters in captured:
+            try:
+                result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+                plan = result.scalar()
+            except DBAPIError as exc:
+                await conn.rollback()
+                plans.append((statement, str(exc.orig).splitlines()[0]))
+                continue
+            plans.append((statement, (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]))
+
+    activity_cache.invalidate()
+    return error, plans
+
+async def run(args: argparse.Namespace) -> None:
+    table_rows, sample = await prepare()
+
+    failures = 0
+    for name in SCENARIOS:
+        if args.only and name not in args.only:
+            continue
+
+        error, plans = await explain_scenario(name, sample)
+        print(f"\n{name}" + (f"  [{error}]" if error else ""))
+        for statement, plan in plans:
+            if isinstance(plan, str):
+                print(f"  ?    {' '.join(statement.split())[:100]}\n       EXPLAIN failed: {plan}")
+                continue
+
+            violations = seq_scan_violations(plan, table_rows, args.min_rows)
+            failures += bool(violations)
+            status = "FAIL" if violations else "ok"
+            print(f"  {status:<4} {' '.join(statement.split())[:100]}")
+            print(f"       {', '.join(scan_nodes(plan)) or plan['Node Type']}")
+            if args.verbose:
+                print(json.dumps(plan, indent=2))
+
+    print(f"\n{failures} statements with filtered seq scans on tables over {args.min_rows} rows")
+    if failures:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-rows", type=int, default=10_000, help="порог размера таблицы для последовательного сканирования")
+    parser.add_argument("--only", nargs="*", help="запустить только указанные сценарии")
+    parser.add_argument("--verbose", action="store_true", help="печатать планы целиком")
+    asyncio.run(run(parser.parse_args()))
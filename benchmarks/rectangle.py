@@ -0,0 +1,102 @@
+"""
+Бенчмарк поиска зданий в прямоугольной области: последовательное сканирование
+по четырем диапазонным условиям против SP-GiST-индекса по point(longitude, latitude).
+
+Запуск (нужен доступный Postgres, параметры берутся из .env / переменных окружения):
+    POSTGRES_HOST=localhost python -m benchmarks.rectangle
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import asyncpg
+
+from app.settings import settings
+
+SCHEMA = "bench_rectangle"
+
+# Область генерации координат — окрестности Томска
+LAT_RANGE = (56.40, 56.60)
+LON_RANGE = (84.80, 85.10)
+
+SCAN_QUERY = f"""
+    SELECT id FROM {SCHEMA}.buildings
+    WHERE latitude >= $1 AND latitude <= $3 AND longitude >= $2 AND longitude <= $4
+"""
+
+INDEX_QUERY = f"""
+    SELECT id FROM {SCHEMA}.buildings
+    WHERE point(longitude, latitude) <@ box(point($2, $1), point($4, $3))
+"""
+
+async def seed(conn: asyncpg.Connection, size: int) -> None:
+    """
+    Пересоздает тестовую таблицу зданий заданного размера.
+    """
+    await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await conn.execute(f"CREATE SCHEMA {SCHEMA}")
+    await conn.execute(
+        f"CREATE TABLE {SCHEMA}.buildings (id serial PRIMARY KEY, latitude float8, longitude float8)"
+    )
+    await conn.execute("SELECT setseed(0.42)")
+    await conn.execute(
+        f"""
+        INSERT INTO {SCHEMA}.buildings (latitude, longitude)
+        SELECT $1::float8 + random() * ($2::float8 - $1::float8), $3::float8 + random() * ($4::float8 - $3::float8)
+        FROM generate_series(1, $5)
+        """,
+        *LAT_RANGE, *LON_RANGE, size
+    )
+    await conn.execute(
+        f"CREATE INDEX ON {SCHEMA}.buildings USING spgist (point(longitude, latitude))"
+    )
+    await conn.execute(f"ANALYZE {SCHEMA}.buildings")
+
+async def measure(conn: asyncpg.Connection, query: str, rectangle: tuple, repeats: int) -> float:
+    """
+    Возвращает медианную задержку запроса в миллисекундах.
+    """
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        await conn.fetch(query, *rectangle)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+async def run(sizes: list[int], repeats: int) -> None:
+    conn = await asyncpg.connect(settings.DB_URL.replace("+asyncpg", ""))
+    try:
+        # Прямоугольник ~1% площади области генерации
+        lat_min = LAT_RANGE[0] + (LAT_RANGE[1] - LAT_RANGE[0]) * 0.45
+        lon_min = LON_RANGE[0] + (LON_RANGE[1] - LON_RANGE[0]) * 0.45
+        rectangle = (
+            lat_min,
+            lon_min,
+            lat_min + (LAT_RANGE[1] - LAT_RANGE[0]) * 0.1,
+            lon_min + (LON_RANGE[1] - LON_RANGE[0]) * 0.1,
+        )
+
+        print(f"{'buildings':>10} {'scan, ms':>10} {'index, ms':>10} {'speedup':>8}")
+        for size in sizes:
+            await seed(conn, size)
+
+            await conn.execute("SET enable_indexscan = off")
+            await conn.execute("SET enable_bitmapscan = off")
+            scan_ms = await measure(conn, SCAN_QUERY, rectangle, repeats)
+
+            await conn.execute("RESET enable_indexscan")
+            await conn.execute("RESET enable_bitmapscan")
+            index_ms = await measure(conn, INDEX_QUERY, rectangle, repeats)
+
+            print(f"{size:>10} {scan_ms:>10.2f} {index_ms:>10.2f} {scan_ms / index_ms:>7.1f}x")
+    finally:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes, args.repeats))
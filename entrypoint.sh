@@ -1,7 +1,37 @@
 #!/bin/sh
+set -e
 
-# Применяем миграции
-alembic -c app/alembic.ini upgrade head
+# Режим запуска передается первым аргументом (CMD в dockerfile или command в docker-compose.yml):
+#   serve   — production: несколько процессов uvicorn, без --reload
+#   migrate — одноразовое применение миграций
+#   dev     — миграции и один процесс с --reload для локальной разработки
 
-# Стартуем сервер
-uvicorn app.main:app --host 0.0.0.0 --port 80 --reload
\ No newline at end of file
+# Метрики процессов-обработчиков собираются через общий каталог; файлы прошлого запуска удаляются,
+# иначе счетчики завершившихся процессов попадут в /api/metrics
+if [ "${1:-serve}" = "serve" ]; then
+    export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}"
+fi
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+    rm -f "$PROMETHEUS_MULTIPROC_DIR"/*.db
+fi
+
+case "${1:-serve}" in
+    migrate)
+        exec alembic -c app/alembic.ini upgrade head
+        ;;
+    dev)
+        alembic -c app/alembic.ini upgrade head
+        # Один процесс получает весь бюджет соединений DB_MAX_CONNECTIONS, даже если WEB_WORKERS задан для serve
+        export WEB_WORKERS=1
+        exec uvicorn app.main:app --host 0.0.0.0 --port 80 --reload
+        ;;
+    serve)
+        # По умолчанию по процессу на каждый доступный CPU
+        export WEB_WORKERS="${WEB_WORKERS:-$(nproc)}"
+        exec python -m app.server
+        ;;
+    *)
+        exec "$@"
+        ;;
+esac
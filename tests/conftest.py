@@ -0,0 +1,44 @@
+import asyncio
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.activity_cache import activity_cache
+from app.deps import engine
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture
+async def postgres():
+    """
+    Движок приложения для тестов, которым нужна БД; без доступного Postgres тест пропускается.
+    Соединения пула закрываются после теста, так как каждый тест выполняется в своем цикле событий.
+    """
+    try:
+        async with engine.connect() as conn:
+            await asyncio.wait_for(conn.execute(text("SELECT 1")), timeout=5)
+    except (OSError, DBAPIError, asyncio.TimeoutError) as exc:
+        await engine.dispose()
+        pytest.skip(f"Postgres недоступен: {exc}")
+
+    yield engine
+    await engine.dispose()
+
+@pytest.fixture
+async def db(postgres):
+    """
+    Сессия во внешней транзакции, которая откатывается после теста: commit в crud-функциях
+    фиксирует только точку сохранения. Кэш видов деятельности сбрасывается до и после теста.
+    """
+    activity_cache.invalidate()
+    async with postgres.connect() as conn:
+        await conn.begin()
+        session = AsyncSession(bind=conn, join_transaction_mode="create_savepoint", expire_on_commit=False)
+        try:
+            yield session
+        finally:
+            await session.close()
+            await conn.rollback()
+    activity_cache.invalidate()
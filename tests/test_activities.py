@@ -0,0 +1,97 @@
+"""
+Перенос поддерева видов деятельности в update_activity: пересчет path и таблицы замыкания,
+запрет переноса в собственного потомка и превышения глубины. Тесты работают в откатываемой транзакции.
+"""
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from app.crud.activities_crud import create_activity, update_activity
+from app.models import Activity, activity_closure
+from app.schemas import ActivityBaseSchema, ActivityUpdateSchema
+
+pytestmark = pytest.mark.anyio
+
+async def closure_rows(db, activity_ids):
+    result = await db.execute(
+        select(activity_closure.c.ancestor_id, activity_closure.c.descendant_id, activity_closure.c.depth)
+        .where(activity_closure.c.descendant_id.in_(activity_ids))
+    )
+    return set(result.all())
+
+async def paths(db, activity_ids):
+    result = await db.execute(select(Activity.id, Activity.path).where(Activity.id.in_(activity_ids)))
+    return dict(result.all())
+
+async def test_move_subtree(db):
+    old_root = await create_activity(ActivityBaseSchema(name="Тест старый корень"), db)
+    new_root = await create_activity(ActivityBaseSchema(name="Тест новый корень"), db)
+    moved = await create_activity(ActivityBaseSchema(name="Тест узел", parent_id=old_root.id), db)
+    leaf = await create_activity(ActivityBaseSchema(name="Тест лист", parent_id=moved.id), db)
+
+    result = await update_activity(moved.id, ActivityUpdateSchema(parent_id=new_root.id), db)
+
+    assert result.parent_id == new_root.id
+    assert await paths(db, [moved.id, leaf.id]) == {
+        moved.id: "test_novyi_koren.test_uzel",
+        leaf.id: "test_novyi_koren.test_uzel.test_list",
+    }
+    assert await closure_rows(db, [moved.id, leaf.id]) == {
+        (new_root.id, moved.id, 1), (moved.id, moved.id, 0),
+        (new_root.id, leaf.id, 2), (moved.id, leaf.id, 1), (leaf.id, leaf.id, 0),
+    }
+
+async def test_move_subtree_to_root_and_rename(db):
+    root = await create_activity(ActivityBaseSchema(name="Тест корень"), db)
+    moved = await create_activity(ActivityBaseSchema(name="Тест узел", parent_id=root.id), db)
+    leaf = await create_activity(ActivityBaseSchema(name="Тест лист", parent_id=moved.id), db)
+
+    await update_activity(moved.id, ActivityUpdateSchema(name="Тест переименован", parent_id=None), db)
+
+    assert await paths(db, [moved.id, leaf.id]) == {
+        moved.id: "test_pereimenovan",
+        leaf.id: "test_pereimenovan.test_list",
+    }
+    assert await closure_rows(db, [moved.id, leaf.id]) == {
+        (moved.id, moved.id, 0), (moved.id, leaf.id, 1), (leaf.id, leaf.id, 0),
+    }
+
+async def test_move_into_own_descendant_is_rejected(db):
+    root = await create_activity(ActivityBaseSchema(name="Тест корень"), db)
+    child = await create_activity(ActivityBaseSchema(name="Тест узел", parent_id=root.id), db)
+    leaf = await create_activity(ActivityBaseSchema(name="Тест лист", parent_id=child.id), db)
+
+    for parent_id in (root.id, leaf.id):
+        with pytest.raises(HTTPException) as exc:
+            await update_activity(root.id, ActivityUpdateSchema(parent_id=parent_id), db)
+        assert exc.value.status_code == 400
+
+    assert await paths(db, [root.id, child.id, leaf.id]) == {
+        root.id: "test_koren",
+        child.id: "test_koren.test_uzel",
+        leaf.id: "test_koren.test_uzel.test_list",
+    }
+
+async def test_move_beyond_max_depth_is_rejected(db):
+    root = await create_activity(ActivityBaseSchema(name="Тест корень"), db)
+    child = await create_activity(ActivityBaseSchema(name="Тест узел", parent_id=root.id), db)
+    other = await create_activity(ActivityBaseSchema(name="Тест другой корень"), db)
+    await create_activity(ActivityBaseSchema(name="Тест лист", parent_id=other.id), db)
+
+    with pytest.raises(HTTPException) as exc:
+        await update_activity(other.id, ActivityUpdateSchema(parent_id=child.id), db)
+    assert exc.value.status_code == 400
+
+async def test_create_checks_parent_depth_and_duplicate_path(db):
+    root = await create_activity(ActivityBaseSchema(name="Тест корень"), db)
+    child = await create_activity(ActivityBaseSchema(name="Тест узел", parent_id=root.id), db)
+    leaf = await create_activity(ActivityBaseSchema(name="Тест лист", parent_id=child.id), db)
+
+    cases = [
+        (ActivityBaseSchema(name="Тест глубже", parent_id=leaf.id), 400),
+        (ActivityBaseSchema(name="Тест узел", parent_id=root.id), 400),
+        (ActivityBaseSchema(name="Тест сирота", parent_id=2_000_000_000), 404),
+    ]
+    for activity_data, status_code in cases:
+        with pytest.raises(HTTPException) as exc:
+            await create_activity(activity_data, db)
+        assert exc.value.status_code == status_code
@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+from app.activity_cache import build_snapshot
+
+def activity(id, path, name=None):
+    return SimpleNamespace(id=id, name=name or path, path=path, version=1)
+
+ROWS = [
+    activity(4, "food.meat.beef"),
+    activity(1, "food"),
+    activity(5, "cars"),
+    activity(2, "food.meat"),
+    activity(3, "food.milk"),
+]
+
+def test_snapshot_links_parents_and_children():
+    snapshot = build_snapshot(ROWS)
+
+    assert snapshot.root_ids == (5, 1)
+    assert snapshot.by_id[1].parent_id is None
+    assert snapshot.by_id[2].parent_id == 1
+    assert snapshot.by_id[4].parent_id == 2
+    assert snapshot.by_id[1].children_ids == (2, 3)
+    assert snapshot.by_path["food.milk"].id == 3
+
+def test_snapshot_descendants_include_node_itself():
+    snapshot = build_snapshot(ROWS)
+
+    assert snapshot.by_id[1].descendant_ids == {1, 2, 3, 4}
+    assert snapshot.by_id[2].descendant_ids == {2, 4}
+    assert snapshot.by_id[5].descendant_ids == {5}
+
+def test_subtree_lists_parents_before_children():
+    snapshot = build_snapshot(ROWS)
+
+    assert [node.path for node in snapshot.subtree(1)] == ["food", "food.meat", "food.meat.beef", "food.milk"]
+
+def test_snapshot_of_empty_table():
+    snapshot = build_snapshot([])
+
+    assert snapshot.root_ids == ()
+    assert not snapshot.by_id
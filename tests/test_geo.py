@@ -0,0 +1,32 @@
+import math
+import pytest
+from sqlalchemy.dialects import postgresql
+from app.models import EARTH_RADIUS_M, mercator_xy
+from app.crud.organizations_crud import MERCATOR_WORLD_WIDTH_M, antimeridian_distance_m, building_within_radius
+
+def box_count(latitude: float, longitude: float, radius_m: float) -> int:
+    condition = building_within_radius(latitude, longitude, radius_m)
+    return str(condition.compile(dialect=postgresql.dialect())).count("box(")
+
+def test_mercator_x_spans_world_width():
+    west, _ = mercator_xy(0, -180)
+    east, _ = mercator_xy(0, 180)
+
+    assert east - west == pytest.approx(MERCATOR_WORLD_WIDTH_M)
+
+@pytest.mark.parametrize("latitude, longitude, expected_m", [
+    (0, 180, 0),
+    (0, -179, math.radians(1) * EARTH_RADIUS_M),
+    (0, 0, math.pi / 2 * EARTH_RADIUS_M),
+    (60, 90, math.radians(30) * EARTH_RADIUS_M),
+])
+def test_antimeridian_distance(latitude, longitude, expected_m):
+    assert antimeridian_distance_m(latitude, longitude) == pytest.approx(expected_m, abs=1e-6)
+
+def test_antimeridian_distance_is_symmetric():
+    assert antimeridian_distance_m(40, 170) == pytest.approx(antimeridian_distance_m(40, -170))
+    assert antimeridian_distance_m(40, 170) < math.radians(10) * EARTH_RADIUS_M
+
+@pytest.mark.parametrize("longitude, expected_boxes", [(37.6, 1), (179.999, 2), (-179.999, 2), (179.0, 1)])
+def test_radius_box_is_split_at_antimeridian(longitude, expected_boxes):
+    assert box_count(0, longitude, 1000) == expected_boxes
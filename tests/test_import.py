@@ -0,0 +1,48 @@
+import asyncio
+import csv
+from typing import List
+import pytest
+from app.crud.import_crud import read_csv_batches
+
+async def chunked(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+def read_csv(data: bytes, chunk_size: int) -> List[tuple]:
+    async def collect():
+        return [record async for batch in read_csv_batches(chunked(data, chunk_size)) for record in batch]
+
+    return asyncio.run(collect())
+
+DATA = (
+    '﻿name,street\n'
+    'Alpha,"Lenina, 1"\n'
+    '\n'
+    '"Beta ""Group""","line one\nline two"\r\n'
+    'Gamma,Mira'
+).encode()
+
+EXPECTED = [
+    (1, ["name", "street"]),
+    (2, ["Alpha", "Lenina, 1"]),
+    (4, ['Beta "Group"', "line one\nline two"]),
+    (6, ["Gamma", "Mira"]),
+]
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 1024])
+def test_records_survive_any_chunk_boundary(chunk_size):
+    assert read_csv(DATA, chunk_size) == EXPECTED
+
+def test_multibyte_characters_split_across_chunks():
+    data = "name\nТомь\n".encode()
+
+    assert read_csv(data, 1) == [(1, ["name"]), (2, ["Томь"])]
+
+def test_unclosed_quote_is_reported_as_error():
+    records = read_csv(b'name\nfirst\n"unclosed\nnext', 4)
+
+    assert records[:2] == [(1, ["name"]), (2, ["first"])]
+    line_number, error = records[2]
+    assert line_number == 3
+    assert isinstance(error, csv.Error)
+    assert len(records) == 3
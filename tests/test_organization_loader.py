@@ -0,0 +1,69 @@
+"""
+OrganizationLoader: объединение load в один пакет и судьба ожидающих, когда загрузка пакета
+завершается ошибкой или ее задача отменяется. Запрос к БД подменяется, Postgres не нужен.
+"""
+import asyncio
+from types import SimpleNamespace
+import pytest
+from app.crud import organizations_crud
+from app.crud.organizations_crud import OrganizationLoader
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def batches(monkeypatch):
+    """
+    Подменяет get_organizations_by_ids: запоминает пакеты в calls и возвращает id вместо карточек.
+    Перед ответом ожидает behaviour, если он задан.
+    """
+    batches = SimpleNamespace(calls=[], behaviour=None)
+
+    async def get_organizations_by_ids(organization_ids, db):
+        batches.calls.append(list(organization_ids))
+        if batches.behaviour is not None:
+            await batches.behaviour()
+        return {organization_id: organization_id for organization_id in organization_ids}
+
+    monkeypatch.setattr(organizations_crud, "get_organizations_by_ids", get_organizations_by_ids)
+    return batches
+
+async def test_loads_are_batched(batches):
+    loader = OrganizationLoader(db=None)
+
+    assert await loader.load_many([3, 1, 3]) == [3, 1, 3]
+    assert await loader.load(1) == 1
+    assert batches.calls == [[3, 1]]
+
+async def test_error_reaches_waiters_and_next_load_retries(batches):
+    loader = OrganizationLoader(db=None)
+
+    async def fail():
+        raise RuntimeError("db is down")
+
+    batches.behaviour = fail
+    with pytest.raises(RuntimeError):
+        await loader.load_many([1, 2])
+
+    batches.behaviour = None
+    assert await loader.load(1) == 1
+    assert batches.calls == [[1, 2], [1]]
+
+async def test_cancelled_dispatch_cancels_waiters(batches):
+    loader = OrganizationLoader(db=None)
+    started = asyncio.Event()
+
+    async def hang():
+        started.set()
+        await asyncio.Event().wait()
+
+    batches.behaviour = hang
+    waiters = asyncio.gather(loader.load(1), loader.load(2))
+    await started.wait()
+    for task in list(loader._tasks):
+        task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(waiters, timeout=1)
+
+    batches.behaviour = None
+    assert await loader.load(2) == 2
@@ -0,0 +1,40 @@
+"""
+Гонка двух запросов с одним номером: оба проходят check_number_is_free, и второй натыкается
+на уникальный индекс number_e164. Окно гонки воспроизводится отключенной проверкой.
+Тесты работают в откатываемой транзакции.
+"""
+import pytest
+from fastapi import HTTPException
+from app.crud import phones_crud
+from app.schemas import PhoneBaseSchema, PhoneUpdateSchema
+
+pytestmark = pytest.mark.anyio
+
+NUMBER = "+7 913 000-00-01"
+
+@pytest.fixture
+def racing(monkeypatch):
+    async def number_is_free(number_e164, db, phone_id=None):
+        return None
+
+    monkeypatch.setattr(phones_crud, "check_number_is_free", number_is_free)
+
+async def test_create_duplicate_number_in_race_returns_400(db, racing):
+    await phones_crud.create_phone(PhoneBaseSchema(number=NUMBER), db)
+
+    with pytest.raises(HTTPException) as exc:
+        await phones_crud.create_phone(PhoneBaseSchema(number="+7 (913) 000 00 01"), db)
+
+    assert exc.value.status_code == 400
+    assert exc.value.detail == "Phone number +79130000001 already exists."
+
+async def test_update_to_taken_number_in_race_returns_400(db, racing):
+    await phones_crud.create_phone(PhoneBaseSchema(number=NUMBER), db)
+    other = await phones_crud.create_phone(PhoneBaseSchema(number="+7 913 000-00-02"), db)
+    other_number = other.number
+
+    with pytest.raises(HTTPException) as exc:
+        await phones_crud.update_phone(other.id, PhoneUpdateSchema(number=NUMBER), db)
+
+    assert exc.value.status_code == 400
+    assert (await phones_crud.get_phone(other.id, db)).number == other_number
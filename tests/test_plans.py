@@ -0,0 +1,27 @@
+"""
+Проверка планов запросов crud-слоя на заполненной БД (например, benchmarks.datagen):
+ни один SQL-запрос сценариев benchmarks.plans не должен искать строки последовательным сканированием
+таблицы больше MIN_ROWS. Без доступного Postgres или на незаполненной БД тесты пропускаются.
+"""
+import pytest
+from benchmarks.plans import SCENARIOS, TRGM_SCENARIOS, explain_scenario, has_extension, prepare, scan_nodes, seq_scan_violations
+
+MIN_ROWS = 10_000
+
+pytestmark = pytest.mark.anyio
+
+@pytest.mark.parametrize("name", list(SCENARIOS))
+async def test_plan_avoids_seq_scans(name, postgres):
+    if name in TRGM_SCENARIOS and not await has_extension("pg_trgm"):
+        pytest.skip("поиск по имени рассчитан на индекс pg_trgm")
+
+    table_rows, sample = await prepare()
+    if max(table_rows.values(), default=0) <= MIN_ROWS:
+        pytest.skip(f"в БД нет таблиц больше {MIN_ROWS} строк")
+
+    _, plans = await explain_scenario(name, sample)
+    assert plans, "сценарий не выполнил ни одного SQL-запроса"
+    for statement, plan in plans:
+        assert not isinstance(plan, str), f"EXPLAIN failed: {plan}\n{statement}"
+        violations = seq_scan_violations(plan, table_rows, MIN_ROWS)
+        assert not violations, f"{', '.join(scan_nodes(plan))}\n{statement}"
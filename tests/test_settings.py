@@ -0,0 +1,42 @@
+import pytest
+from pydantic import ValidationError
+from app.settings import Settings
+
+def make_settings(**values) -> Settings:
+    required = dict(
+        POSTGRES_USER="user", POSTGRES_PASSWORD="password", POSTGRES_DB="db",
+        POSTGRES_HOST="localhost", POSTGRES_PORT=5432, API_KEY="key"
+    )
+    return Settings(**{**required, **values})
+
+@pytest.mark.parametrize("workers, instances, expected", [
+    (1, 1, (45, 45)),
+    (4, 1, (11, 11)),
+    (2, 3, (7, 8)),
+])
+def test_pool_limits_split_connection_budget(workers, instances, expected):
+    settings = make_settings(WEB_WORKERS=workers, WEB_INSTANCES=instances, DB_MAX_CONNECTIONS=90)
+
+    pool_size, max_overflow = settings.db_pool_limits
+    assert (pool_size, max_overflow) == expected
+    assert (pool_size + max_overflow) * workers * instances <= 90
+
+def test_single_process_by_default():
+    settings = make_settings()
+
+    assert settings.web_workers == 1
+    assert settings.db_pool_limits == (45, 45)
+
+def test_pool_limits_keep_explicit_values_within_budget():
+    settings = make_settings(WEB_WORKERS=2, DB_MAX_CONNECTIONS=90, DB_POOL_SIZE=5, DB_MAX_OVERFLOW=10)
+
+    assert settings.db_pool_limits == (5, 10)
+
+@pytest.mark.parametrize("values", [
+    dict(WEB_WORKERS=4, DB_POOL_SIZE=10, DB_MAX_OVERFLOW=20),
+    dict(WEB_WORKERS=2, WEB_INSTANCES=3, DB_POOL_SIZE=20),
+    dict(WEB_WORKERS=200),
+])
+def test_budget_overflow_is_rejected(values):
+    with pytest.raises(ValidationError, match="DB_MAX_CONNECTIONS"):
+        make_settings(DB_MAX_CONNECTIONS=90, **values)
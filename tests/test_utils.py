@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+from app.utils import build_activity_forest, not_modified, organization_fields, parse_id_list, to_e164
+
+def activity(id, path):
+    return SimpleNamespace(id=id, name=path.rpartition(".")[2], path=path)
+
+def test_forest_nests_children_under_parents():
+    forest = build_activity_forest([
+        activity(1, "food"),
+        activity(2, "food.meat"),
+        activity(3, "food.meat.beef"),
+        activity(4, "cars"),
+    ])
+
+    assert [root.id for root in forest] == [1, 4]
+    assert [child.id for child in forest[0].children] == [2]
+    assert [child.id for child in forest[0].children[0].children] == [3]
+    assert forest[1].children == []
+
+def test_forest_makes_orphans_roots():
+    forest = build_activity_forest([activity(2, "food.meat"), activity(3, "food.meat.beef")])
+
+    assert [root.id for root in forest] == [2]
+    assert [child.id for child in forest[0].children] == [3]
+
+def test_parse_id_list_drops_duplicates_and_keeps_order():
+    assert parse_id_list("3, 1,3,,2") == [3, 1, 2]
+
+@pytest.mark.parametrize("value", ["", ",", "1,a", "0", "2,-1"])
+def test_parse_id_list_rejects_invalid_ids(value):
+    with pytest.raises(HTTPException) as exc_info:
+        parse_id_list(value)
+
+    assert exc_info.value.status_code == 400
+
+def test_parse_id_list_limits_count():
+    with pytest.raises(HTTPException) as exc_info:
+        parse_id_list("1,2,3", max_ids=2)
+
+    assert exc_info.value.status_code == 400
+
+@pytest.mark.parametrize("if_none_match", ['"abc"', 'W/"abc"', '"old", "abc"', "*"])
+def test_not_modified_matches_etag(if_none_match):
+    response = not_modified('"abc"', if_none_match)
+
+    assert response is not None
+    assert response.status_code == 304
+    assert response.headers["ETag"] == '"abc"'
+
+@pytest.mark.parametrize("etag, if_none_match", [('"abc"', '"old"'), ('"abc"', None), (None, '"abc"')])
+def test_not_modified_passes_other_requests(etag, if_none_match):
+    assert not_modified(etag, if_none_match) is None
+
+@pytest.mark.parametrize("number, expected", [
+    ("+7 913 123-45-67", "+79131234567"),
+    ("+7 (913) 1234567", "+79131234567"),
+    ("+1 650 253 0000", "+16502530000"),
+])
+def test_to_e164_normalizes_numbers(number, expected):
+    assert to_e164(number) == expected
+
+@pytest.mark.parametrize("number", ["not a number", "+7 913", "", "8 (913) 123-45-67"])
+def test_to_e164_rejects_invalid_numbers(number):
+    assert to_e164(number) is None
+
+@pytest.mark.parametrize("fields, expand, expected", [
+    (None, None, None),
+    ("phones", None, {"id", "name", "phones"}),
+    (None, "building", {"id", "name", "building_id", "building"}),
+    (None, "", {"id", "name", "building_id"}),
+    ("name", "phones, activities", {"id", "name", "phones", "activities"}),
+])
+def test_organization_fields_combines_fields_and_expand(fields, expand, expected):
+    selected = organization_fields(fields, expand)
+    assert selected == (None if expected is None else frozenset(expected))
+
+@pytest.mark.parametrize("fields, expand", [("address", None), (None, "building_id"), (None, "owner")])
+def test_organization_fields_rejects_unknown_names(fields, expand):
+    with pytest.raises(HTTPException) as exc:
+        organization_fields(fields, expand)
+    assert exc.value.status_code == 400